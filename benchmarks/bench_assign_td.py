@@ -0,0 +1,38 @@
+"""
+Benchmark of the typical day expansion: merge based assign_td (previous implementation) vs the TDExpander take.
+All the layers of a 12 typical day case are expanded to 8760 hours.
+
+    $ python benchmarks/bench_assign_td.py
+"""
+import timeit
+
+import pandas as pd
+
+import dispa_link as dl
+from synthetic_case import es_layers, td_final
+
+
+def assign_td_merge(df, td_df):
+    assigned_df = td_df.loc[:, ['TD', 'hour']]
+    assigned_df = assigned_df.merge(df, left_on=['TD', 'hour'], right_index=True).sort_index()
+    assigned_df.drop(columns=['TD', 'hour'], inplace=True)
+    return assigned_df
+
+
+def main(repeat=20):
+    td_df = dl.process_TD(td_final())
+    layers = es_layers()
+    for name, df in layers.items():
+        pd.testing.assert_frame_equal(assign_td_merge(df, td_df), dl.assign_td(df, td_df))
+
+    t_merge = min(timeit.repeat(lambda: [assign_td_merge(df, td_df) for df in layers.values()],
+                                number=1, repeat=repeat))
+    t_take = min(timeit.repeat(lambda: [dl.assign_td(df, td_df) for df in layers.values()], number=1, repeat=repeat))
+    print('Expansion of %d layers (12 TD -> 8760 h)' % len(layers))
+    print('  merge + sort_index : %8.2f ms' % (t_merge * 1000))
+    print('  TDExpander take    : %8.2f ms' % (t_take * 1000))
+    print('  speed-up           : %8.1fx' % (t_merge / t_take))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the ES -> DS technology mapping of get_capacities_from_es on a ~500 technology synthetic case (every ES
+technology copied 8 times). The columnar mapping stage (map_* functions) is timed separately from the whole call.
+
+    $ python benchmarks/bench_get_capacities.py
+"""
+import logging
+import timeit
+
+import pandas as pd
+
+import dispa_link as dl
+from dispa_link.preprocessing import get_capacities_energyscope as gc
+from synthetic_case import es_outputs, ds_inputs, synthetic_mapping, td_final
+
+
+def prepare_units(outputs, es_mapping):
+    power_plants = dl.define_units(names=outputs['assets'].index, columns=dl.column_names_bs + ['Sort'])
+    power_plants = dl.assign_parameters(power_plants, outputs['assets']['f'], 'PowerCapacity')
+    attributes = es_mapping.reindex(power_plants.index)
+    for parameter, attribute in [('Technology', 'TECH'), ('Fuel', 'FUEL'), ('Sort', 'SORT')]:
+        power_plants = dl.assign_parameters(power_plants, attributes[attribute], parameter)
+    return power_plants.loc[power_plants['Sort'].notna() & ~power_plants['Sort'].isin(['HeatSlack', 'THMS', ''])]
+
+
+def map_units(power_plants, outputs, typical_units, es_mapping):
+    techs = {sort: list(power_plants.index[power_plants['Sort'] == sort]) for sort in
+             ['ELEC', 'P2GS', 'CHP', 'P2HT', 'HEAT', 'STO']}
+    power_plants = gc.map_elec_units(power_plants, techs['ELEC'], outputs, typical_units, es_mapping=es_mapping)
+    power_plants = gc.map_p2gs_units(power_plants, techs['P2GS'], outputs, es_mapping=es_mapping)
+    power_plants = gc.map_chp_units(power_plants, techs['CHP'], outputs, es_mapping=es_mapping)
+    power_plants = gc.map_p2ht_units(power_plants, techs['P2HT'], outputs, es_mapping=es_mapping)
+    power_plants = gc.map_heat_units(power_plants, techs['HEAT'], outputs, es_mapping=es_mapping)
+    power_plants = gc.map_heat_zones(power_plants, techs['P2HT'] + techs['CHP'] + techs['HEAT'],
+                                     gc.heat_zone_prefixes)
+    power_plants = gc.map_heat_zones(power_plants, techs['STO'], gc.storage_zone_prefixes)
+    power_plants = gc.map_storage_units(power_plants, techs['STO'], outputs)
+    power_plants = gc.map_co2_intensity(power_plants, list(power_plants.index), outputs['GWP_op'])
+    return gc.map_x_units(power_plants)
+
+
+def main(n_copies=8, repeat=5):
+    logging.disable(logging.CRITICAL)
+    typical_units = pd.read_csv('Inputs/EnergyScope/Typical_Units.csv')
+    td_df = dl.process_TD(td_final())
+    outputs = es_outputs(n_copies=n_copies)
+    with synthetic_mapping(n_copies):
+        es_mapping = dl.compile_es_mapping()
+        power_plants = prepare_units(outputs, es_mapping)
+        t_map = min(timeit.repeat(lambda: map_units(power_plants.copy(), outputs, typical_units, es_mapping),
+                                  number=1, repeat=repeat))
+        t_all = min(timeit.repeat(lambda: dl.get_capacities_from_es(es_outputs(n_copies=n_copies),
+                                                                     typical_units.copy(), td_df, write_csv=False,
+                                                                     ds_inputs=ds_inputs()),
+                                  number=1, repeat=repeat))
+    print('get_capacities_from_es, %d ES technologies (%d mapped units)' % (len(outputs['assets']),
+                                                                           len(power_plants)))
+    print('  columnar mapping stage : %8.2f ms' % (t_map * 1000))
+    print('  whole call             : %8.2f ms' % (t_all * 1000))
+
+
+if __name__ == '__main__':
+    main()
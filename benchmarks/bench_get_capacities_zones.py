@@ -0,0 +1,61 @@
+"""
+Benchmark of the multi-zone capacities: get_capacities_from_es called zone by zone vs get_capacities_from_es_zones (one
+process per zone). Every zone is a ~500 technology synthetic case (every ES technology copied 8 times).
+
+    $ python benchmarks/bench_get_capacities_zones.py
+"""
+import logging
+import os
+import timeit
+
+import pandas as pd
+
+import dispa_link as dl
+from synthetic_case import ds_inputs, es_outputs, synthetic_mapping, td_final
+
+
+def capacities_per_zone(zone_outputs, typical_units, td_df, x_inputs, dispaset_version):
+    results = [dl.get_capacities_from_es(dict(outputs, GWP_op=outputs['GWP_op'].copy()), typical_units, td_df,
+                                         zone=zone, write_csv=False, dispaset_version=dispaset_version,
+                                         ds_inputs=x_inputs) for zone, outputs in zone_outputs.items()]
+    return pd.concat([result[0] for result in results]), pd.concat([result[1] for result in results],
+                                                                    ignore_index=True)
+
+
+def main(n_zones=8, n_copies=8, repeat=3):
+    logging.disable(logging.CRITICAL)
+    typical_units = pd.read_csv('Inputs/EnergyScope/Typical_Units.csv')
+    td_df = dl.process_TD(td_final())
+    zones = ['Z%d' % k for k in range(n_zones)]
+    zone_outputs = {zone: es_outputs(n_copies=n_copies, seed=k) for k, zone in enumerate(zones)}
+    # flexible demand/supply of the <zone>_<sector> boundary sectors
+    x_inputs = {variable: {0: pd.concat([ds_inputs(seed=k)[variable][0].rename(columns=lambda c: zone + c[2:])
+                                         for k, zone in enumerate(zones)], axis=1)}
+                for variable in ['XVarDemand', 'XVarSupply']}
+    with synthetic_mapping(n_copies):
+        es_mapping = dl.compile_es_mapping()
+
+        def zones_call(max_workers):
+            return dl.get_capacities_from_es_zones(zone_outputs, typical_units, td_df, write_csv=False,
+                                                   dispaset_version='2.5_BS', ds_inputs=x_inputs,
+                                                   es_mapping=es_mapping, max_workers=max_workers)
+
+        power_plants, boundary_sector_inputs = zones_call(None)
+        expected = capacities_per_zone(zone_outputs, typical_units, td_df, x_inputs, '2.5_BS')
+        pd.testing.assert_frame_equal(power_plants, expected[0], check_dtype=False, check_categorical=False)
+        pd.testing.assert_frame_equal(boundary_sector_inputs, expected[1])
+        assert power_plants['Unit'].is_unique
+
+        t_loop = min(timeit.repeat(lambda: capacities_per_zone(zone_outputs, typical_units, td_df, x_inputs,
+                                                               '2.5_BS'), number=1, repeat=repeat))
+        t_serial = min(timeit.repeat(lambda: zones_call(0), number=1, repeat=repeat))
+        t_pool = min(timeit.repeat(lambda: zones_call(None), number=1, repeat=repeat))
+    print('get_capacities_from_es, %d zones x %d ES technologies (%d units, %d CPUs)' %
+          (n_zones, len(zone_outputs[zones[0]]['assets']), len(power_plants), os.cpu_count()))
+    print('  zone by zone            : %8.2f ms' % (t_loop * 1000))
+    print('  zones, in this process  : %8.2f ms' % (t_serial * 1000))
+    print('  zones, process pool     : %8.2f ms' % (t_pool * 1000))
+
+
+if __name__ == '__main__':
+    main()
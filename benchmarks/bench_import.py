@@ -0,0 +1,41 @@
+"""
+Benchmark of the package start-up: cumulative import time (python -X importtime) of dispa_link alone and of the first
+access to assign_td (what a process pool worker pays) and to the plots, each in a fresh interpreter.
+
+    $ python benchmarks/bench_import.py
+"""
+import subprocess
+import sys
+
+
+def import_time(statement, package='dispa_link'):
+    """
+    Import time [ms] of the package while running the statement: sum of the cumulative times reported by
+    python -X importtime for the top level imports from the package import on (the lazy names load their
+    submodules and dependencies after the package itself)
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True,
+                            check=True).stderr
+    total, started = 0, False
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line.split('|')
+        started = started or name.strip() == package
+        if started and len(name) - len(name.lstrip()) == 1:
+            total += int(cumulative)
+    return total / 1000
+
+
+def main(repeat=5):
+    statements = {'import dispa_link': 'import dispa_link',
+                  'dispa_link.assign_td': 'import dispa_link; dispa_link.assign_td',
+                  'dispa_link.plot_convergence': 'import dispa_link; dispa_link.plot_convergence'}
+    print('python -X importtime, best of %d' % repeat)
+    for name, statement in statements.items():
+        elapsed = min(import_time(statement) for _ in range(repeat))
+        print('  %-28s: %8.2f ms' % (name, elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Benchmark of the hourly_data layer reader: tab separated text parsing (pd.read_csv + clean_blanks, previous
+implementation) vs the load of the Feather cache. All the layers of a 12 typical day case are read.
+
+    $ python benchmarks/bench_read_layer.py
+"""
+import os
+import tempfile
+import timeit
+
+import pandas as pd
+
+import dispa_link as dl
+from synthetic_case import es_layers
+
+
+def read_layer_csv(path):
+    return dl.clean_blanks(pd.read_csv(path, delimiter='\t', index_col=[0, 1]), idx=False)
+
+
+def main(repeat=20):
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for name, df in es_layers().items():
+            path = os.path.join(folder, 'layer_' + name + '.txt')
+            df.to_csv(path, sep='\t')
+            paths.append(path)
+        for path in paths:
+            # first read builds the cache
+            pd.testing.assert_frame_equal(read_layer_csv(path), dl.read_layer(path))
+            pd.testing.assert_frame_equal(read_layer_csv(path), dl.read_layer(path))
+
+        t_csv = min(timeit.repeat(lambda: [read_layer_csv(path) for path in paths], number=1, repeat=repeat))
+        t_cache = min(timeit.repeat(lambda: [dl.read_layer(path) for path in paths], number=1, repeat=repeat))
+    print('Reading of %d hourly_data layers' % len(paths))
+    print('  read_csv + clean_blanks : %8.2f ms' % (t_csv * 1000))
+    print('  Feather cache (mmap)    : %8.2f ms' % (t_cache * 1000))
+    print('  speed-up                : %8.1fx' % (t_csv / t_cache))
+
+
+if __name__ == '__main__':
+    main()
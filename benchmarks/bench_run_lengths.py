@@ -0,0 +1,43 @@
+"""
+Benchmark of the consecutive event metrics: cumsum/where/ffill expressions of the previous plot_convergence vs the
+run-length kernel (common.run_lengths and common.event_cumsum). 30 years of hourly energy not served for 10 series.
+
+    $ python benchmarks/bench_run_lengths.py
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import dispa_link as dl
+
+
+def consecutive_pandas(df):
+    a = df != 0
+    energy = df.cumsum().where(a).ffill().fillna(0) - df.cumsum().where(~a).ffill().fillna(0)
+    hours = a.cumsum().where(a).ffill().fillna(0) - a.cumsum().where(~a).ffill().fillna(0)
+    return energy, energy.max(axis=0), hours.max(axis=0)
+
+
+def main(years=30, columns=10, repeat=5):
+    rng = np.random.default_rng(0)
+    n = 8760 * years
+    df = pd.DataFrame(rng.uniform(0, 1000, (n, columns)) * (rng.uniform(size=(n, columns)) < 0.2),
+                      index=pd.date_range('2015-01-01', periods=n, freq='H'))
+    energy, max_energy, max_hours = consecutive_pandas(df)
+    runs = dl.run_lengths(df)
+    np.testing.assert_array_equal(runs['max_energy'], max_energy.values)
+    np.testing.assert_array_equal(runs['max_length'], max_hours.values)
+    np.testing.assert_array_equal(dl.event_cumsum(df), energy.values)
+
+    t_pandas = min(timeit.repeat(lambda: consecutive_pandas(df), number=1, repeat=repeat))
+    t_runs = min(timeit.repeat(lambda: dl.run_lengths(df), number=1, repeat=repeat))
+    t_event = min(timeit.repeat(lambda: dl.event_cumsum(df), number=1, repeat=repeat))
+    print('consecutive event metrics, %d hours x %d series' % df.shape)
+    print('  cumsum/where/ffill : %8.2f ms' % (t_pandas * 1000))
+    print('  run_lengths        : %8.2f ms' % (t_runs * 1000))
+    print('  event_cumsum       : %8.2f ms' % (t_event * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of the multi-zone demand builders: one expansion of every layer per zone (previous get_electricity_demand and
+get_heat_demand called zone by zone) vs the batched expansion of the per-zone demands of all the zones.
+
+    $ python benchmarks/bench_zone_demand.py
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+import dispa_link as dl
+from dispa_link.preprocessing import get_timeseries_energyscope as ts
+from synthetic_case import es_layers, td_final
+
+LAYERS = ['electricity_layers'] + list(ts.heat_demand_layers.values())
+
+
+def demand_per_zone(outputs, td_df, drange, grid_losses):
+    electricity, heat = {}, {}
+    for zone, es_outputs in outputs.items():
+        layer = dl.assign_td(es_outputs['electricity_layers'], td_df) * 1000
+        electricity[zone] = -layer.loc[:, ts.electricity_demand_cols].sum(axis=1).values * (1 + grid_losses[zone])
+        for sector, name in ts.heat_demand_layers.items():
+            heat[zone + '_' + sector] = -(dl.assign_td(es_outputs[name], td_df) * 1000)['END_USE'].values
+    return pd.DataFrame(electricity, index=drange), pd.DataFrame(heat, index=drange)
+
+
+def demand_batched(outputs, td_df, drange, grid_losses):
+    dl.td_layer_cache.clear()
+    return (ts.get_electricity_demand(outputs, td_df, drange, countries=None, write_csv=False,
+                                      grid_losses=grid_losses),
+            ts.get_heat_demand(outputs, td_df, drange, write_csv=False))
+
+
+def main(zones=(1, 10, 40), repeat=5):
+    td_df = dl.process_TD(td_final())
+    drange = pd.date_range('2015-01-01', periods=8760, freq='H')
+    print('Electricity and heat demands (12 TD -> 8760 h)')
+    for n_zones in zones:
+        outputs = {}
+        for k in range(n_zones):
+            layers = es_layers(seed=k)
+            outputs['Z%02d' % k] = {name: dl.clean_blanks(layers[name], idx=False) for name in LAYERS}
+        grid_losses = dict(zip(outputs, np.linspace(0.03, 0.08, n_zones)))
+        for expected, batched in zip(demand_per_zone(outputs, td_df, drange, grid_losses),
+                                     demand_batched(outputs, td_df, drange, grid_losses)):
+            pd.testing.assert_frame_equal(batched, expected, check_freq=False)
+
+        t_loop = min(timeit.repeat(lambda: demand_per_zone(outputs, td_df, drange, grid_losses), number=1,
+                                   repeat=repeat))
+        t_batch = min(timeit.repeat(lambda: demand_batched(outputs, td_df, drange, grid_losses), number=1,
+                                    repeat=repeat))
+        print('  %2d zones: per-zone expansion %8.2f ms, batched %8.2f ms' % (n_zones, t_loop * 1000, t_batch * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""
+Synthetic EnergyScope case used by the benchmarks: a 12 typical day year and hourly_data layers with the column names
+used by the preprocessing functions.
+"""
+import contextlib
+import copy
+
+import numpy as np
+import pandas as pd
+
+from dispa_link.constants import common, mapping
+
+N_TD = 12
+
+LAYERS = {'electricity_layers': ['ELEC_EXPORT', 'TRAMWAY_TROLLEY', 'TRAIN_PUB', 'TRAIN_FREIGHT', 'TRUCK_ELEC',
+                                 'BIO_HYDROLYSIS', 'PYROLYSIS_TO_LFO', 'PYROLYSIS_TO_FUELS', 'ATM_CCS', 'INDUSTRY_CCS',
+                                 'SYN_METHANOLATION', 'BIOMASS_TO_METHANOL', 'HABER_BOSCH', 'OIL_TO_HVC',
+                                 'GAS_TO_HVC', 'BIOMASS_TO_HVC', 'END_USE', 'CAR_PHEV', 'CAR_BEV', 'CCGT', 'PV',
+                                 'WIND_ONSHORE', 'WIND_OFFSHORE', 'HYDRO_RIVER', 'NUCLEAR', 'PHS_Pin', 'PHS_Pout',
+                                 'BATT_LI_Pin', 'BATT_LI_Pout', 'H2_ELECTROLYSIS', 'DHN_HP_ELEC', 'DEC_HP_ELEC'],
+          'h2_layer': 'h2', 'ammonia_layer': 'ammonia', 'gas_layer': 'gas', 'high_t_Layers': 'ind',
+          'low_t_dhn_Layers': 'dhn', 'low_t_decen_Layers': 'dec', 'wood_layer': 'wood', 'lfo_layer': 'lfo',
+          'coal_layer': 'coal', 'waste_layer': 'waste'}
+
+
+def td_final(n_td=N_TD, seed=0):
+    """Typical day of every day of the year, in the format of STEP_1_TD_selection/TD_of_days.out"""
+    rng = np.random.default_rng(seed)
+    representative_days = np.sort(rng.choice(np.arange(1, 366), n_td, replace=False))
+    return pd.DataFrame({0: rng.choice(representative_days, 365)})
+
+
+def layer(columns, n_td=N_TD, seed=0):
+    """Typical day layer indexed by (TD, hour), with padded column names and a trailing empty column like ES files"""
+    rng = np.random.default_rng(seed)
+    index = pd.MultiIndex.from_product([range(1, n_td + 1), range(1, 25)], names=['Td ', 'Time'])
+    df = pd.DataFrame(rng.normal(size=(len(index), len(columns))), index=index,
+                      columns=[c + ' ' for c in columns])
+    df['Unnamed: 40'] = np.nan
+    return df
+
+
+def es_layers(n_td=N_TD, seed=0):
+    """All the hourly_data layers of a case study, with the columns referenced in constants.common['ES']"""
+    layers = {}
+    for i, (name, cols) in enumerate(LAYERS.items()):
+        if isinstance(cols, str):
+            cols = list(dict.fromkeys(sum([common['ES'][cols + suffix] for suffix in
+                                           ['_fix_dem', '_var_dem', '_fix_sup', '_var_sup']], []) + ['OTHER_1',
+                                                                                                      'OTHER_2']))
+        layers[name] = layer(cols, n_td, seed + i)
+    return layers
+
+
+STORAGE_LAYERS = ['ELECTRICITY', 'HEAT_HIGH_T', 'HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN', 'H2']
+
+
+def synthetic_techs(n_copies=0):
+    """
+    ES technologies of the synthetic case and the ES mapping extended with their copies
+    :param n_copies:    number of synthetic copies (<tech>_<k>) of every ES technology
+    :return:            tuple (list of technologies, deep copy of constants.mapping['ES'] with the copies)
+    """
+    es_mapping = copy.deepcopy(mapping['ES'])
+    # copies already registered by synthetic_mapping (<tech>_<k>) are not part of the base technologies
+    base = [t for t in es_mapping['SORT'] if es_mapping['SORT'][t] != 'OTH' and
+            not (t[-4:-3] == '_' and t[-3:].isdigit())] + \
+           ['TS_DHN_DAILY', 'TS_DHN_SEASONAL', 'H2_STORAGE', 'AMMONIA_STORAGE', 'TS_HIGH_TEMP', 'CAR_BEV']
+    base = list(dict.fromkeys(base))
+    techs = list(base)
+    for k in range(n_copies):
+        for t in base:
+            if t in ['CCGT', 'TS_DHN_DAILY', 'TS_DHN_SEASONAL', 'H2_STORAGE', 'AMMONIA_STORAGE', 'TS_HIGH_TEMP']:
+                continue
+            name = '%s_%03d' % (t, k)
+            techs.append(name)
+            for dico in es_mapping.values():
+                if isinstance(dico, dict) and t in dico:
+                    dico[name] = dico[t]
+    return techs, es_mapping
+
+
+@contextlib.contextmanager
+def synthetic_mapping(n_copies=0):
+    """
+    Register the copies of the synthetic technologies in constants.mapping['ES'] for the duration of the block, the
+    original mapping is restored on exit
+    """
+    original = mapping['ES']
+    mapping['ES'] = synthetic_techs(n_copies)[1]
+    try:
+        yield mapping['ES']
+    finally:
+        mapping['ES'] = original
+
+
+def es_outputs(n_td=N_TD, n_copies=0, seed=0):
+    """
+    EnergyScope outputs needed by get_capacities_from_es: assets, layers_in_out, storage characteristics and
+    efficiencies, GWP_op and the layers used for the DHN storage allocation.
+    :param n_copies:    number of synthetic copies of every ES technology, to be mapped within synthetic_mapping
+    """
+    rng = np.random.default_rng(seed)
+    techs, es_mapping = synthetic_techs(n_copies)
+    layers = ['ELECTRICITY', 'GAS', 'AMMONIA', 'COAL', 'RES_SOLAR', 'RES_GEO', 'URANIUM', 'RES_HYDRO', 'RES_WIND',
+              'WOOD', 'WASTE', 'WET_BIOMASS', 'LFO', 'H2', 'HEAT_HIGH_T', 'HEAT_LOW_T_DHN', 'HEAT_LOW_T_DECEN']
+    lio = pd.DataFrame(0.0, index=techs, columns=layers)
+    for t in techs:
+        sort = es_mapping['SORT'].get(t)
+        resource = es_mapping['FUEL_ES'].get(t, '').strip()
+        if resource in layers:
+            lio.at[t, resource] = -1
+        if sort == 'ELEC':
+            lio.at[t, 'ELECTRICITY'] = rng.uniform(0.3, 0.6)
+        elif sort == 'CHP':
+            lio.at[t, 'ELECTRICITY'] = rng.uniform(0.2, 0.4)
+            lio.at[t, es_mapping['CHP_HEAT'][t]] = rng.uniform(0.3, 0.5)
+        elif sort == 'P2HT':
+            lio.at[t, 'ELECTRICITY'] = -1
+            lio.at[t, es_mapping['P2HT_HEAT'][t]] = rng.uniform(1, 4)
+        elif sort == 'HEAT' or t in es_mapping['HEAT_ONLY_HEAT']:
+            lio.at[t, es_mapping['HEAT_ONLY_HEAT'][t]] = rng.uniform(0.8, 1)
+        elif sort == 'P2GS':
+            lio.loc[t, ['ELECTRICITY', 'H2', 'HEAT_HIGH_T', 'HEAT_LOW_T_DHN']] = [-1, 0.7, 0.1, 0.05]
+    storage = [t for t in techs if es_mapping['SORT'].get(t) in ['STO', 'P2GS_STO'] or t.endswith('STORAGE') or
+               t.startswith('TS_')]
+    storage_characteristics = pd.DataFrame({'storage_losses': rng.uniform(0, 0.01, len(storage)),
+                                            'storage_charge_time': rng.uniform(1, 10, len(storage)),
+                                            'storage_discharge_time': rng.uniform(1, 10, len(storage))},
+                                           index=storage)
+    storage_eff_in = pd.DataFrame(rng.uniform(0.8, 1, (len(storage), len(STORAGE_LAYERS))), index=storage,
+                                  columns=STORAGE_LAYERS)
+    storage_eff_out = pd.DataFrame(rng.uniform(0.8, 1, (len(storage), len(STORAGE_LAYERS))), index=storage,
+                                   columns=STORAGE_LAYERS)
+    assets = pd.DataFrame({'f': rng.uniform(0, 10, len(techs))}, index=techs)
+    gwp_op = pd.Series(rng.uniform(0, 0.3, 6), index=['GAS', 'COAL', 'LFO', 'WOOD', 'WASTE', 'URANIUM'])
+    dhn = [t for t in techs if t.startswith('DHN_')] + ['TS_DHN_DAILY_Pin', 'TS_DHN_DAILY_Pout',
+                                                        'TS_DHN_SEASONAL_Pin', 'TS_DHN_SEASONAL_Pout']
+    low_t_dhn = layer(dhn, n_td, seed)
+    low_t_dhn.columns = low_t_dhn.columns.str.strip()
+    low_t_dhn = low_t_dhn.abs()
+    low_t_dhn[['TS_DHN_DAILY_Pin', 'TS_DHN_SEASONAL_Pin']] *= -1
+    outputs = {'assets': assets, 'layers_in_out': lio, 'storage_characteristics': storage_characteristics,
+               'storage_eff_in': storage_eff_in, 'storage_eff_out': storage_eff_out, 'GWP_op': gwp_op,
+               'low_t_dhn_Layers': low_t_dhn}
+    outputs.update(es_layers(n_td, seed))
+    outputs['low_t_dhn_Layers'] = low_t_dhn
+    return outputs
+
+
+def ds_inputs(sectors=('ES_H2', 'ES_AMO', 'ES_IND', 'ES_DHN', 'ES_DEC', 'ES_OIL', 'ES_HRD', 'ES_WST', 'ES_BIO'),
+              seed=0):
+    """Boundary sector flexible demand and supply of the first iteration"""
+    rng = np.random.default_rng(seed)
+    drange = pd.date_range('2015-01-01', periods=8760, freq='H')
+    return {'XVarDemand': {0: pd.DataFrame(rng.uniform(size=(8760, 1)), index=drange, columns=['ES_IND'])},
+            'XVarSupply': {0: pd.DataFrame(rng.uniform(size=(8760, len(sectors))), index=drange,
+                                           columns=list(sectors))}}
@@ -1,10 +1,22 @@
-from .common import *
-from .search import *
-from .constants import *
-from .preprocessing.get_timeseries_energyscope import *
-from .preprocessing.get_capacities_energyscope import *
-from .postprocessing.plots import *
-from .dispa_link_functions import *
+import importlib
+
+# Submodules exposed at the package level, loaded on the first access to one of their names (module __getattr__) so
+# that importing dispa_link is cheap (no pandas nor matplotlib for the process pool workers). Names are looked up in
+# this order, the first submodule defining a name provides it, the plots (matplotlib) come last
+_lazy_modules = ['constants',
+                 'common',
+                 'search',
+                 'preprocessing.get_timeseries_energyscope',
+                 'preprocessing.get_capacities_energyscope',
+                 'preprocessing.read_energyscope',
+                 'postprocessing.convergence',
+                 'dispa_link_functions',
+                 'checkpoint',
+                 'results_store',
+                 'softlink',
+                 'postprocessing.plots']
+_module_names = {}
+
 
 def get_git_revision_tag():
     """Get version of Dispa-LINK used for this run. tag + commit hash"""
@@ -14,10 +26,51 @@ def get_git_revision_tag():
     except:
         return 'NA'
 
-__gitversion__ = get_git_revision_tag()
+
+def __getattr__(name):
+    """
+    Package level names: the submodules themselves, else the first submodule of _lazy_modules defining the name is
+    imported, the git version is computed on the first access
+    """
+    if name == '__gitversion__':
+        value = get_git_revision_tag()
+    elif name.startswith('_'):
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    elif name in {module_name.split('.')[0] for module_name in _lazy_modules}:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        for module_name in _lazy_modules:
+            module = importlib.import_module('.' + module_name, __name__)
+            if name in _public_names(module):
+                value = getattr(module, name)
+                break
+        else:
+            raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    names = set(globals())
+    for module_name in _lazy_modules:
+        names.update(_public_names(importlib.import_module('.' + module_name, __name__)))
+    return sorted(names)
+
+
+def _public_names(module):
+    """
+    Names of a submodule that a star-import would provide
+    """
+    if module.__name__ not in _module_names:
+        names = getattr(module, '__all__', None)
+        if names is None:
+            names = [name for name in vars(module) if not name.startswith('_')]
+        _module_names[module.__name__] = set(names)
+    return _module_names[module.__name__]
+
 
 # if somebody does "from dispaset_sidetools import *", this is what they will be able to access:
 __all__ = ['commons',
            'search',
            'constants',
-          ]
\ No newline at end of file
+          ]
@@ -0,0 +1,161 @@
+"""
+Checkpoint store of the bi-directional soft-linking loop
+Input : outputs of each stage of each iteration (ES run, Dispa-SET inputs, Dispa-SET results, reserves)
+Output : pickle files (one per stage and iteration) and a manifest with the fingerprint of the inputs of each stage
+
+Each stage output is written as soon as it is produced. When the loop is restarted, a stage whose output is in the store
+with the same input fingerprint (and whose output files still exist) is loaded instead of being computed again.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import PurePath
+
+import numpy as np
+import pandas as pd
+
+checkpoint_manifest_name = 'manifest.json'
+
+
+def _update_fingerprint(h, obj):
+    """
+    Feed the content of obj into the hash h (recursive for containers)
+    """
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        try:
+            h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+        except TypeError:
+            # unhashable cells (lists, dictionaries...)
+            h.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr((list(obj.columns), list(map(str, obj.dtypes)))).encode())
+        else:
+            h.update(repr((obj.name, str(obj.dtype))).encode())
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.shape, str(obj.dtype))).encode())
+        h.update(np.ascontiguousarray(obj).tobytes() if obj.dtype != object else pickle.dumps(obj))
+    elif isinstance(obj, dict):
+        h.update(b'{')
+        for key in sorted(obj, key=repr):
+            h.update(repr(key).encode())
+            _update_fingerprint(h, obj[key])
+        h.update(b'}')
+    elif isinstance(obj, (list, tuple)):
+        h.update(b'[')
+        for item in obj:
+            _update_fingerprint(h, item)
+        h.update(b']')
+    elif isinstance(obj, (set, frozenset)):
+        # iteration order depends on PYTHONHASHSEED: elements are hashed one by one and their digests sorted
+        h.update(b'(')
+        for digest in sorted(object_fingerprint(item) for item in obj):
+            h.update(digest.encode())
+        h.update(b')')
+    elif obj is None or isinstance(obj, (str, bytes, int, float, bool, PurePath)):
+        h.update(repr(obj).encode())
+    else:
+        h.update(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def object_fingerprint(obj):
+    """
+    Fingerprint of the content of an object: dataframes, series and arrays are hashed on their values, index and
+    columns, dictionaries, lists, tuples and sets recursively, any other object through its pickle
+    :param obj:     object to be hashed
+    :return:        hexadecimal sha1 digest
+    """
+    h = hashlib.sha1()
+    _update_fingerprint(h, obj)
+    return h.hexdigest()
+
+
+class CheckpointStore(object):
+    """
+    On-disk store of the soft-linking stages: <root>/loop_<iteration>/<stage>.p and a manifest (json) holding the
+    input fingerprint of each stored stage.
+    """
+
+    def __init__(self, root):
+        """
+        :param root:    folder of the store (one per case study)
+        """
+        self.root = str(root)
+        self.manifest_path = os.path.join(self.root, checkpoint_manifest_name)
+        os.makedirs(self.root, exist_ok=True)
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(iteration, stage):
+        return str(iteration) + '/' + stage
+
+    def path(self, iteration, stage):
+        """
+        Path of the pickle file of a stage
+        """
+        return os.path.join(self.root, 'loop_' + str(iteration), stage + '.p')
+
+    def has(self, iteration, stage, fingerprint=None):
+        """
+        Check if a stage is stored (with the given input fingerprint if not None)
+        """
+        entry = self.manifest.get(self.key(iteration, stage))
+        if entry is None or not os.path.isfile(self.path(iteration, stage)):
+            return False
+        return fingerprint is None or entry['fingerprint'] == fingerprint
+
+    def save(self, iteration, stage, value, fingerprint=None):
+        """
+        Store the output of a stage (atomic write of the pickle file, then of the manifest)
+        :param iteration:   soft-linking iteration
+        :param stage:       name of the stage
+        :param value:       output of the stage
+        :param fingerprint: fingerprint of the inputs of the stage
+        """
+        path = self.path(iteration, stage)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + '.tmp', path)
+        with self._lock:
+            self.manifest[self.key(iteration, stage)] = {'fingerprint': fingerprint, 'time': time.time()}
+            with open(self.manifest_path + '.tmp', 'w') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def load(self, iteration, stage):
+        """
+        Load the output of a stored stage
+        """
+        with open(self.path(iteration, stage), 'rb') as handle:
+            return pickle.load(handle)
+
+    def run(self, iteration, stage, function, *args, inputs=None, outputs=(), **kwargs):
+        """
+        Run a stage unless its output is already stored with the same input fingerprint
+        :param iteration:   soft-linking iteration
+        :param stage:       name of the stage
+        :param function:    function computing the stage, called with args and kwargs
+        :param inputs:      objects the stage depends on (args and kwargs if None)
+        :param outputs:     files written by the stage, all of them have to exist for the stage to be skipped
+        :return:            output of the stage
+        """
+        fingerprint = object_fingerprint((args, kwargs) if inputs is None else inputs)
+        if self.has(iteration, stage, fingerprint) and all(os.path.exists(str(p)) for p in outputs):
+            logging.info('Loop ' + str(iteration) + ': ' + stage + ' loaded from the checkpoint store')
+            return self.load(iteration, stage)
+        start = time.perf_counter()
+        value = function(*args, **kwargs)
+        logging.info('Loop ' + str(iteration) + ': ' + stage + ' computed in ' +
+                     str(round(time.perf_counter() - start, 2)) + ' s')
+        self.save(iteration, stage, value, fingerprint)
+        return value
@@ -62,7 +62,13 @@ def fix_na(series, fillzeros=True, verbose=True, name='', Nstd=4, outliers=None)
     Function that fills zero and n/a values from a time series by interpolating
     from the same hours in the previous and next days
 
-    :param series:  Pandas Series with proper datetime index
+    The series is placed on a regular time grid and reshaped into a (days x steps per day) array. The closest valid
+    values of the next days are found by backward filling along the day axis, the previous days are scanned one day at
+    a time (values filled in a day are used for the next days) and each missing value is replaced by the mean of these
+    two neighbours (or by the only one available). As in a label search, the search stops at time stamps missing from
+    the index.
+
+    :param series:  Pandas Series (or DataFrame, filled column-wise) with proper datetime index
     :param fillzeros:   If true, also interpolates zero values in the time series
     :param verbose:     If true, prints information regarding the number of fixed data points
     :param name:        String with the name of the time series, for the display massage
@@ -71,57 +77,167 @@ def fix_na(series, fillzeros=True, verbose=True, name='', Nstd=4, outliers=None)
 
     :returns:   Same series with filled nan values
     """
-    longname = name + ' ' + str(series.index.freq)
+    data = series.to_frame() if isinstance(series, pd.Series) else series
+    data = data.astype(float)
+    names = [name] if isinstance(series, pd.Series) else [name + ' ' + str(c) for c in data.columns]
+    longnames = [n + ' ' + str(series.index.freq) for n in names]
     # turn all zero values into na:
     if fillzeros:
-        series[series == 0] = np.nan
+        data = data.mask(data == 0)
     # check for outliers:
-    toohigh = series > series.mean() + Nstd * series.std()
-    if np.sum(toohigh) > 0:
-        print('Time series "' + longname + '": ' + str(
-            np.sum(toohigh)) + ' data points unrealistically high. They will be fixed as well')
-        series[toohigh] = np.nan
+    toohigh = data > data.mean() + Nstd * data.std()
+    for longname, count in zip(longnames, toohigh.sum()):
+        if count > 0:
+            print('Time series "' + longname + '": ' + str(count) +
+                  ' data points unrealistically high. They will be fixed as well')
+    values = data.to_numpy(copy=True)
+    values[toohigh.to_numpy()] = np.nan
     # write na in all the locations defined as "outlier"
     if outliers:
         count = 0
         for r in outliers:
-            idx = (series.index > pd.to_datetime(r[0])) & (series.index < pd.to_datetime(r[-1]))
-            series[idx] = np.nan
+            idx = (data.index > pd.to_datetime(r[0])) & (data.index < pd.to_datetime(r[-1]))
+            values[idx, :] = np.nan
             count += np.sum(idx)
-        print('Time series "' + longname + '": ' + str(count) + ' data points flagged as outliers and removed')
-
-    # Now fix all nan values: 
-    loc = np.where(series.isnull())[0]
-    print('Time series "' + longname + '": ' + str(len(loc)) + ' data points to fix')
-    for i in loc:
-        idx = series.index[i]
-        # go see if previous days are defined at the same hour:
-        left = np.nan
-        idxleft = idx + datetime.timedelta(days=-1)
-        while np.isnan(left) and idxleft in series.index:
-            if np.isnan(series[idxleft]):
-                idxleft = idxleft + datetime.timedelta(days=-1)
-            else:
-                left = series[idxleft]
-
-        right = np.nan
-        idxright = idx + datetime.timedelta(days=1)
-        while np.isnan(right) and idxright in series.index:
-            if np.isnan(series[idxright]):
-                idxright = idxright + datetime.timedelta(days=1)
-            else:
-                right = series[idxright]
-
-        if (not np.isnan(left)) and (not np.isnan(right)):
-            series[idx] = (left + right) / 2
-        elif (not np.isnan(left)) and np.isnan(right):
-            series[idx] = left
-        elif np.isnan(left) and (not np.isnan(right)):
-            series[idx] = right
-        else:
-            print('ERROR : no valid data found to fill the data point ' + str(idx))
-
-    return series
+        for longname in longnames:
+            print('Time series "' + longname + '": ' + str(count) + ' data points flagged as outliers and removed')
+
+    # Now fix all nan values:
+    missing = np.isnan(values)
+    if verbose:
+        for longname, count in zip(longnames, missing.sum(axis=0)):
+            print('Time series "' + longname + '": ' + str(count) + ' data points to fix')
+    steps, positions = _day_grid(data.index)
+    n_days = -(-(positions[-1] + 1) // steps)
+    days = np.full((n_days * steps, values.shape[1]), np.nan)
+    days[positions] = values
+    days = days.reshape(n_days, steps, values.shape[1])
+    # time stamps missing from the index stop the search
+    absent = np.ones(n_days * steps, dtype=bool)
+    absent[positions] = False
+    absent = absent.reshape(n_days, steps, 1)
+    # go see if next (right) days are defined at the same hour:
+    right = _fill_days(days[::-1], absent[::-1])[::-1]
+    # previous (left) days are scanned day by day: values filled in a day are used by the next ones
+    left = np.full(days.shape[1:], np.nan)
+    for k in range(n_days):
+        day = days[k]
+        gaps = np.isnan(day) & ~absent[k]
+        if gaps.any():
+            with np.errstate(invalid='ignore'):
+                filled = np.nanmean(np.stack([left, right[k]]), axis=0)
+            day[gaps] = filled[gaps]
+        left = np.where(absent[k], np.nan, np.where(np.isnan(day), left, day))
+    values = days.reshape(n_days * steps, values.shape[1])[positions]
+
+    not_fixed = np.isnan(values).sum()
+    if not_fixed > 0:
+        print('ERROR : no valid data found to fill ' + str(not_fixed) + ' data points')
+    fixed = pd.DataFrame(values, index=data.index, columns=data.columns)
+    if isinstance(series, pd.Series):
+        fixed = fixed.iloc[:, 0].rename(series.name)
+    return fixed
+
+
+def _day_grid(index):
+    """
+    Regular time grid of a datetime index (the time step has to divide a day)
+    :param index:   datetime index, possibly with missing time stamps
+    :return:        tuple (number of time steps per day, position of each time stamp on the grid)
+    """
+    freq = index.freq if index.freq is not None else pd.infer_freq(index)
+    if freq is not None:
+        step = pd.Timedelta(pd.tseries.frequencies.to_offset(freq))
+    else:
+        # missing time stamps: most frequent time step
+        deltas = pd.Series(np.diff(index.asi8))
+        step = pd.Timedelta(int(deltas[deltas > 0].mode().iloc[0]), unit='ns')
+    steps = pd.Timedelta(days=1) / step
+    if steps != int(steps) or steps < 1:
+        raise ValueError('fix_na: the time step (' + str(step) + ') does not divide a day')
+    offsets = (index.asi8 - index.asi8[0]) / step.value
+    if not np.all(offsets == np.round(offsets)) or not np.all(np.diff(offsets) > 0):
+        raise ValueError('fix_na: the time index is not regular (time stamps off a ' + str(step) + ' grid or unsorted)')
+    return int(steps), offsets.astype(np.int64)
+
+
+def _fill_days(days, absent):
+    """
+    Forward fill of a (days x steps per day x columns) array along the day axis, the value of each day is the last
+    valid value of the previous days (NaN if there is none or if an absent time stamp is met first)
+    """
+    # absent time stamps act as a NaN value that stops the search
+    valid = ~np.isnan(days) | absent
+    last = np.where(valid, np.arange(days.shape[0])[:, None, None], -1)
+    # exclude the current day: shift by one day before accumulating
+    last = np.concatenate([np.full((1,) + days.shape[1:], -1), last[:-1]])
+    last = np.maximum.accumulate(last, axis=0)
+    previous = np.take_along_axis(days, np.maximum(last, 0), axis=0)
+    previous[last < 0] = np.nan
+    return previous
+
+
+def _hourly_columns(values):
+    """
+    Float array hours x columns of a dataframe, series or array (1-D arrays are one column), NaN replaced by 0
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    return values[:, np.newaxis] if values.ndim == 1 else values
+
+
+def _runs(values):
+    """
+    Edges of the runs of consecutive non-zero hours of each column and cumulated sums of the columns
+    :return:    tuple (column, start, end (exclusive) of each run sorted by column and start, cumulated sums with a leading
+                row of zeros)
+    """
+    n, m = values.shape
+    active = np.zeros((n + 2, m), dtype=np.int8)
+    active[1:-1] = values != 0
+    # edges alternate between run starts (+1) and ends (-1) within each column
+    column, row = np.nonzero(np.ascontiguousarray(np.diff(active, axis=0).T))
+    cumulated = np.zeros((n + 1, m))
+    np.cumsum(values, axis=0, out=cumulated[1:])
+    return column[::2], row[::2], row[1::2], cumulated
+
+
+def run_lengths(values):
+    """
+    Runs of consecutive non-zero hours (events) of all the columns of a 2-D array, all the columns at once
+    :param values:  hourly values (hours x columns), dataframe, series or array, NaN counts as 0
+    :return:        dictionary of arrays: one item per run (sorted by column and start) for 'column', 'start' (first
+                    hour), 'length' (hours) and 'energy' (sum of the run), one item per column for 'max_length' and
+                    'max_energy' (0 for columns without any run)
+    """
+    values = _hourly_columns(values)
+    column, start, end, cumulated = _runs(values)
+    length = end - start
+    # differences of the column cumsum, as in the cumsum/where/ffill expressions
+    energy = cumulated[end, column] - cumulated[start, column]
+    max_length = np.zeros(values.shape[1], dtype=int)
+    max_energy = np.zeros(values.shape[1])
+    np.maximum.at(max_length, column, length)
+    np.maximum.at(max_energy, column, energy)
+    return {'column': column, 'start': start, 'length': length, 'energy': energy, 'max_length': max_length,
+            'max_energy': max_energy}
+
+
+def event_cumsum(values):
+    """
+    Sum of the current event (run of consecutive non-zero hours) up to each hour, 0 outside the events, i.e.
+    x.cumsum().where(x != 0).ffill().fillna(0) - x.cumsum().where(x == 0).ffill().fillna(0) for every column x
+    :param values:  hourly values (hours x columns), dataframe, series or array, NaN counts as 0
+    :return:        array hours x columns
+    """
+    values = _hourly_columns(values)
+    column, start, end, cumulated = _runs(values)
+    length = end - start
+    # rows and columns of all the hours of all the runs
+    rows = np.repeat(start, length) + np.arange(length.sum()) - np.repeat(np.cumsum(length) - length, length)
+    columns = np.repeat(column, length)
+    out = np.zeros(values.shape)
+    out[rows, columns] = cumulated[rows + 1, columns] - np.repeat(cumulated[start, column], length)
+    return out
 
 
 def make_dir(path):
@@ -136,27 +252,36 @@ def invert_dic_df(dic, tablename=''):
 
     :param dic: dictionary of dataframes, with the same columns headers and the same index
     :param tablename: string with the name of the table being processed (for the error msg)
-    :returns: dictionary of dataframes, with swapped headers
+    :returns: dictionary of dataframes, with swapped headers. The dataframes are views of a single 3-D array
+              (items x index x keys), missing columns and NaN are set to 0
     """
     # keys are defined as the keys of the original dictionary, cols are the columns of the original dataframe
-    # items are the keys of the output dictionary, i.e. the columns of the original dataframe    
-    dic_out = {}
+    # items are the keys of the output dictionary, i.e. the columns of the original dataframe
     # First, check that all indexes have the same length:
-    index = dic[list(dic.keys())[0]].index
+    keys = list(dic.keys())
+    index = dic[keys[0]].index
     for key in dic:
         if len(dic[key].index) != len(index):
             sys.exit('The indexes of the data tables "' + tablename + '" are not equal in all the files')
 
-    # Then put the data in a panda Panel with minor orientation:
-    panel = pd.Panel.fromDict(dic, orient='minor')
+    items = pd.Index([])
+    for key in keys:
+        items = items.append(dic[key].columns.difference(items, sort=False))
     # Display a warning if some items are missing in the original data:
-    for item in panel.items:
-        for key in dic.keys():
-            if item not in dic[key].columns:
-                print(
-                    'The column "' + item + '" is not present in "' + key + '" for the "' + tablename + '" data. Zero will be assumed')
-        dic_out[item] = panel[item].fillna(0)
-    return dic_out
+    for key in keys:
+        for item in items.difference(dic[key].columns, sort=False):
+            print('The column "' + str(item) + '" is not present in "' + str(key) + '" for the "' + tablename +
+                  '" data. Zero will be assumed')
+
+    # Stack all the tables at once, the missing columns keep the zeros of the initialization
+    data = np.zeros((len(items), len(index), len(keys)))
+    for k, key in enumerate(keys):
+        df = dic[key]
+        if not df.index.equals(index):
+            df = df.reindex(index)
+        data[items.get_indexer(df.columns), :, k] = df.values.T
+    np.copyto(data, 0, where=np.isnan(data))
+    return {item: pd.DataFrame(data[i], index=index, columns=keys, copy=False) for i, item in enumerate(items)}
 
 
 column_names = ['Unit', 'PowerCapacity', 'Nunits', 'Zone', 'Zone_th', 'Zone_h2', 'Technology', 'Fuel', 'Efficiency',
@@ -175,6 +300,13 @@ column_names_bs = ['Unit', 'PowerCapacity', 'Nunits', 'Zone', 'Zone_th', 'Zone_h
                    'Sector2', 'EfficiencySector2', 'ChargingEfficiencySector2',
                    'Sector3', 'EfficiencySector3', 'ChargingEfficiencySector3']
 
+# Dtypes of the power plant table (define_units): float64 for the numeric columns, categorical for the technology
+# attributes repeated over the units and nullable integer for the number of units
+power_plant_dtypes = dict.fromkeys(column_names_bs, 'float64')
+power_plant_dtypes.update({'Unit': 'object', 'Nunits': 'Int64', 'Zone': 'category', 'Zone_th': 'object',
+                           'Zone_h2': 'object', 'Technology': 'category', 'Fuel': 'category', 'Sort': 'category',
+                           'CHPType': 'category', 'Sector1': 'object', 'Sector2': 'object', 'Sector3': 'object'})
+
 
 def check_leap(year):
     """
@@ -1,27 +1,73 @@
-import math
 import pandas as pd
 import logging
 import sys
 import numpy as np
 
-from .search import column_names  # line to import the dictionary
+from .search import column_names, power_plant_dtypes  # line to import the dictionary
 
 typical_mapping = {'Parameters': ['MinUpTime', 'MinDownTime', 'RampUpRate', 'RampDownRate', 'PartLoadMin',
                                   'MinEfficiency', 'StartUpTime', 'StartUpCost_pu', 'NoLoadCost_pu',
                                   'RampingCost', 'CO2Intensity', 'CHPPowerLossFactor']}
 
 
-def define_units(names):
+def define_units(names, columns=None):
     """
     Define Units and name them according to source model names (1-1 mapping)
     :param names:   list of unit names
+    :param columns: list of columns, column_names by default, typed with power_plant_dtypes
     :return:        power plant database in Dispa-SET readable format
     """
-    power_plants = pd.DataFrame(columns=column_names, index=names)
+    columns = column_names if columns is None else columns
+    index = pd.Index(names)
+    power_plants = pd.DataFrame({column: pd.Series(index=index, dtype=power_plant_dtypes.get(column, 'object'))
+                                 for column in columns}, index=index, columns=columns)
     logging.info('All unit names (' + ' '.join(map(str, names)) + ') assigned to the power plant DataFrame.')
     return power_plants
 
 
+def typed_values(values, parameter):
+    """
+    Values converted to the dtype of a power plant column (power_plant_dtypes, unchanged for the other columns)
+    :param values:      single value, list or array
+    :param parameter:   parameter "PowerCapacity, Efficiency etc."
+    :return:            values with the column dtype (categorical values are left to set_parameter)
+    """
+    dtype = power_plant_dtypes.get(parameter)
+    if dtype == 'float64':
+        return pd.to_numeric(values, errors='coerce') if np.ndim(values) else float(values)
+    if dtype == 'Int64':
+        return pd.array(values, dtype='Int64') if np.ndim(values) else values
+    return values
+
+
+def set_parameter(power_plants, idx, parameter, values):
+    """
+    Set the values of a parameter for some units keeping the column dtype, the new categories of categorical columns
+    are added first
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param idx:             list of power plant indexes
+    :param parameter:       parameter "PowerCapacity, Efficiency etc."
+    :param values:          single value or one value per index
+    :return:                power plant database in Dispa-SET readable format
+    """
+    if parameter not in power_plants.columns:
+        power_plants[parameter] = pd.Series(index=power_plants.index,
+                                            dtype=power_plant_dtypes.get(parameter, 'object'))
+    column = power_plants[parameter]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        new = pd.Index(pd.unique(pd.Series(values if np.ndim(values) else [values], dtype=object).dropna()))
+        new = new.difference(column.cat.categories)
+        if len(new):
+            column = column.cat.add_categories(new)
+            power_plants[parameter] = column
+        # categorical values, also when all the rows are set (loc would replace the column)
+        values = pd.Categorical([values] * len(idx) if np.ndim(values) == 0 else values, dtype=column.dtype)
+    elif np.ndim(values) == 0 and power_plant_dtypes.get(parameter, 'object') == 'object':
+        values = np.array([values] * len(idx), dtype=object)
+    power_plants.loc[idx, parameter] = typed_values(values, parameter)
+    return power_plants
+
+
 def assign_parameters(power_plants, values, parameter):
     """
     Populate power plant database with known parameters such as capacity, technology, fuel (1-1 mapping)
@@ -30,7 +76,13 @@ def assign_parameters(power_plants, values, parameter):
     :param parameter:       parameter "PowerCapacity, Efficiency etc."
     :return:                power plant database in Dispa-SET readable format
     """
-    power_plants[parameter] = values
+    dtype = power_plant_dtypes.get(parameter, 'object')
+    if dtype == 'object':
+        power_plants[parameter] = values
+    else:
+        if np.ndim(values) == 0:
+            values = [values] * len(power_plants)
+        power_plants[parameter] = pd.Series(values, index=power_plants.index, dtype='object').astype(dtype)
     logging.info('Mapping of source model ' + parameter + ' to Dispa-SET ' + parameter + ' complete!')
     return power_plants
 
@@ -54,6 +106,62 @@ def assign_parameters_by_index(power_plants, idx, parameters, values):
     return power_plants
 
 
+def assign_parameters_columnar(power_plants, idx, parameters, values):
+    """
+    Populate power plant database with known parameters for several units at once (one column at a time)
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param idx:             list of power plant indexes
+    :param parameters:      parameter "PowerCapacity, Efficiency etc."
+    :param values:          list with, for each parameter, either a single value or one value per index
+    :return:                power plant database in Dispa-SET readable format
+    """
+    if len(idx) == 0:
+        return power_plants
+    for parameter, value in zip(parameters, values):
+        if np.ndim(value) != 0:
+            value = np.asarray(value, dtype=object)
+        power_plants = set_parameter(power_plants, idx, parameter, value)
+    logging.info('Mapping of source model parameters (' + ', '.join(map(str, parameters)) + ') for ' +
+                 str(len(idx)) + ' units to Dispa-SET readable parameters complete!')
+    return power_plants
+
+
+def lookup_values(table, rows, columns):
+    """
+    Vectorized look-up of table.at[row, column] for a list of (row, column) pairs
+    :param table:   dataframe in which values are looked up, i.e. layers_in_out, storage_characteristics...
+    :param rows:    list of index labels
+    :param columns: list of column labels (one per row) or a single column label for all rows
+    :return:        tuple (values, found), values is a float array with NaN where the (row, column) pair is missing
+    """
+    if isinstance(columns, str):
+        columns = [columns] * len(rows)
+    if not table.index.is_unique:
+        table = table.loc[~table.index.duplicated()]
+    row_positions = table.index.get_indexer(pd.Index(list(rows), dtype=object))
+    column_positions = table.columns.get_indexer(pd.Index(list(columns), dtype=object))
+    found = (row_positions >= 0) & (column_positions >= 0)
+    values = np.full(len(found), np.nan)
+    if found.any():
+        values[found] = table.to_numpy()[row_positions[found], column_positions[found]].astype(float)
+    return values, found
+
+
+def lookup_ratio(table, rows, numerators, denominators):
+    """
+    Vectorized table.at[row, numerator] / table.at[row, denominator], e.g. efficiencies from layers_in_out
+    :param table:           dataframe in which values are looked up
+    :param rows:            list of index labels
+    :param numerators:      list of column labels (one per row) or a single column label
+    :param denominators:    list of column labels (one per row) or a single column label
+    :return:                tuple (ratio, found)
+    """
+    numerator, found_numerator = lookup_values(table, rows, numerators)
+    denominator, found_denominator = lookup_values(table, rows, denominators)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / denominator, found_numerator & found_denominator
+
+
 def assign_gas_units(power_plants, comc=1, gt=1, stur=1, source_name='CCGT', source_fuel='GAS',
                      gt_name='OCGT', comc_name='CCGT', stur_name='STUR', x=True):
     """
@@ -74,154 +182,157 @@ def assign_gas_units(power_plants, comc=1, gt=1, stur=1, source_name='CCGT', sou
         x = 'X'
     else:
         x = ''
-    power_plants.loc[gt_name + '_' + source_fuel, ['PowerCapacity', 'Technology', 'Fuel', 'Sort']] = \
-        [power_plants.loc[source_name, 'PowerCapacity'] * gt / (comc + gt + stur), 'GTUR' + x, source_fuel, 'ELEC']
-    power_plants.loc[comc_name + '_' + source_fuel, ['PowerCapacity', 'Technology', 'Fuel', 'Sort']] = \
-        [power_plants.loc[source_name, 'PowerCapacity'] * comc / (comc + gt + stur), 'COMC' + x, source_fuel, 'ELEC']
-    power_plants.loc[stur_name + '_' + source_fuel, ['PowerCapacity', 'Technology', 'Fuel', 'Sort']] = \
-        [power_plants.loc[source_name, 'PowerCapacity'] * stur / (comc + gt + stur), 'STUR' + x, source_fuel, 'ELEC']
+    capacity = power_plants.loc[source_name, 'PowerCapacity']
+    names = [gt_name + '_' + source_fuel, comc_name + '_' + source_fuel, stur_name + '_' + source_fuel]
+    # new rows keep the column dtypes
+    power_plants = power_plants.reindex(power_plants.index.append(pd.Index(names).difference(power_plants.index,
+                                                                                            sort=False)))
+    power_plants = assign_parameters_columnar(power_plants, names, ['PowerCapacity', 'Technology', 'Fuel', 'Sort'],
+                                              [[capacity * gt / (comc + gt + stur), capacity * comc / (comc + gt + stur),
+                                                capacity * stur / (comc + gt + stur)],
+                                               ['GTUR' + x, 'COMC' + x, 'STUR' + x], source_fuel, 'ELEC'])
     power_plants.drop(source_name, inplace=True)
     return power_plants
 
 
+def index_typical_units(typical_units):
+    """
+    Index the typical units by (Technology, Fuel, CHPType), rows sharing the same key are clustered (mean).
+    CHPType '' gathers all the rows of a (Technology, Fuel) pair whatever their CHPType. When a pair has no
+    back-pressure data, its Extraction data is used for back-pressure units (Fallback column).
+    :param typical_units:   typical units dataframe
+    :return:                dataframe indexed by (Technology, Fuel, CHPType) with the typical_mapping parameters, the
+                            typical PowerCapacity, the number of clustered rows (Count) and Fallback
+    """
+    parameters = typical_mapping['Parameters']
+    rows = {}
+    for keys in [['Technology', 'Fuel'], ['Technology', 'Fuel', 'CHPType']]:
+        for key, group in typical_units.groupby(keys, sort=False):
+            key = tuple(key) + ('',) * (3 - len(key))
+            # Clustering with the mean of each parameter (NaN as soon as one of the values is NaN)
+            values = np.ascontiguousarray(group[parameters].to_numpy(dtype=float).T).mean(axis=1)
+            rows[key] = list(values) + [group['PowerCapacity'].mean(), len(group), False]
+    for (tech, fuel, chp_type), row in list(rows.items()):
+        if chp_type == 'Extraction' and (tech, fuel, 'back-pressure') not in rows:
+            rows[(tech, fuel, 'back-pressure')] = row[:-1] + [True]
+    index = pd.DataFrame.from_dict(rows, orient='index', columns=parameters + ['PowerCapacity', 'Count', 'Fallback'])
+    index.index = pd.MultiIndex.from_tuples(index.index, names=['Technology', 'Fuel', 'CHPType'])
+    return index
+
+
 def assign_typical_values(power_plants, typical_units, exclude=['CHP', 'P2GS'], clustering_type='mean',
                           power_conversion=1000, storage_conversion=1000, dispaset_version='2.5_BS'):
     """
     Function that assigns typical values from the typical units table.
     :param dispaset_version:    dispaset version '2.5_BS'
     :param power_plants:        power plant database in Dispa-SET readable format
-    :param typical_units:       typical units dataframe
+    :param typical_units:       typical units dataframe or its index (index_typical_units)
     :param exclude:             list of units to exclude (located in the SORT column)
     :param clustering_type:     type of clustering when more than one unit of same fuel_technology combination present
     :param power_conversion:    multiplier for converting GW to MW ot any other combination
     :param storage_conversion:  multiplier for converting GWh to MWh ot any other combination
     :return:                    filled in power plant database
     """
-    index_list = list(power_plants.loc[(~power_plants['Sort'].isin(exclude))].index.values.tolist())
-    for index in index_list:
-        series = power_plants.loc[index]
-        tech = series['Technology']
-        fuel = series['Fuel']
-        chp_type = series['CHPType']
-        # TODO: check if ok
-        if 'CHP' in exclude:
-            typical_row = typical_units.loc[(typical_units['Technology'] == tech) & (typical_units['Fuel'] == fuel)]
-        elif 'CHP' not in exclude:
-            typical_row = typical_units.loc[(typical_units['Technology'] == tech) & (typical_units['Fuel'] == fuel) &
-                                            (typical_units['CHPType'] == chp_type)]
-
-            if typical_row.empty & (chp_type == 'back-pressure'):
-                logging.error('There was no correspondence for the COGEN ' + tech + '_' + fuel + '_' + chp_type +
-                              ' in the Typical_Units file (' + index + ')')
-                logging.info('Try to find information for ' + tech + fuel + ' and CHPType : Extraction')
-
-                chp_type2 = 'Extraction'
-                typical_row = typical_units.loc[
-                    (typical_units['Technology'] == tech) & (typical_units['Fuel'] == fuel) & (
-                            typical_units['CHPType'] == chp_type2)]
-                if not typical_row.empty:
-                    logging.info('Data has been found for ' + tech + '_' + fuel +
-                                 ' the CHPType Extraction ; will be set as back-pressure for DS model though')
-        else:
-            logging.error('Something went wrong!')
-            sys.exit(1)
-        # If there is no correspondence in Typical_row
-        if typical_row.empty:
-            logging.error('There was no correspondence for the Technology ' + tech + ' and fuel' + fuel +
-                          ' in the Typical_Units file' + '(' + index + '). So the Technology ' + tech + ' and fuel ' +
-                          fuel + ' will be dropped from dataset')
-
-            # FIXME: IS THIS the best way to handle the lack of presence in Typical_Units ? - TO IMPROVE
-            if 'CHP' in exclude:
-                power_plants.drop(index, inplace=True)
-
-        # If the unit is present in Typical_Units.csv
-        else:
-            for carac in typical_mapping['Parameters']:
-                # if CO2 is already assigned skipp it, otherwise assign values from typical units
-                if carac == 'CO2Intensity':
-                    if power_plants.loc[index, 'CO2Intensity'] in [np.nan, np.NAN, 'nan', '']:
-                        value = np.array(typical_row[carac].values)
-                    else:
-                        value = np.array([power_plants.loc[index, 'CO2Intensity']])
-                else:
-                    value = typical_row[carac].values
-
-                # Adding the needed characteristics of typical units
-                # Take into account the cases where the array is of length :
-                #    1) nul : no value, the thing is empty
-                #    2) 1 : then everything is fine
-                #    3) > 1 : then .. What do we do ?
-                if len(value) == 0:
-                    logging.error('For characteristics ' + carac + ' no correspondence has been found for the '
-                                  'Technology ' + tech + ' and Fuel ' + fuel + '(' + index + ')')
-                elif len(value) == 1:  # Normal case
-                    value = float(value)
-                    power_plants.loc[index, carac] = value
-                elif len(value) > 1:
-                    if clustering_type == 'mean':
-                        power_plants.loc[index, carac] = value.mean()
-                        logging.warning('For characteristics ' + carac + ' size of value is > 1 for the Technology ' +
-                                        tech + ' and Fuel ' + fuel + '. Mean value will be assigned')
-                    else:
-                        logging.error('Clustering type: ' + clustering_type + ' selected!! ' + clustering_type +
-                                      'is not mean or median. Change!')
-                        sys.exit(1)
-
-                if 'CHP' not in exclude:
-                    # Fine-tuning depending on the carac and different types of TECH
-                    if (carac == 'CHPPowerLossFactor') & (chp_type == 'back-pressure'):
-                        if value > 0:
-                            logging.warning('The CHP back-pressure unit ' + tech + '_' + fuel +
-                                            ' has been assigned a non-0 CHPPowerLossFactor. '
-                                            'This value has to be forced to 0 to work with DISPA-SET')
-                            power_plants.loc[index, carac] = 0
-                # END of the carac loop
-
-            # 1) Capacity from source model is in GW/GWh -> set it in MW/MWh
-            power_plants.loc[index, 'PowerCapacity'] = float(
-                power_plants.loc[index, 'PowerCapacity']) * power_conversion
-            power_plants.loc[index, 'STOCapacity'] = float(power_plants.loc[index, 'STOCapacity']) * storage_conversion
-
-            if ('P2GS' not in exclude) and (dispaset_version == '2.5_BS'):
-                power_plants.loc[index, 'STOMaxChargingPower'] = float(power_plants.loc[index, 'STOMaxChargingPower']) \
-                                                                 * storage_conversion
-
-            # 2) Divide the capacity in assets into N_Units
-            # Take into account the case where PowerCapacity in TypicalUnits is 0 - (e.g for BEVS, P2HT)
-            # The solution is to set the PowerCapacity as the one given by source model and set 1 Nunits
-            if typical_row['PowerCapacity'].mean() == 0.:
-                number_units = 1
-                power_plants.loc[index, 'Nunits'] = number_units
-                # If the technology is not implemented in source model, PowerCapacity will be 0
-            elif (float(typical_row['PowerCapacity'].mean()) != 0) & (float(series['PowerCapacity']) == 0.):
-                if 'P2GS' not in exclude:
-                    if dispaset_version == '2.5':
-                        number_units = 0
-                        power_plants.loc[index, 'Nunits'] = number_units
-                    elif dispaset_version == '2.5_BS':
-                        number_units = 1
-                        power_plants.loc[index, 'Nunits'] = number_units
-                else:
-                    number_units = 0
-                    power_plants.loc[index, 'Nunits'] = number_units
-            elif (float(typical_row['PowerCapacity'].mean()) != 0) & (float(series['PowerCapacity']) > 0.):
-                number_units = math.ceil(float(power_plants.loc[index, 'PowerCapacity']) /
-                                         float(typical_row['PowerCapacity'].mean()))
-                power_plants.loc[index, 'Nunits'] = math.ceil(number_units)
-                power_plants.loc[index, 'PowerCapacity'] = float(power_plants.loc[index, 'PowerCapacity']) / \
-                                                           math.ceil(number_units)
-
-            # 3) P2HT Storage Finish the correspondence for Heat Storage - divide it by the number of units to have
-            # it equally shared among the cluster of units If there is a Thermal Storage and then a STOCapacity at
-            # the index
-            if float(power_plants.loc[index, 'STOCapacity']) > 0:
-                # Access the row and column of a dataframe : to get to STOCapacity of the checked tech
-                if number_units >= 1:
-                    power_plants.loc[index, 'STOCapacity'] = \
-                        float(power_plants.loc[index, 'STOCapacity']) / number_units
-                    power_plants.loc[index, 'STOMaxChargingPower'] = \
-                        float(power_plants.loc[index, 'STOMaxChargingPower']) / number_units
+    if list(typical_units.index.names) != ['Technology', 'Fuel', 'CHPType']:
+        typical_units = index_typical_units(typical_units)
+    parameters = typical_mapping['Parameters']
+    chp = 'CHP' not in exclude
+    units = power_plants.loc[~power_plants['Sort'].isin(exclude)]
+    chp_type = units['CHPType'] if chp else pd.Series('', index=units.index)
+    keys = pd.MultiIndex.from_arrays([units['Technology'], units['Fuel'], chp_type])
+    typical = typical_units.reindex(keys)
+    typical.index = units.index
+    found = typical['Count'].notna() & ~typical['Fallback'].fillna(False).astype(bool)
+    back_pressure = (chp_type == 'back-pressure') if chp else pd.Series(False, index=units.index)
+
+    for (tech, fuel), idx in units.loc[back_pressure & ~found].groupby(['Technology', 'Fuel'],
+                                                                       observed=True).groups.items():
+        logging.error('There was no correspondence for the COGEN ' + tech + '_' + fuel + '_back-pressure in the '
+                      'Typical_Units file (' + ', '.join(idx) + ')')
+        logging.info('Try to find information for ' + tech + fuel + ' and CHPType : Extraction')
+        if typical.loc[idx[0], 'Count'] > 0:
+            logging.info('Data has been found for ' + tech + '_' + fuel +
+                         ' the CHPType Extraction ; will be set as back-pressure for DS model though')
+    found = typical['Count'].notna()
+
+    # If there is no correspondence in Typical_Units
+    missing = units.loc[~found, ['Technology', 'Fuel']].astype(object).fillna('')
+    for (tech, fuel), idx in missing.groupby(['Technology', 'Fuel']).groups.items():
+        logging.error('There was no correspondence for the Technology ' + tech + ' and fuel' + fuel +
+                      ' in the Typical_Units file' + '(' + ', '.join(idx) + '). So the Technology ' + tech +
+                      ' and fuel ' + fuel + ' will be dropped from dataset')
+    # FIXME: IS THIS the best way to handle the lack of presence in Typical_Units ? - TO IMPROVE
+    if not chp:
+        power_plants = power_plants.drop(missing.index)
+
+    units, typical, back_pressure = units.loc[found], typical.loc[found], back_pressure.loc[found]
+    if len(units) == 0:
+        return power_plants
+    clustered = units.loc[typical['Count'] > 1, ['Technology', 'Fuel']].drop_duplicates()
+    if clustering_type != 'mean' and not clustered.empty:
+        logging.error('Clustering type: ' + clustering_type + ' selected!! ' + clustering_type +
+                      'is not mean or median. Change!')
+        sys.exit(1)
+    for tech, fuel in clustered.values:
+        logging.warning('For characteristics size of value is > 1 for the Technology ' + tech + ' and Fuel ' + fuel +
+                        '. Mean value will be assigned')
+
+    # Adding the needed characteristics of typical units, if CO2 is already assigned keep it
+    values = {carac: typical[carac].to_numpy(dtype=object) for carac in parameters}
+    co2_intensity = units['CO2Intensity']
+    assigned = (co2_intensity.notna() & ~co2_intensity.isin(['nan', ''])).to_numpy()
+    values['CO2Intensity'][assigned] = co2_intensity.to_numpy()[assigned]
+    if chp:
+        # Fine-tuning depending on the carac and different types of TECH
+        forced = (back_pressure & (typical['CHPPowerLossFactor'] > 0)).to_numpy()
+        for tech, fuel in units.loc[forced, ['Technology', 'Fuel']].drop_duplicates().values:
+            logging.warning('The CHP back-pressure unit ' + tech + '_' + fuel +
+                            ' has been assigned a non-0 CHPPowerLossFactor. '
+                            'This value has to be forced to 0 to work with DISPA-SET')
+        values['CHPPowerLossFactor'][forced] = 0
+    power_plants = assign_parameters_columnar(power_plants, list(units.index), parameters,
+                                              [values[carac] for carac in parameters])
+
+    # 1) Capacity from source model is in GW/GWh -> set it in MW/MWh
+    source_capacity = units['PowerCapacity'].to_numpy(dtype=float)
+    power_capacity = source_capacity * power_conversion
+    storage_capacity = units['STOCapacity'].to_numpy(dtype=float) * storage_conversion
+    max_charging_power = units['STOMaxChargingPower'].to_numpy(dtype=float)
+    if ('P2GS' not in exclude) and (dispaset_version == '2.5_BS'):
+        max_charging_power = max_charging_power * storage_conversion
+        charging_power_assigned = np.ones(len(units), dtype=bool)
+    else:
+        charging_power_assigned = np.zeros(len(units), dtype=bool)
+
+    # 2) Divide the capacity in assets into N_Units
+    # Take into account the case where PowerCapacity in TypicalUnits is 0 - (e.g for BEVS, P2HT)
+    # The solution is to set the PowerCapacity as the one given by source model and set 1 Nunits
+    # If the technology is not implemented in source model, PowerCapacity will be 0
+    typical_capacity = typical['PowerCapacity'].to_numpy(dtype=float)
+    number_units = np.full(len(units), np.nan)
+    not_implemented = 1 if ('P2GS' not in exclude) and (dispaset_version == '2.5_BS') else 0
+    if ('P2GS' not in exclude) and (dispaset_version not in ['2.5', '2.5_BS']):
+        not_implemented = np.nan
+    number_units[(typical_capacity != 0.) & (source_capacity == 0.)] = not_implemented
+    split = ~np.isnan(typical_capacity) & (typical_capacity != 0.) & (source_capacity > 0.)
+    number_units[split] = np.ceil(power_capacity[split] / typical_capacity[split])
+    power_capacity[split] = power_capacity[split] / number_units[split]
+    number_units[typical_capacity == 0.] = 1
+    units_assigned = ~np.isnan(number_units)
+
+    # 3) P2HT Storage Finish the correspondence for Heat Storage - divide it by the number of units to have
+    # it equally shared among the cluster of units If there is a Thermal Storage and then a STOCapacity at the index
+    shared = (storage_capacity > 0) & (number_units >= 1)
+    storage_capacity[shared] = storage_capacity[shared] / number_units[shared]
+    max_charging_power[shared] = max_charging_power[shared] / number_units[shared]
+    charging_power_assigned |= shared
+
+    power_plants = assign_parameters_columnar(power_plants, list(units.index), ['PowerCapacity', 'STOCapacity'],
+                                              [power_capacity, storage_capacity])
+    power_plants = assign_parameters_columnar(power_plants, list(units.index[charging_power_assigned]),
+                                              ['STOMaxChargingPower'], [max_charging_power[charging_power_assigned]])
+    power_plants = assign_parameters_columnar(power_plants, list(units.index[units_assigned]), ['Nunits'],
+                                              [[int(n) for n in number_units[units_assigned]]])
     return power_plants
 
 
@@ -0,0 +1,104 @@
+"""
+Convergence statistics of the bi-directional soft-linking
+Input : DS results of each iteration, as they are produced (or read from the results store)
+Output : summary table with, for each iteration and variable, the total, the maximum, the number of non-zero hours and
+         the largest consecutive event (energy and hours)
+
+The statistics are updated from each result with the run-length kernel (common.run_lengths), without keeping the hourly
+series of the previous iterations: the consecutive events that are still open at the end of a series are carried over
+to the next chunk of the same iteration.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ..common import run_lengths
+
+# Tracked variable: DS result
+convergence_variables = {'LostLoad': 'LostLoad_MaxPower',
+                         'ShedLoad': 'OutputShedLoad',
+                         'Curtailment': 'OutputCurtailedPower',
+                         'Reserve': 'OutputDemand_3U',
+                         'Error': 'OutputOptimizationCheck'}
+
+# Statistics of the summary table (units of the DS results: MWh, MW and h)
+convergence_statistics = ['total', 'max', 'hours', 'max_consecutive', 'max_consecutive_hours']
+
+
+class ConvergenceTracker(object):
+    """
+    Incremental convergence statistics of the soft-linking iterations. Call update with the DS results of each
+    iteration (or add with consecutive chunks of a series) and summary to get the table plotted by plot_convergence.
+    Missing values are counted as 0.
+    """
+
+    def __init__(self, variables=None):
+        """
+        :param variables:   dictionary tracked variable: DS result, convergence_variables by default
+        """
+        self.variables = dict(convergence_variables if variables is None else variables)
+        self._state = OrderedDict()
+
+    def add(self, iteration, variable, values):
+        """
+        Update the statistics of a variable with the next hours of an iteration
+        :param iteration:   name of the iteration
+        :param variable:    name of the variable
+        :param values:      hourly values (series, 1-D array or dataframe/2-D array summed over its columns)
+        """
+        values = np.nan_to_num(np.asarray(values, dtype=float))
+        if values.ndim == 2:
+            values = values.sum(axis=1)
+        state = self._state.setdefault((iteration, variable), {'total': 0., 'max': -np.inf, 'hours': 0,
+                                                               'max_consecutive': 0., 'max_consecutive_hours': 0,
+                                                               'run_sum': 0., 'run_hours': 0})
+        if len(values) == 0:
+            return
+        runs = run_lengths(values)
+        energy, length = runs['energy'], runs['length']
+        if len(length):
+            if runs['start'][0] == 0:
+                # continuation of the event open at the end of the previous chunk
+                energy, length = energy.copy(), length.copy()
+                energy[0] += state['run_sum']
+                length[0] += state['run_hours']
+            state['max_consecutive'] = max(state['max_consecutive'], energy.max())
+            state['max_consecutive_hours'] = max(state['max_consecutive_hours'], int(length.max()))
+        open_event = len(length) and runs['start'][-1] + runs['length'][-1] == len(values)
+        state['run_sum'], state['run_hours'] = (energy[-1], int(length[-1])) if open_event else (0., 0)
+        state['total'] += values.sum()
+        state['max'] = max(state['max'], values.max())
+        state['hours'] += int(runs['length'].sum())
+
+    def update(self, iteration, results):
+        """
+        Update the statistics with the DS results of an iteration (empty results count as 0)
+        :param iteration:   name of the iteration
+        :param results:     DS results (dictionary or results store mapping)
+        """
+        for variable, key in self.variables.items():
+            result = results.get(key)
+            if result is None or len(result) == 0:
+                self.add(iteration, variable, np.zeros(0))
+            else:
+                self.add(iteration, variable, result)
+
+    def iterations(self):
+        """
+        Iterations in the order they were first updated
+        """
+        return list(OrderedDict.fromkeys(iteration for iteration, _ in self._state))
+
+    def summary(self):
+        """
+        Summary table: iterations as rows, (variable, statistic) as columns
+        """
+        data = OrderedDict()
+        for (iteration, variable), state in self._state.items():
+            for statistic in convergence_statistics:
+                value = state[statistic]
+                data.setdefault((variable, statistic), {})[iteration] = 0. if value == -np.inf else value
+        summary = pd.DataFrame(data, index=self.iterations())
+        summary.columns = pd.MultiIndex.from_tuples(summary.columns, names=['variable', 'statistic'])
+        return summary
@@ -3,45 +3,38 @@ import pandas as pd
 import numpy as np
 
 from ..constants import mapping
+from .convergence import ConvergenceTracker
 
 
-def plot_convergence(LostLoad, ShedLoad, Curtailment, Error, iterations, nrows=6, ncols=1, figsize=(8, 12),
-                     gridspec_kw={'height_ratios': [1, 1, 1, 1, 1, 1]}, save_path='', curtailment=False):
-    Error = Error / 1e9
-    data_ens_curt = pd.DataFrame(index=['LostLoad', 'ShedLoad', 'Curtailment'], columns=iterations)
-    data_ens_curt.loc['LostLoad', :] = LostLoad.sum(axis=0) / 1e6  # to TWh
-    data_ens_curt.loc['ShedLoad', :] = ShedLoad.sum(axis=0) / 1e6  # to TWh
-    data_ens_curt.loc['Curtailment', :] = Curtailment.sum(axis=0) / 1e6  # to TWh
-
-    data_ens_curt_max = pd.DataFrame(index=['LostLoad', 'ShedLoad', 'Curtailment'], columns=iterations)
-    data_ens_curt_max.loc['LostLoad', :] = LostLoad.max(axis=0) / 1e3  # to GW
-    data_ens_curt_max.loc['ShedLoad', :] = ShedLoad.max(axis=0) / 1e3  # to GW
-    data_ens_curt_max.loc['Curtailment', :] = Curtailment.max(axis=0) / 1e3  # to GW
-
-    a = LostLoad != 0
-    b = ShedLoad != 0
-    c = Curtailment != 0
-    LostLoad_cum = LostLoad.cumsum().where(a).ffill().fillna(0) - LostLoad.cumsum().where(~a).ffill().fillna(0)
-    ShedLoad_cum = ShedLoad.cumsum().where(b).ffill().fillna(0) - ShedLoad.cumsum().where(~b).ffill().fillna(0)
-    Curtailment_cum = Curtailment.cumsum().where(c).ffill().fillna(0) - Curtailment.cumsum().where(~c).ffill().fillna(0)
-    data_ens_curt_cons = pd.DataFrame(index=['LostLoad', 'ShedLoad', 'Curtailment'], columns=iterations)
-    data_ens_curt_cons.loc['LostLoad', :] = LostLoad_cum.max(axis=0) / 1e6  # to TWh
-    data_ens_curt_cons.loc['ShedLoad', :] = ShedLoad_cum.max(axis=0) / 1e6  # to TWh
-    data_ens_curt_cons.loc['Curtailment', :] = Curtailment_cum.max(axis=0) / 1e6  # to TWh
-
-    data_ens_curt_count = pd.DataFrame(index=['LostLoad', 'ShedLoad', 'Curtailment'], columns=iterations)
-    data_ens_curt_count.loc['LostLoad', :] = a.sum(axis=0)
-    data_ens_curt_count.loc['ShedLoad', :] = b.sum(axis=0)
-    data_ens_curt_count.loc['Curtailment', :] = c.sum(axis=0)
-
-    a_cum = a.cumsum().where(a).ffill().fillna(0) - a.cumsum().where(~a).ffill().fillna(0)
-    b_cum = b.cumsum().where(b).ffill().fillna(0) - b.cumsum().where(~b).ffill().fillna(0)
-    c_cum = c.cumsum().where(c).ffill().fillna(0) - c.cumsum().where(~c).ffill().fillna(0)
-
-    data_ens_curt_cum_count = pd.DataFrame(index=['LostLoad', 'ShedLoad', 'Curtailment'], columns=iterations)
-    data_ens_curt_cum_count.loc['LostLoad', :] = a_cum.max(axis=0)
-    data_ens_curt_cum_count.loc['ShedLoad', :] = b_cum.max(axis=0)
-    data_ens_curt_cum_count.loc['Curtailment', :] = c_cum.max(axis=0)
+def plot_convergence(LostLoad=None, ShedLoad=None, Curtailment=None, Error=None, iterations=None, nrows=6, ncols=1,
+                     figsize=(8, 12), gridspec_kw={'height_ratios': [1, 1, 1, 1, 1, 1]}, save_path='', curtailment=False,
+                     summary=None):
+    """
+    Plot the soft-linking convergence statistics
+    :param LostLoad:        hourly lost load, one column per iteration (not needed if summary is given)
+    :param ShedLoad:        hourly shed load, one column per iteration (not needed if summary is given)
+    :param Curtailment:     hourly curtailment, one column per iteration (not needed if summary is given)
+    :param Error:           optimization check, one column per iteration (not needed if summary is given)
+    :param iterations:      names of the iterations (all the iterations of the summary if None)
+    :param summary:         ConvergenceTracker summary table
+    """
+    if summary is None:
+        tracker = ConvergenceTracker()
+        for iteration in iterations:
+            for variable, df in [('LostLoad', LostLoad), ('ShedLoad', ShedLoad), ('Curtailment', Curtailment),
+                                 ('Error', Error)]:
+                tracker.add(iteration, variable, df[iteration])
+        summary = tracker.summary()
+    if iterations is None:
+        iterations = list(summary.index)
+    summary = summary.loc[iterations]
+    variables = ['LostLoad', 'ShedLoad', 'Curtailment']
+    data_ens_curt = summary.xs('total', axis=1, level='statistic').loc[:, variables].T / 1e6  # to TWh
+    data_ens_curt_max = summary.xs('max', axis=1, level='statistic').loc[:, variables].T / 1e3  # to GW
+    data_ens_curt_cons = summary.xs('max_consecutive', axis=1, level='statistic').loc[:, variables].T / 1e6  # to TWh
+    data_ens_curt_count = summary.xs('hours', axis=1, level='statistic').loc[:, variables].T
+    data_ens_curt_cum_count = summary.xs('max_consecutive_hours', axis=1, level='statistic').loc[:, variables].T
+    error_max = summary[('Error', 'max')] / 1e9
 
     all_colors = {'LostLoad': 'orange',
                   'ShedLoad': 'green',
@@ -91,8 +84,8 @@ def plot_convergence(LostLoad, ShedLoad, Curtailment, Error, iterations, nrows=6
                                                             markersize=10.0,
                                                             marker='o', legend=None)
 
-    Error.max().T.plot(ax=axes[5], width=0.8, kind='bar', stacked=True, color='red', alpha=0.8, legend=None,
-                       title='Optimization error - check', ylabel='billion EUR')
+    error_max.plot(ax=axes[5], width=0.8, kind='bar', stacked=True, color='red', alpha=0.8, legend=None,
+                   title='Optimization error - check', ylabel='billion EUR')
 
     for i in [0, 1, 2, 3, 4, 5]:
         if i == 0 or i == 2:
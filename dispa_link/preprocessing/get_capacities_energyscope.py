@@ -1,19 +1,34 @@
 import logging
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
 import numpy as np
 import pandas as pd
 
-from ..constants import mapping, n_TD  # line to import the dictionary
-from ..dispa_link_functions import define_units, assign_parameters, assign_gas_units, assign_parameters_by_index, \
-    assign_zone, assign_typical_values
-from ..preprocessing.get_timeseries_energyscope import get_x_demand
-from ..search import sto_dhn, write_csv_files, column_names_bs, column_names  # line to import the dictionary
+from ..constants import mapping  # line to import the dictionary
+from ..dispa_link_functions import define_units, assign_parameters, assign_gas_units, assign_parameters_columnar, \
+    assign_zone, assign_typical_values, index_typical_units, lookup_values, lookup_ratio
+from ..search import write_csv_files, column_names_bs, column_names, es_attribute, \
+    get_es_mapping  # line to import the dictionary
+
+# Heat node (assign_zone name) of heat producing units and thermal storages, based on the ES technology prefix
+heat_zone_prefixes = {'DEC_': 'DEC', 'DHN_': 'DHN', 'IND_': 'IND'}
+storage_zone_prefixes = {'TS_DEC_': 'DEC', 'TS_DHN_': 'DHN', 'TS_HIGH_': 'IND'}
+# Layer in storage_eff_in/storage_eff_out used by each kind of storage (ELECTRICITY when no prefix matches)
+storage_layers = {'TS_DEC_': 'HEAT_LOW_T_DECEN', 'TS_DHN_': 'HEAT_LOW_T_DHN', 'TS_HIGH_': 'HEAT_HIGH_T'}
+# Typical unit used for the efficiency of the gas units instead of layers_in_out
+gas_units_efficiency = {'OCGT_GAS': 'GTUR', 'CCGT_GAS': 'COMC', 'STUR_GAS': 'STUR'}
+# Units consuming X (boundary sector fuels) and generating power
+x_units = {'Technology': ['COMCX', 'GTURX', 'ICENX', 'STURX'], 'Fuel': ['AMO', 'GAS', 'BIO', 'OIL', 'HRD', 'WST']}
+# Boundary sectors and the ES storage associated to them
+boundary_sectors = {'ES_H2': 'H2_STORAGE', 'ES_AMO': 'AMMONIA_STORAGE', 'ES_IND': 'TS_HIGH_TEMP',
+                    'ES_DHN': 'TS_DHN_SEASONAL', 'ES_DEC': None, 'ES_OIL': None, 'ES_HRD': None, 'ES_WST': None,
+                    'ES_BIO': None}
 
 
 def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_csv=True, file_name='PowerPlants',
                            technology_threshold=0, storage_threshold=0.5, t_env=273.15 + 35, t_dhn=90, t_ind=120,
-                           dispaset_version='2.5', config_link=None, ds_inputs=None, i=0):
+                           dispaset_version='2.5', config_link=None, ds_inputs=None, i=0, es_mapping=None):
     """
         Data needed for the Power Plants in DISPA-SET (ES means from ES): 
         - Unit Name
@@ -66,19 +81,23 @@ def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_cs
     # ---- Do the mapping between ES and DS ----- #
     ###############################################
 
-    power_plants = define_units(names=es_outputs['assets'].index)
+    # ES mapping table: given (table or file), ESMapping file of the link configuration or compiled from the mapping
+    # dictionaries
+    if es_mapping is None and config_link is not None:
+        es_mapping = config_link.get('ESMapping')
+    es_mapping = get_es_mapping(es_mapping)
+
+    power_plants = define_units(names=es_outputs['assets'].index, columns=column_names_bs + ['Sort'])
     # Fill in the capacity value at Power Capacity column
     power_plants = assign_parameters(power_plants, es_outputs['assets']['f'], 'PowerCapacity')
     # Watch out for STO_TECH /!\ - PowerCapacity in DS is MW, where f is in GW/GWh
     # Here everything is in GW/GWh
 
-    # Fill in the column Technology, Fuel according to the mapping Dictionary defined here above
-    power_plants = assign_parameters(power_plants, power_plants.index.to_series().map(mapping['ES']['TECH']),
-                                     'Technology')
-    power_plants = assign_parameters(power_plants, power_plants.index.to_series().map(mapping['ES']['FUEL']), 'Fuel')
-
+    # Fill in the column Technology, Fuel according to the mapping table (one join)
     # the column Sort is added to do some conditional changes for CHP and STO units
-    power_plants = assign_parameters(power_plants, power_plants.index.to_series().map(mapping['ES']['SORT']), 'Sort')
+    attributes = es_mapping.reindex(power_plants.index)
+    for parameter, attribute in [('Technology', 'TECH'), ('Fuel', 'FUEL'), ('Sort', 'SORT')]:
+        power_plants = assign_parameters(power_plants, attributes[attribute], parameter)
 
     # Get rid of technology that do not have a Sort category + HeatSlack + Thermal Storage
     index_to_drop = power_plants[
@@ -107,258 +126,41 @@ def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_cs
     electricity_tech = list(power_plants.loc[power_plants['Sort'] == 'ELEC'].index)
     storage_tech = list(power_plants.loc[power_plants['Sort'] == 'STO'].index)
     p2gs_tech = list(power_plants.loc[power_plants['Sort'] == 'P2GS'].index)
-    h2_sto_tech = list(power_plants.loc[power_plants['Sort'] == 'P2GS_STO'].index)
-    thms = list(original_units.loc[original_units['Technology'] == 'THMS'].index)
     heat_tech_all = p2ht_tech + chp_tech + heat_tech
 
-    # Variable used later in CHP and P2HT units regarding THMS of DHN units
-    tech_sto_daily = 'TS_DHN_DAILY'
-    sto_daily_cap = float(original_units.at[tech_sto_daily, 'PowerCapacity'])
-    sto_daily_losses = es_outputs['storage_characteristics'].at[tech_sto_daily, 'storage_losses']
-    tech_sto_seasonal = 'TS_DHN_SEASONAL'
-    sto_seasonal_cap = float(original_units.at[tech_sto_seasonal, 'PowerCapacity'])
-    sto_seasonal_losses = es_outputs['storage_characteristics'].at[tech_sto_seasonal, 'storage_losses']
-
-    boundary_sector_inputs = pd.DataFrame(columns=['Sector', 'STOCapacity', 'STOSelfDischarge', 'STOMinSOC',
-                                                   'MaxFlexDemand', 'MaxFlexSupply'])
-
     # %% --------------- Changes only for ELEC Units  --------------- TO CHECK
     #      - Efficiency
-    for tech in electricity_tech:
-        tech_resource = mapping['ES']['FUEL_ES'][tech]  # gets the correct column electricity to look up per CHP tech
-        try:
-            if tech == 'OCGT_GAS':
-                efficiency = typical_units.loc[(typical_units['Technology'] == 'GTUR') &
-                                               (typical_units['Fuel'] == 'GAS'), 'Efficiency'].values[0]
-            elif tech == 'CCGT_GAS':
-                efficiency = typical_units.loc[(typical_units['Technology'] == 'COMC') &
-                                               (typical_units['Fuel'] == 'GAS'), 'Efficiency'].values[0]
-            elif tech == 'STUR_GAS':
-                efficiency = typical_units.loc[(typical_units['Technology'] == 'STUR') &
-                                               (typical_units['Fuel'] == 'GAS'), 'Efficiency'].values[0]
-            # If the TECH is ELEC , Efficiency is simply abs(ELECTRICITY/RESSOURCES)
-            else:
-                efficiency = abs(es_outputs['layers_in_out'].at[tech, 'ELECTRICITY'] /
-                                 es_outputs['layers_in_out'].at[tech, tech_resource])
-            power_plants = assign_parameters_by_index(power_plants, tech, ['Efficiency'], [efficiency])
-        except:
-            logging.warning(' Technology ' + tech + ' has not been found in layers_in_out')
+    power_plants = map_elec_units(power_plants, electricity_tech, es_outputs, typical_units, es_mapping=es_mapping)
 
     # %% --------------- Changes only for P2GS Units  --------------- TO CHECK
     #      - Efficiency
-    #       -
     #       Then comes the associated storage
-    #       -
-    for tech in p2gs_tech:
-        # gets the correct column electricity to look up per CHP tech
-        tech_resource = mapping['ES']['FUEL_ES'][tech]
-        try:
-            # If the TECH is ELEC , Efficiency is simply abs(ELECTRICITY/RESSOURCES) - TO CHECK -------------------
-            efficiency = abs(es_outputs['layers_in_out'].at[tech, 'H2'] /
-                             es_outputs['layers_in_out'].at[tech, tech_resource])
-            if dispaset_version == '2.5':
-                power_plants = assign_parameters_by_index(power_plants, tech, ['Efficiency'], [efficiency])
-            elif dispaset_version == '2.5_BS':
-                # FIXME: check if ELY and FC are properly mapped
-                efficiency_high_temp = es_outputs['layers_in_out'].at[tech, 'HEAT_HIGH_T'] / \
-                                       es_outputs['layers_in_out'].at[tech, tech_resource]
-                efficiency_dhn = es_outputs['layers_in_out'].at[tech, 'HEAT_LOW_T_DHN'] / \
-                                 es_outputs['layers_in_out'].at[tech, tech_resource]
-                power_plants = assign_parameters_by_index(power_plants, tech,
-                                                          ['Efficiency', 'ChargingEfficiencySector1',
-                                                           'Sector2', 'ChargingEfficiencySector2',
-                                                           'Sector3', 'ChargingEfficiencySector3'],
-                                                          [1, efficiency, 'ES_IND', -efficiency_high_temp,
-                                                           'ES_DHN', -efficiency_dhn])
-            else:
-                logging.error('Wrong Dispa-SET version selected')
-                sys.exit(1)
-        except:
-            logging.warning(' Technology ' + tech + ' has not been found in layers_in_out')
-
-        try:
-            # Associate the right P2GS Storage ith the P2GS production unit - TO DO  ----------------------------
-            p2gs_sto = mapping['ES']['P2GS_STORAGE'][tech]
-            # OK
-        except:
-            logging.warning(' Associated P2GS storage ' + p2gs_sto + 'is not referenced in the dictionary')
-
-        try:
-            # For other Tech ' f' in ES = PowerCapacity, whereas for STO_TECH ' f' = STOCapacity
-            storage_capacity = power_plants.at[p2gs_sto, 'PowerCapacity']
-            storage_self_discharge = es_outputs['storage_characteristics'].at[p2gs_sto, 'storage_losses']
-            storage_charging_efficiency = es_outputs['storage_eff_in'].at[p2gs_sto, 'H2']
-            # GW to MW
-            storage_max_charge_power = float(storage_capacity) / \
-                                       es_outputs['storage_characteristics'].at[p2gs_sto, 'storage_charge_time'] * 1000
-            if dispaset_version == '2.5':
-                power_plants = assign_parameters_by_index(power_plants, tech,
-                                                          ['STOCapacity', 'STOSelfDischarge', 'STOMaxChargingPower',
-                                                           'STOChargingEfficiency'],
-                                                          [storage_capacity, storage_self_discharge,
-                                                           storage_max_charge_power, storage_charging_efficiency])
-                # power_plants.loc[
-                #     power_plants.index == tech, ['STOCapacity', 'STOSelfDischarge', 'STOMaxChargingPower',
-                #                                  'STOChargingEfficiency']] = [storage_capacity, storage_self_discharge,
-                #                                                               storage_max_charge_power,
-                #                                                               storage_charging_efficiency]
-            elif dispaset_version == '2.5_BS':
-                # Adjust P2GS unit to boundary sector conditions
-                # FIXME: i need to be generic so that it is also possible to destinguish between ELY and FC
-                storage_max_charge_power = power_plants.loc[power_plants.index == tech, 'PowerCapacity']
-                power_plants = assign_parameters_by_index(power_plants, tech, ['STOMaxChargingPower', 'PowerCapacity'],
-                                                          [storage_max_charge_power, 0])
-        except:
-            logging.warning(' Technology ' + p2gs_sto + ' has not been found in STO_eff_out/eff_in/_characteristics')
-
-        if dispaset_version == '2.5':
-            if zone is None:
-                power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_h2'], ['ES_H2'])
-            else:
-                power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_h2'], [zone + '_H2'])
-
-        elif dispaset_version == '2.5_BS':
-            h2_ts = get_x_demand(es_outputs['h2_layer'], td_df, config_link['DateRange'], write_csv=False,
-                                 dispaset_version='2.5_BS')
-            for z in h2_ts.columns:
-                boundary_sector_inputs = assign_parameters_by_index(boundary_sector_inputs, z,
-                                                                    ['MaxFlexDemand', 'Sector', 'STOCapacity',
-                                                                     'STOSelfDischarge'],
-                                                                    [h2_ts[z].max(), z, storage_capacity,
-                                                                     storage_self_discharge])
-            if zone is None:
-                power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], ['ES_H2'])
-            else:
-                power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone + '_H2'])
-
-        else:
-            logging.error('Wrong Dispa-SET version selected')
-            sys.exit(1)
+    power_plants = map_p2gs_units(power_plants, p2gs_tech, es_outputs, zone=zone, dispaset_version=dispaset_version,
+                                  es_mapping=es_mapping)
 
     # %% --------------- Changes only for CHP Units  --------------- TO CHECK
     #      - Efficiency
     #      - PowerToTheatRatio
     #      - CHPType
-
-    # for each CHP_tech, we will extract the PowerToHeat Ratio and add it to the PowerPlants dataFrame
-    for tech in chp_tech:
-        tech_resource = mapping['ES']['FUEL_ES'][tech]  # gets the correct column resources to look up per CHP tech
-        tech_heat = mapping['ES']['CHP_HEAT'][tech]  # gets the correct column heat to look up per CHP tech
-        try:
-            power_to_heat_ratio = abs(es_outputs['layers_in_out'].at[tech, 'ELECTRICITY'] /
-                                      es_outputs['layers_in_out'].at[tech, tech_heat])
-            # If the TECH is CHP  , Efficiency is simply abs(ELECTRICITY/RESSOURCES)
-            efficiency = abs(es_outputs['layers_in_out'].at[tech, 'ELECTRICITY'] /
-                             es_outputs['layers_in_out'].at[tech, tech_resource])
-
-            # Power Capacity of the plant is defined in ES regarding Heat. But in DS, it is defined regarding Elec.
-            # Hence PowerCap_DS = PowerCap_ES*phi ; where phi is the PowerToHeat Ratio
-            capacity = float(power_plants.at[tech, 'PowerCapacity']) * power_to_heat_ratio
-
-            # TODO: Decide how to assign extraction turbines maybe with temperature levels in DH networks
-            # CHP units in ES have a constant PowerToHeatRatio which makes them 'back-pressure' units by default - IMPROVE
-            beta = 0
-            if power_plants.loc[tech, 'Technology'] in ['STUR', 'COMC']:
-                if tech[0:4] in ['DEC_']:
-                    chp_type = 'back-pressure'
-                else:
-                    chp_type = 'Extraction'
-                    if tech[0:4] in ['DHN_']:
-                        t_extraction = 273.15 + t_dhn
-                    else:
-                        t_extraction = 273.15 + t_ind
-                    beta = (t_extraction - t_env) / t_env
-            else:
-                chp_type = 'back-pressure'
-
-            power_plants = assign_parameters_by_index(power_plants, tech,
-                                                      ['PowerCapacity', 'CHPPowerToHeat', 'Efficiency',
-                                                       'CHPType', 'CHPPowerLossFactor'],
-                                                      [capacity, power_to_heat_ratio, efficiency, chp_type, beta])
-
-        except:
-            logging.warning(' Technology ' + tech + ' has not been found in layers_in_out')
+    power_plants = map_chp_units(power_plants, chp_tech, es_outputs, t_env=t_env, t_dhn=t_dhn, t_ind=t_ind,
+                                 es_mapping=es_mapping)
 
     # %% --------------- Changes only for P2HT Units  --------------- TO CHECK
     #      - Efficiency - it's just 1
     #      - COP
-
-    # for each P2HT_tech, we will extract the COP Ratio and add it to the PowerPlants dataFrame
-    for tech in p2ht_tech:
-        tech_resource = mapping['ES']['FUEL_ES'][tech]
-        # gets the correct column heat to look up per CHP tech
-        tech_heat = mapping['ES']['P2HT_HEAT'][tech]
-
-        try:
-            cop = abs(
-                es_outputs['layers_in_out'].at[tech, tech_heat] / es_outputs['layers_in_out'].at[tech, 'ELECTRICITY'])
-        except:
-            logging.warning(' Technology P2HT' + tech + ' has not been found in layers_in_out')
-
-        # Efficiency = layers_in_out.at[tech,'ELECTRICITY']/layers_in_out.at[tech,tech_ressource]
-        # Power Capacity of the plant is defined in ES regarding Heat.
-        # But in DS, it is defined regarding Elec. Hence PowerCap_DS = PowerCap_ES/COP
-        capacity = float(power_plants.at[tech, 'PowerCapacity']) / cop
-
-        power_plants = assign_parameters_by_index(power_plants, tech, ['PowerCapacity', 'Efficiency', 'COP'],
-                                                  [capacity, 1.0, cop])
+    power_plants = map_p2ht_units(power_plants, p2ht_tech, es_outputs, es_mapping=es_mapping)
 
     # %% --------------- Changes only for Heat only Units  --------------- TO CHECK
     #      - Efficiency
-
-    for tech in heat_tech:
-        tech_resource = mapping['ES']['FUEL_ES'][tech]
-        heat_type = mapping['ES']['HEAT_ONLY_HEAT'][tech]
-        # gets the correct column electricity to look up per CHP tech
-        try:
-            # If the TECH is HEAT , Efficiency is simply abs(HEAT/RESOURCES)
-            efficiency = abs(
-                es_outputs['layers_in_out'].at[tech, heat_type] / es_outputs['layers_in_out'].at[tech, tech_resource])
-        except:
-            efficiency = np.nan
-            logging.warning(' Technology ' + tech + ' has not been found in layers_in_out')
-        power_plants = assign_parameters_by_index(power_plants, tech, ['Efficiency'], efficiency)
+    power_plants = map_heat_units(power_plants, heat_tech, es_outputs, es_mapping=es_mapping)
 
     # %% --------------------------------THERMAL STORAGE FOR P2HT, HEAT and CHP UNITS ----------------------------------
-    # tech_sto can be of 2 cases :
-    #    1) either the CHP tech is DEC_TECH, then it has its own personal storage named TS_DEC_TECH
-    #    2) or the CHP tech is DHN_TECH. these tech are associated with TS_DHN_DAILY and TS_DHN_SEASONAL;
-
-    # get the dhn_daily and dhn_seasonal before the for loop
-    # the list used CHP_tech could be brought to a smaller number reducing computation time - through the use of
-    # tech.startswith('DHN_') ? - TO DO
-    sto_dhn_daily = sto_dhn(heat_tech, 'DAILY', n_TD, es_outputs['assets'], es_outputs['low_t_dhn_Layers'], td_df)
-    sto_dhn_seasonal = sto_dhn(heat_tech, 'SEASONAL', n_TD, es_outputs['assets'], es_outputs['low_t_dhn_Layers'], td_df)
-    tot_sto_dhn_daily = sto_dhn_daily.sum()
-    tot_sto_dhn_seasonal = sto_dhn_seasonal.sum()
-
-    for tech in heat_tech_all:
-        try:
-            if tech.startswith('DEC_'):
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('DEC', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-
-            elif tech.startswith('DHN_'):
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('DHN', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-
-            elif tech.startswith('IND_'):  # If the unit is IND - so making HIGH TEMPERATURE - no Thermal Storage
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('IND', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-        except:
-            logging.warning('Technology ' + tech + ' doesnt have a thermal storage option in ES')
+    # The DHN thermal storages (TS_DHN_DAILY and TS_DHN_SEASONAL) are not allocated to the DHN units: their sizes per
+    # technology (search.sto_dhn_all) are not used by the DS units, the THMS technologies are dropped with HeatSlack
+
+    # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
+    power_plants = map_heat_zones(power_plants, heat_tech_all, heat_zone_prefixes, zone=zone,
+                                  dispaset_version=dispaset_version)
 
     # %% -------------- STO UNITS --------------------- ==> Only units storing ELECTRICITY - TO CHECK
     #      - STOCapacity
@@ -367,164 +169,32 @@ def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_cs
     #      - STOMaxChargingPower
     #      - STOChargingEfficiency
     #      - Efficiency
-    #      - TO CHECK/FINISH
-
-    for tech in storage_tech:
-
-        try:
-            if tech.startswith('TS_DEC_'):
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('DEC', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-                if tech.startswith('TS_DEC_'):
-                    storage_charging_efficiency = es_outputs['storage_eff_in'].at[tech, 'HEAT_LOW_T_DECEN']
-                    efficiency = es_outputs['storage_eff_out'].at[tech, 'HEAT_LOW_T_DECEN']
-
-            elif tech.startswith('TS_DHN_'):
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('DHN', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-                if tech.startswith('TS_DHN_'):
-                    storage_charging_efficiency = es_outputs['storage_eff_in'].at[tech, 'HEAT_LOW_T_DHN']
-                    efficiency = es_outputs['storage_eff_out'].at[tech, 'HEAT_LOW_T_DHN']
-
-            elif tech.startswith('TS_HIGH_'):  # If the unit is IND - so making HIGH TEMPERATURE - no Thermal Storage
-                # Regarding heat coupling - assign to different heat nodes depending on the type of heat produced
-                zone_name = assign_zone('IND', zone)
-                if dispaset_version == '2.5':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Zone_th'], [zone_name])
-                elif dispaset_version == '2.5_BS':
-                    power_plants = assign_parameters_by_index(power_plants, tech, ['Sector1'], [zone_name])
-                if tech.startswith('TS_HIGH_'):
-                    storage_charging_efficiency = es_outputs['storage_eff_in'].at[tech, 'HEAT_HIGH_T']
-                    efficiency = es_outputs['storage_eff_out'].at[tech, 'HEAT_HIGH_T']
-            else:
-                storage_charging_efficiency = es_outputs['storage_eff_in'].at[tech, 'ELECTRICITY']
-                efficiency = es_outputs['storage_eff_out'].at[tech, 'ELECTRICITY']
-
-            # GW to MW is done further
-            # For other Tech ' f' in ES = PowerCapacity,
-            # whereas for STO_TECH ' f' = STOCapacity
-            storage_capacity = power_plants.at[tech, 'PowerCapacity']
-            # In ES, the units are [%/s] whereas in DS the units are [%/h]
-            storage_self_discharge = es_outputs['storage_characteristics'].at[tech, 'storage_losses']
-            # Characteristics of charging and discharging
-            # PowerCapacity = Discharging Capacity for STO_TECH in DS #GW to MW is done further
-            PowerCapacity = float(storage_capacity) / es_outputs['storage_characteristics'].at[
-                tech, 'storage_discharge_time']
-            storage_max_charge_power = float(storage_capacity) / es_outputs['storage_characteristics'].at[
-                tech, 'storage_charge_time'] * 1000  # GW to MW
-
-            power_plants = assign_parameters_by_index(power_plants, tech,
-                                                      ['STOCapacity', 'STOSelfDischarge', 'PowerCapacity',
-                                                       'STOMaxChargingPower', 'STOChargingEfficiency', 'Efficiency'],
-                                                      [storage_capacity, storage_self_discharge, PowerCapacity,
-                                                       storage_max_charge_power, storage_charging_efficiency,
-                                                       efficiency]
-                                                      )
-            # power_plants.loc[
-            #     power_plants.index == tech, ['STOCapacity', 'STOSelfDischarge', 'PowerCapacity', 'STOMaxChargingPower',
-            #                                  'STOChargingEfficiency', 'Efficiency']] = [storage_capacity,
-            #                                                                             storage_self_discharge,
-            #                                                                             PowerCapacity,
-            #                                                                             storage_max_charge_power,
-            #                                                                             storage_charging_efficiency,
-            #                                                                             efficiency]
-        except:
-            logging.warning('Technology ' + tech + 'has not been found in STO_eff_out/eff_in/_characteristics')
-
-    # %% ------------ TYPICAL UNITS MAKING ----------
-    # Part of the code where you fill in DATA coming from typical units
-
-    technology_fuel_in_system = power_plants[['Technology', 'Fuel']].copy()
-    technology_fuel_in_system = technology_fuel_in_system.drop_duplicates(subset=['Technology', 'Fuel'], keep='first')
-    technology_fuel_in_system = technology_fuel_in_system.values.tolist()
-
-    # Typical Units : run through Typical_Units with existing Technology_Fuel pairs in ES simulation
-
-    # Characteristics is a list over which we need to iterate for typical Units
-    # characteristics = ['MinUpTime', 'MinDownTime', 'RampUpRate', 'RampDownRate', 'StartUpCost_pu', 'NoLoadCost_pu',
-    #                    'RampingCost', 'PartLoadMin', 'MinEfficiency', 'StartUpTime', 'CO2Intensity',
-    #                    'CHPPowerLossFactor']
+    power_plants = map_heat_zones(power_plants, storage_tech, storage_zone_prefixes, zone=zone,
+                                  dispaset_version=dispaset_version)
+    power_plants = map_storage_units(power_plants, storage_tech, es_outputs)
 
     # Get Indexes to iterate over them
     index_list = list(
         power_plants.loc[(power_plants['Sort'] != 'CHP') & (power_plants['Sort'] != 'P2GS')].index.values.tolist())
-    index_chp_list = list(power_plants.loc[power_plants['Sort'] == 'CHP'].index.values.tolist())
-    index_p2gs_list = list(power_plants.loc[power_plants['Sort'] == 'P2GS'].index.values.tolist())
-
-    for index in index_list:
-        if power_plants.loc[index, 'Fuel'] in list(es_outputs['GWP_op'].index):
-            power_plants.loc[index, 'CO2Intensity'] = es_outputs['GWP_op'].loc[power_plants.loc[index, 'Fuel']] / \
-                                                      power_plants.loc[index, 'Efficiency']
+    power_plants = map_co2_intensity(power_plants, index_list, es_outputs['GWP_op'])
 
     # %% ------------------------------ For units consuming X and generating power -------------------------------------
-    for index in power_plants.index:
-        if power_plants.loc[index, 'Technology'] in ['COMCX', 'GTURX', 'ICENX', 'STURX']:
-            for f in ['AMO', 'GAS', 'BIO', 'OIL', 'HRD', 'WST']:
-                if power_plants.loc[index, 'Fuel'] == f:
-                    try:
-                        efficiency = - power_plants.loc[index, 'Efficiency']
-                        power_plants = assign_parameters_by_index(power_plants, index,
-                                                                  ['Efficiency', 'Sector1', 'EfficiencySector1'],
-                                                                  [1, 'ES_' + f, efficiency])
-                    except:
-                        logging.warning(' Technology ' + index + ' has not been found in layers_in_out')
-
-
-    # boundary_sector_inputs = pd.DataFrame(index=['ES_H2', 'ES_AMO', 'ES_GAS', 'ES_IND', 'ES_DHN', 'ES_OIL'])
-    # for index in ['H2_STORAGE', 'GAS_STORAGE', 'AMMONIA_STORAGE', 'TS_HIGH_TEMP', 'TS_DHN_SEASONAL', 'LFO_STORAGE']:
-    boundary_sector_inputs = pd.DataFrame(index=['ES_H2', 'ES_AMO', 'ES_IND', 'ES_DHN', 'ES_DEC', 'ES_OIL', 'ES_HRD', 'ES_WST', 'ES_BIO'])
-    for index in ['H2_STORAGE', 'AMMONIA_STORAGE', 'TS_HIGH_TEMP', 'TS_DHN_SEASONAL', 'ES_OIL', 'ES_HRD', 'ES_WST', 'ES_BIO', 'ES_DEC']:
-        if index in ['H2_STORAGE', 'GAS_STORAGE', 'AMMONIA_STORAGE', 'TS_HIGH_TEMP', 'TS_DHN_SEASONAL', 'LFO_STORAGE']:
-            storage_capacity = original_units.loc[index, 'PowerCapacity'] * 1000
-            storage_self_discharge = es_outputs['storage_characteristics'].loc[index, 'storage_losses']
-        else:
-            storage_capacity = np.nan
-            storage_self_discharge = np.nan
-        if index == 'H2_STORAGE':
-            sector = 'ES_H2'
-        elif index == 'GAS_STORAGE':
-            sector = 'ES_GAS'
-        elif index == 'AMMONIA_STORAGE':
-            sector = 'ES_AMO'
-        elif index == 'TS_HIGH_TEMP':
-            sector = 'ES_IND'
-        elif index == 'TS_DHN_SEASONAL':
-            sector = 'ES_DHN'
-        elif index == 'LFO_STORAGE':
-            sector = 'ES_OIL'
-        else:
-            sector = index
-        if not ds_inputs == None:
-            try:
-                max_flex_demand = ds_inputs['XVarDemand'][i].loc[ds_inputs['XVarDemand'][i][sector].idxmax(), sector]
-            except:
-                max_flex_demand = 0
-            try:
-                max_flex_supply = ds_inputs['XVarSupply'][i].loc[ds_inputs['XVarSupply'][i][sector].idxmax(), sector]
-            except:
-                max_flex_supply = 0
-        boundary_sector_inputs = assign_parameters_by_index(boundary_sector_inputs, sector,
-                                                            ['Sector', 'STOCapacity', 'STOSelfDischarge',
-                                                             'MaxFlexDemand', 'MaxFlexSupply'],
-                                                            [sector, storage_capacity, storage_self_discharge,
-                                                             max_flex_demand, max_flex_supply])
+    power_plants = map_x_units(power_plants, zone=zone)
+
+    boundary_sector_inputs = get_boundary_sector_inputs(original_units, es_outputs, ds_inputs=ds_inputs, i=i, zone=zone)
+
+    # Typical units indexed by (Technology, Fuel, CHPType) once for the three assignments
+    typical_units_index = index_typical_units(typical_units)
+
     # %% ---------------------------------------------- For non-CHP units ----------------------------------------------
-    power_plants = assign_typical_values(power_plants, typical_units, ['CHP', 'P2GS'], 'mean', 1000, 1000)
+    power_plants = assign_typical_values(power_plants, typical_units_index, ['CHP', 'P2GS'], 'mean', 1000, 1000)
 
     # %% ------------------------------------------------ For CHP units ------------------------------------------------
-    power_plants = assign_typical_values(power_plants, typical_units,
+    power_plants = assign_typical_values(power_plants, typical_units_index,
                                          ['HEAT', 'ELEC', 'STO', 'P2GS', 'P2HT', 'P2GS_STO'], 'mean', 1000, 1000)
 
     # %% ------------------------------------------------ For P2GS units -----------------------------------------------
-    power_plants = assign_typical_values(power_plants, typical_units,
+    power_plants = assign_typical_values(power_plants, typical_units_index,
                                          ['HEAT', 'ELEC', 'STO', 'CHP', 'P2HT', 'P2GS_STO'], 'mean', 1000, 1000)
 
     # %% ------------ Last stuff to do ------------
@@ -542,12 +212,13 @@ def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_cs
         boundary_sector_inputs = pd.DataFrame(boundary_sector_inputs, columns=column_names_bs_input)
 
     # Assign water consumption
-    power_plants.loc[:, 'WaterWithdrawal'] = 0
-    power_plants.loc[:, 'WaterConsumption'] = 0
+    power_plants.loc[:, 'WaterWithdrawal'] = 0.
+    power_plants.loc[:, 'WaterConsumption'] = 0.
 
     allunits = power_plants
-    allunits = allunits[(allunits['PowerCapacity'] * allunits['Nunits'] >= technology_threshold) |
-                        (allunits['STOMaxChargingPower'] * allunits['Nunits'] >= technology_threshold)]
+    nunits = allunits['Nunits'].to_numpy(dtype=float, na_value=np.nan)
+    allunits = allunits[(allunits['PowerCapacity'] * nunits >= technology_threshold) |
+                        (allunits['STOMaxChargingPower'] * nunits >= technology_threshold)]
 
     if dispaset_version == '2.5':
         if write_csv:
@@ -560,3 +231,387 @@ def get_capacities_from_es(es_outputs, typical_units, td_df, zone=None, write_cs
             write_csv_files('BoundarySectorInputs', boundary_sector_inputs, 'BoundarySectorInputs', index=True,
                             write_csv=True)
         return allunits, boundary_sector_inputs
+
+
+def get_capacities_from_es_zones(zone_outputs, typical_units, td_df, write_csv=True, file_name='PowerPlants',
+                                 dispaset_version='2.5', config_link=None, ds_inputs=None, i=0, es_mapping=None,
+                                 max_workers=None, **kwargs):
+    """
+    Multi-zone get_capacities_from_es: the power plants of the zones are built in a process pool (the zones are
+    independent), units, heat nodes and boundary sectors are named after their zone (assign_zone) and all the zones are
+    written in a single PowerPlants.csv (and BoundarySectorInputs.csv). The ES outputs of the zones are not modified.
+    :param zone_outputs:        dictionary zone: ES outputs of the zone
+    :param typical_units:       typical units dataframe (Typical_Units.csv)
+    :param td_df:               typical day dataframe
+    :param write_csv:           write the csv files True/False
+    :param file_name:           name of the power plants csv file
+    :param dispaset_version:    '2.5' or '2.5_BS'
+    :param config_link:         link configuration (ESMapping)
+    :param ds_inputs:           dictionary with the DS inputs (XVarDemand and XVarSupply with <zone>_<sector> columns)
+    :param i:                   iteration
+    :param es_mapping:          ES mapping table (get_es_mapping), ESMapping of config_link by default
+    :param max_workers:         number of processes (ProcessPoolExecutor default if None, 0 to run in this process)
+    :param kwargs:              other arguments of get_capacities_from_es (thresholds and temperatures)
+    :return:                    power plants of all the zones (and boundary sector inputs for 2.5_BS)
+    """
+    if es_mapping is None and config_link is not None:
+        es_mapping = config_link.get('ESMapping')
+    es_mapping = get_es_mapping(es_mapping)
+    if ds_inputs is not None:
+        # only the flexible boundary sector demand/supply of the iteration is sent to the workers
+        ds_inputs = {variable: {i: ds_inputs[variable][i]} for variable in ['XVarDemand', 'XVarSupply']}
+    kwargs = dict(kwargs, write_csv=False, dispaset_version=dispaset_version, ds_inputs=ds_inputs, i=i,
+                  es_mapping=es_mapping)
+    zones = list(zone_outputs)
+    tasks = [(zone_outputs[zone], typical_units, td_df, zone, kwargs) for zone in zones]
+    if max_workers == 0:
+        results = [_zone_capacities(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_zone_capacities, tasks))
+
+    if dispaset_version == '2.5':
+        results = [(result, None) for result in results]
+    power_plants = pd.concat([result[0] for result in results])
+    # categories differ from one zone to another (Zone, Technology...), concat falls back to object columns
+    categories = [column for column, dtype in results[0][0].dtypes.items() if isinstance(dtype, pd.CategoricalDtype)]
+    power_plants = power_plants.astype(dict.fromkeys(categories, 'category'))
+    if write_csv:
+        write_csv_files(file_name, power_plants, 'PowerPlants', index=False, write_csv=True)
+    if dispaset_version == '2.5':
+        return power_plants
+
+    boundary_sector_inputs = pd.concat([result[1] for result in results], ignore_index=True)
+    if write_csv:
+        write_csv_files('BoundarySectorInputs', boundary_sector_inputs, 'BoundarySectorInputs', index=True,
+                        write_csv=True)
+    return power_plants, boundary_sector_inputs
+
+
+def _zone_capacities(task):
+    """
+    get_capacities_from_es of one zone (process pool worker)
+    :param task:    ES outputs, typical units, typical day dataframe, zone and keyword arguments
+    :return:        result of get_capacities_from_es
+    """
+    es_outputs, typical_units, td_df, zone, kwargs = task
+    # get_capacities_from_es groups the assets and renames the GWP_op index in place
+    es_outputs = dict(es_outputs, GWP_op=es_outputs['GWP_op'].copy())
+    return get_capacities_from_es(es_outputs, typical_units, td_df, zone=zone, **kwargs)
+
+
+def _warn_missing(techs, found, message):
+    """
+    Log one warning per technology that could not be mapped
+    :param techs:   list of technologies
+    :param found:   boolean array, False where the technology could not be mapped
+    :param message: warning to log, formatted with the technology name
+    """
+    for tech in np.asarray(techs, dtype=object)[~np.asarray(found, dtype=bool)]:
+        logging.warning(message % tech)
+
+
+def _select(techs, mask):
+    """
+    Subset of techs for which mask is True
+    """
+    return list(np.asarray(techs, dtype=object)[np.asarray(mask, dtype=bool)])
+
+
+def map_elec_units(power_plants, techs, es_outputs, typical_units, es_mapping=None):
+    """
+    Efficiency of ELEC units, abs(ELECTRICITY/RESOURCES) from layers_in_out or the typical unit for gas units
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param techs:           list of ELEC technologies
+    :param es_outputs:      dictionary with the ES outputs
+    :param typical_units:   typical units dataframe
+    :param es_mapping:      ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
+    :return:                power plant database in Dispa-SET readable format
+    """
+    es_mapping = get_es_mapping(es_mapping)
+    resources = es_attribute(es_mapping, techs, 'FUEL_ES')
+    efficiency, found = lookup_ratio(es_outputs['layers_in_out'], techs, 'ELECTRICITY', resources)
+    efficiency = np.abs(efficiency)
+    gas_units = typical_units.loc[typical_units['Fuel'] == 'GAS'].drop_duplicates(subset='Technology', keep='first')
+    gas_units = gas_units.set_index('Technology')['Efficiency']
+    for k, tech in enumerate(techs):
+        if tech in gas_units_efficiency:
+            found[k] = gas_units_efficiency[tech] in gas_units.index
+            efficiency[k] = gas_units.get(gas_units_efficiency[tech], np.nan)
+    _warn_missing(techs, found, ' Technology %s has not been found in layers_in_out')
+    return assign_parameters_columnar(power_plants, _select(techs, found), ['Efficiency'], [efficiency[found]])
+
+
+def map_p2gs_units(power_plants, techs, es_outputs, zone=None, dispaset_version='2.5', es_mapping=None):
+    """
+    Efficiency, boundary sector and associated storage of P2GS units
+    :param power_plants:        power plant database in Dispa-SET readable format
+    :param techs:               list of P2GS technologies
+    :param es_outputs:          dictionary with the ES outputs
+    :param zone:                zone name
+    :param dispaset_version:    '2.5' or '2.5_BS'
+    :param es_mapping:          ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
+    :return:                    power plant database in Dispa-SET readable format
+    """
+    es_mapping = get_es_mapping(es_mapping)
+    if dispaset_version not in ['2.5', '2.5_BS']:
+        logging.error('Wrong Dispa-SET version selected')
+        sys.exit(1)
+    lio = es_outputs['layers_in_out']
+    resources = es_attribute(es_mapping, techs, 'FUEL_ES')
+    efficiency, found = lookup_ratio(lio, techs, 'H2', resources)
+    efficiency = np.abs(efficiency)
+    if dispaset_version == '2.5':
+        power_plants = assign_parameters_columnar(power_plants, _select(techs, found), ['Efficiency'],
+                                                  [efficiency[found]])
+    else:
+        # FIXME: check if ELY and FC are properly mapped
+        efficiency_high_temp, found_high_temp = lookup_ratio(lio, techs, 'HEAT_HIGH_T', resources)
+        efficiency_dhn, found_dhn = lookup_ratio(lio, techs, 'HEAT_LOW_T_DHN', resources)
+        found = found & found_high_temp & found_dhn
+        power_plants = assign_parameters_columnar(power_plants, _select(techs, found),
+                                                  ['Efficiency', 'ChargingEfficiencySector1',
+                                                   'Sector2', 'ChargingEfficiencySector2',
+                                                   'Sector3', 'ChargingEfficiencySector3'],
+                                                  [1, efficiency[found], assign_zone('IND', zone),
+                                                   -efficiency_high_temp[found], assign_zone('DHN', zone),
+                                                   -efficiency_dhn[found]])
+    _warn_missing(techs, found, ' Technology %s has not been found in layers_in_out')
+
+    # Associate the right P2GS Storage with the P2GS production unit
+    storages = es_attribute(es_mapping, techs, 'P2GS_STORAGE')
+    referenced = pd.notna(storages)
+    _warn_missing(techs, referenced, ' Associated P2GS storage of %s is not referenced in the dictionary')
+    if dispaset_version == '2.5':
+        techs_sto, storages = _select(techs, referenced), _select(storages, referenced)
+        # For other Tech ' f' in ES = PowerCapacity, whereas for STO_TECH ' f' = STOCapacity
+        positions = power_plants.index.get_indexer(pd.Index(storages, dtype=object))
+        storage_capacity = power_plants['PowerCapacity'].to_numpy()[positions]
+        storage_self_discharge, found_losses = lookup_values(es_outputs['storage_characteristics'], storages,
+                                                             'storage_losses')
+        storage_charging_efficiency, found_eff_in = lookup_values(es_outputs['storage_eff_in'], storages, 'H2')
+        storage_charge_time, found_charge_time = lookup_values(es_outputs['storage_characteristics'], storages,
+                                                               'storage_charge_time')
+        found = (positions >= 0) & found_losses & found_eff_in & found_charge_time
+        _warn_missing(storages, found, ' Technology %s has not been found in STO_eff_out/eff_in/_characteristics')
+        # GW to MW
+        storage_max_charge_power = storage_capacity[found] / storage_charge_time[found] * 1000
+        power_plants = assign_parameters_columnar(power_plants, _select(techs_sto, found),
+                                                  ['STOCapacity', 'STOSelfDischarge', 'STOMaxChargingPower',
+                                                   'STOChargingEfficiency'],
+                                                  [storage_capacity[found], storage_self_discharge[found],
+                                                   storage_max_charge_power, storage_charging_efficiency[found]])
+    # In 2.5_BS the P2GS units keep their PowerCapacity and no STOMaxChargingPower: the boundary sector adjustment of
+    # the original loop (STOMaxChargingPower = PowerCapacity, PowerCapacity = 0) assigned a Series inside a list, which
+    # always raised a ValueError caught by its except clause, so it never changed the power plants
+
+    zone_h2 = assign_zone('H2', zone)
+    if dispaset_version == '2.5':
+        return assign_parameters_columnar(power_plants, techs, ['Zone_h2'], [zone_h2])
+    return assign_parameters_columnar(power_plants, techs, ['Sector1'], [zone_h2])
+
+
+def map_chp_units(power_plants, techs, es_outputs, t_env=273.15 + 35, t_dhn=90, t_ind=120, es_mapping=None):
+    """
+    PowerCapacity, CHPPowerToHeat, Efficiency, CHPType and CHPPowerLossFactor of CHP units
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param techs:           list of CHP technologies
+    :param es_outputs:      dictionary with the ES outputs
+    :param t_env:           environment temperature [K]
+    :param t_dhn:           temperature of the district heating network [°C]
+    :param t_ind:           temperature of the industrial heat [°C]
+    :param es_mapping:      ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
+    :return:                power plant database in Dispa-SET readable format
+    """
+    es_mapping = get_es_mapping(es_mapping)
+    lio = es_outputs['layers_in_out']
+    resources = es_attribute(es_mapping, techs, 'FUEL_ES')
+    heats = es_attribute(es_mapping, techs, 'CHP_HEAT')
+    power_to_heat_ratio, found_heat = lookup_ratio(lio, techs, 'ELECTRICITY', heats)
+    # If the TECH is CHP  , Efficiency is simply abs(ELECTRICITY/RESSOURCES)
+    efficiency, found_resource = lookup_ratio(lio, techs, 'ELECTRICITY', resources)
+    found = found_heat & found_resource
+    _warn_missing(techs, found, ' Technology %s has not been found in layers_in_out')
+    techs = _select(techs, found)
+    power_to_heat_ratio = np.abs(power_to_heat_ratio[found])
+    efficiency = np.abs(efficiency[found])
+
+    # Power Capacity of the plant is defined in ES regarding Heat. But in DS, it is defined regarding Elec.
+    # Hence PowerCap_DS = PowerCap_ES*phi ; where phi is the PowerToHeat Ratio
+    capacity = power_plants.loc[techs, 'PowerCapacity'].to_numpy() * power_to_heat_ratio
+
+    # TODO: Decide how to assign extraction turbines maybe with temperature levels in DH networks
+    # CHP units in ES have a constant PowerToHeatRatio which makes them 'back-pressure' units by default - IMPROVE
+    prefix = pd.Index(techs, dtype=object).str[0:4]
+    extraction = power_plants.loc[techs, 'Technology'].isin(['STUR', 'COMC']).to_numpy() & (prefix != 'DEC_')
+    t_extraction = np.where(prefix == 'DHN_', 273.15 + t_dhn, 273.15 + t_ind)
+    chp_type = np.where(extraction, 'Extraction', 'back-pressure').astype(object)
+    beta = np.where(extraction, (t_extraction - t_env) / t_env, 0).astype(object)
+    beta[~extraction] = 0
+
+    return assign_parameters_columnar(power_plants, techs,
+                                      ['PowerCapacity', 'CHPPowerToHeat', 'Efficiency', 'CHPType',
+                                       'CHPPowerLossFactor'],
+                                      [capacity, power_to_heat_ratio, efficiency, chp_type, beta])
+
+
+def map_p2ht_units(power_plants, techs, es_outputs, es_mapping=None):
+    """
+    PowerCapacity, Efficiency (it's just 1) and COP of P2HT units
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param techs:           list of P2HT technologies
+    :param es_outputs:      dictionary with the ES outputs
+    :param es_mapping:      ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
+    :return:                power plant database in Dispa-SET readable format
+    """
+    es_mapping = get_es_mapping(es_mapping)
+    heats = es_attribute(es_mapping, techs, 'P2HT_HEAT')
+    cop, found = lookup_ratio(es_outputs['layers_in_out'], techs, heats, 'ELECTRICITY')
+    _warn_missing(techs, found, ' Technology P2HT%s has not been found in layers_in_out')
+    techs = _select(techs, found)
+    cop = np.abs(cop[found])
+    # Power Capacity of the plant is defined in ES regarding Heat.
+    # But in DS, it is defined regarding Elec. Hence PowerCap_DS = PowerCap_ES/COP
+    capacity = power_plants.loc[techs, 'PowerCapacity'].to_numpy() / cop
+    return assign_parameters_columnar(power_plants, techs, ['PowerCapacity', 'Efficiency', 'COP'],
+                                      [capacity, 1.0, cop])
+
+
+def map_heat_units(power_plants, techs, es_outputs, es_mapping=None):
+    """
+    Efficiency of heat only units, abs(HEAT/RESOURCES) from layers_in_out (NaN if not found)
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param techs:           list of HEAT technologies
+    :param es_outputs:      dictionary with the ES outputs
+    :param es_mapping:      ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
+    :return:                power plant database in Dispa-SET readable format
+    """
+    es_mapping = get_es_mapping(es_mapping)
+    resources = es_attribute(es_mapping, techs, 'FUEL_ES')
+    heats = es_attribute(es_mapping, techs, 'HEAT_ONLY_HEAT')
+    efficiency, found = lookup_ratio(es_outputs['layers_in_out'], techs, heats, resources)
+    efficiency = np.where(found, np.abs(efficiency), np.nan)
+    _warn_missing(techs, found, ' Technology %s has not been found in layers_in_out')
+    return assign_parameters_columnar(power_plants, techs, ['Efficiency'], [efficiency])
+
+
+def map_heat_zones(power_plants, techs, prefixes, zone=None, dispaset_version='2.5'):
+    """
+    Assign heat producing units and thermal storages to their heat node depending on the type of heat produced
+    :param power_plants:        power plant database in Dispa-SET readable format
+    :param techs:               list of technologies
+    :param prefixes:            dictionary technology prefix - heat node, i.e. heat_zone_prefixes
+    :param zone:                zone name
+    :param dispaset_version:    '2.5' (heat node in Zone_th) or '2.5_BS' (heat node in Sector1)
+    :return:                    power plant database in Dispa-SET readable format
+    """
+    if dispaset_version == '2.5':
+        parameter = 'Zone_th'
+    elif dispaset_version == '2.5_BS':
+        parameter = 'Sector1'
+    else:
+        return power_plants
+    techs = pd.Index(techs, dtype=object)
+    for prefix, zone_name in prefixes.items():
+        power_plants = assign_parameters_columnar(power_plants, list(techs[techs.str.startswith(prefix)]),
+                                                  [parameter], [assign_zone(zone_name, zone)])
+    return power_plants
+
+
+def map_storage_units(power_plants, techs, es_outputs):
+    """
+    STOCapacity, STOSelfDischarge, PowerCapacity, STOMaxChargingPower, STOChargingEfficiency and Efficiency of
+    storage units
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param techs:           list of STO technologies
+    :param es_outputs:      dictionary with the ES outputs
+    :return:                power plant database in Dispa-SET readable format
+    """
+    techs = pd.Index(techs, dtype=object)
+    layers = pd.Series('ELECTRICITY', index=techs, dtype=object)
+    for prefix, layer in storage_layers.items():
+        layers[techs.str.startswith(prefix)] = layer
+    storage_charging_efficiency, found_eff_in = lookup_values(es_outputs['storage_eff_in'], techs, layers)
+    efficiency, found_eff_out = lookup_values(es_outputs['storage_eff_out'], techs, layers)
+    characteristics = es_outputs['storage_characteristics']
+    # In ES, the units are [%/s] whereas in DS the units are [%/h]
+    storage_self_discharge, found_losses = lookup_values(characteristics, techs, 'storage_losses')
+    discharge_time, found_discharge_time = lookup_values(characteristics, techs, 'storage_discharge_time')
+    charge_time, found_charge_time = lookup_values(characteristics, techs, 'storage_charge_time')
+    found = found_eff_in & found_eff_out & found_losses & found_discharge_time & found_charge_time
+    _warn_missing(techs, found, 'Technology %shas not been found in STO_eff_out/eff_in/_characteristics')
+    techs = list(techs[found])
+
+    # For other Tech ' f' in ES = PowerCapacity, whereas for STO_TECH ' f' = STOCapacity
+    storage_capacity = power_plants.loc[techs, 'PowerCapacity'].to_numpy()
+    # PowerCapacity = Discharging Capacity for STO_TECH in DS #GW to MW is done further
+    power_capacity = storage_capacity / discharge_time[found]
+    storage_max_charge_power = storage_capacity / charge_time[found] * 1000  # GW to MW
+
+    return assign_parameters_columnar(power_plants, techs,
+                                      ['STOCapacity', 'STOSelfDischarge', 'PowerCapacity', 'STOMaxChargingPower',
+                                       'STOChargingEfficiency', 'Efficiency'],
+                                      [storage_capacity, storage_self_discharge[found], power_capacity,
+                                       storage_max_charge_power, storage_charging_efficiency[found],
+                                       efficiency[found]])
+
+
+def map_co2_intensity(power_plants, index_list, gwp_op):
+    """
+    CO2Intensity = GWP_op of the fuel / Efficiency
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param index_list:      list of power plant indexes for which the CO2Intensity is computed
+    :param gwp_op:          GWP_op series from ES, indexed by DS fuel
+    :return:                power plant database in Dispa-SET readable format
+    """
+    gwp_op = gwp_op.loc[~gwp_op.index.duplicated()]
+    fuels = power_plants.loc[index_list, 'Fuel']
+    index_list = list(fuels.index[fuels.isin(gwp_op.index)])
+    co2_intensity = gwp_op.reindex(power_plants.loc[index_list, 'Fuel']).to_numpy() / \
+        power_plants.loc[index_list, 'Efficiency'].to_numpy()
+    return assign_parameters_columnar(power_plants, index_list, ['CO2Intensity'], [co2_intensity])
+
+
+def map_x_units(power_plants, zone=None):
+    """
+    Units consuming X (boundary sector fuel) and generating power: the fuel is supplied by the <zone>_<fuel> sector
+    :param power_plants:    power plant database in Dispa-SET readable format
+    :param zone:            zone name
+    :return:                power plant database in Dispa-SET readable format
+    """
+    x = power_plants.loc[power_plants['Technology'].isin(x_units['Technology']) &
+                         power_plants['Fuel'].isin(x_units['Fuel'])]
+    return assign_parameters_columnar(power_plants, list(x.index), ['Efficiency', 'Sector1', 'EfficiencySector1'],
+                                      [1, assign_zone(x['Fuel'].astype(str), zone), - x['Efficiency']])
+
+
+def get_boundary_sector_inputs(original_units, es_outputs, ds_inputs=None, i=0, zone=None):
+    """
+    Storage capacity, self discharge and max flexible demand/supply of the boundary sectors
+    :param original_units:  power plant database before the mapping (PowerCapacity from ES in GW/GWh)
+    :param es_outputs:      dictionary with the ES outputs
+    :param ds_inputs:       dictionary with the DS inputs (XVarDemand and XVarSupply)
+    :param i:               iteration
+    :param zone:            zone name, the boundary sectors are named <zone>_<sector>
+    :return:                boundary sector inputs
+    """
+    storages = list(boundary_sectors.values())
+    sectors = [assign_zone(sector[len('ES_'):], zone) for sector in boundary_sectors]
+    stored = [storage for storage in storages if storage is not None]
+    storage_capacity = pd.Series(np.nan, index=sectors, dtype=object)
+    storage_self_discharge = pd.Series(np.nan, index=sectors, dtype=object)
+    storage_capacity[[storage is not None for storage in storages]] = \
+        (original_units.loc[stored, 'PowerCapacity'] * 1000).to_numpy()
+    storage_self_discharge[[storage is not None for storage in storages]] = \
+        es_outputs['storage_characteristics'].loc[stored, 'storage_losses'].to_numpy()
+
+    max_flex = {}
+    for variable in ['XVarDemand', 'XVarSupply']:
+        if ds_inputs is None:
+            max_flex[variable] = pd.Series(0, index=sectors)
+        else:
+            max_flex[variable] = ds_inputs[variable][i].reindex(columns=sectors).max().fillna(0)
+
+    return pd.DataFrame({'Sector': sectors, 'STOCapacity': storage_capacity, 'STOSelfDischarge': storage_self_discharge,
+                         'MaxFlexDemand': max_flex['XVarDemand'], 'MaxFlexSupply': max_flex['XVarSupply']},
+                        index=sectors)
@@ -14,35 +14,80 @@ Output : Database/Heat_demand/##/... .csv
 """
 from __future__ import division
 
+import numpy as np
 import pandas as pd
 import logging
 
-from ..search import assign_td, write_csv_files, clean_blanks
-from ..constants import grid_losses_list, mapping, common
+from ..search import expand_layer, write_csv_files, clean_blanks, get_es_mapping
+from ..constants import grid_losses_list, common
 
 
-def get_electricity_demand(es_outputs, td_df, drange, countries=['ES'], write_csv=True, file_name='Load'):
+# Columns of the electricity layer consumed by the electricity demand
+electricity_demand_cols = ['ELEC_EXPORT', 'TRAMWAY_TROLLEY', 'TRAIN_PUB', 'TRAIN_FREIGHT', 'TRUCK_ELEC', 'BIO_HYDROLYSIS',
+                           'PYROLYSIS_TO_LFO', 'PYROLYSIS_TO_FUELS', 'ATM_CCS', 'INDUSTRY_CCS', 'SYN_METHANOLATION',
+                           'BIOMASS_TO_METHANOL', 'HABER_BOSCH', 'OIL_TO_HVC', 'GAS_TO_HVC', 'BIOMASS_TO_HVC', 'END_USE']
+# Heat sector: ES layer whose END_USE column is the heat demand of the sector
+heat_demand_layers = {'IND': 'high_t_Layers', 'DHN': 'low_t_dhn_Layers', 'DEC': 'low_t_decen_Layers'}
+
+
+def zone_outputs(es_outputs, countries=None):
+    """
+    ES outputs of each zone
+    :param es_outputs:  ES outputs of a single zone (used for all the countries) or dictionary zone: ES outputs
+    :param countries:   zones, all the zones of the dictionary if None
+    :return:            dictionary zone: ES outputs
+    """
+    if 'electricity_layers' in es_outputs or 'high_t_Layers' in es_outputs:
+        return {country: es_outputs for country in (['ES'] if countries is None else countries)}
+    if countries is None:
+        return dict(es_outputs)
+    return {country: es_outputs[country] for country in countries}
+
+
+def zone_losses(grid_losses, zones):
+    """
+    Grid loss factor of each zone
+    :param grid_losses: None (grid_losses_list[0] for all the zones), single factor or dictionary zone: factor
+    :param zones:       list of zones
+    :return:            array of loss factors
+    """
+    if grid_losses is None:
+        grid_losses = grid_losses_list[0]
+    if isinstance(grid_losses, dict):
+        return np.array([grid_losses[zone] for zone in zones], dtype=float)
+    return np.full(len(zones), grid_losses, dtype=float)
+
+
+def expand_zone_layers(layers, td_df):
+    """
+    Expand the typical day series of all the zones at once
+    :param layers:  dictionary column name: series indexed by (TD, hour)
+    :param td_df:   typical day dataframe
+    :return:        hourly dataframe with one column per series (shared, not to be modified in place)
+    """
+    return expand_layer(pd.concat(layers, axis=1), td_df)
+
+
+def get_electricity_demand(es_outputs, td_df, drange, countries=['ES'], write_csv=True, file_name='Load',
+                           grid_losses=None):
     """
     Compute electricity demand and convert it to dispaset readable format, i.e. csv time series
-    :param es_outputs:  EnergyScope outputs
+    :param es_outputs:  EnergyScope outputs of a single zone or dictionary zone: EnergyScope outputs
     :param td_df:       Typical day dataframe
     :param drange:      Date range
-    :param countries:   Countries to apply the mapping function on
+    :param countries:   Countries to apply the mapping function on, all the zones of es_outputs if None
     :param write_csv:   Bool for creating csv file True/False
     :param file_name:   Name of the csv file
-    :return:            Electricity demand
+    :param grid_losses: Grid losses, single factor or dictionary zone: factor (grid_losses_list[0] by default)
+    :return:            Electricity demand, one column per zone
     """
-
-    # Convert TD to hours
-    electricity_layers = assign_td(es_outputs['electricity_layers'], td_df) * 1000
-    demand_cols = ['ELEC_EXPORT', 'TRAMWAY_TROLLEY', 'TRAIN_PUB', 'TRAIN_FREIGHT', 'TRUCK_ELEC',
-                   'BIO_HYDROLYSIS', 'PYROLYSIS_TO_LFO', 'PYROLYSIS_TO_FUELS', 'ATM_CCS', 'INDUSTRY_CCS',
-                   'SYN_METHANOLATION', 'BIOMASS_TO_METHANOL', 'HABER_BOSCH', 'OIL_TO_HVC', 'GAS_TO_HVC',
-                   'BIOMASS_TO_HVC', 'END_USE']
-    grid_losses = grid_losses_list[countries.index('ES')]
+    outputs = zone_outputs(es_outputs, countries)
+    zones = list(outputs)
+    # Demand of each zone summed over the typical days, all the zones are converted to hours in one expansion
+    demand = expand_zone_layers({zone: (outputs[zone]['electricity_layers'].loc[:, electricity_demand_cols] *
+                                        1000).sum(axis=1) for zone in zones}, td_df)
     # Create final dataframe
-    electricity = pd.DataFrame(-electricity_layers.loc[:, demand_cols].sum(axis=1).values * (1 + grid_losses),
-                               index=drange, columns=countries)
+    electricity = pd.DataFrame(-demand.values * (1 + zone_losses(grid_losses, zones)), index=drange, columns=zones)
     if write_csv:
         write_csv_files(file_name, electricity, 'TotalLoadValue', index=True, write_csv=True)
     return electricity
@@ -52,30 +97,18 @@ def get_heat_demand(es_outputs, td_df, drange, countries=None, write_csv=True, f
                     dispaset_version='2.5'):
     """
     Mapping function for heat demands
-    :param es_outputs:  Energyscope outputs
+    :param es_outputs:  Energyscope outputs of a single zone or dictionary zone: EnergyScope outputs
     :param td_df:       Typical days dataframe
-    :param countries:   Zones to be selected for mapping
+    :param countries:   Zones to be selected for mapping, all the zones of es_outputs if None
     :param write_csv:   Bool that triggers writing csv files True/False
     :param file_name:   Name of the csv file
-    :return:            Heat Demand timeseries
+    :return:            Heat Demand timeseries, one column per zone and heat sector (zone_IND, zone_DHN, zone_DEC)
     """
-
-    for country in countries:
-        # %% assign typical days and convert to hourly timeseries
-        ind_heat_es_input = assign_td(es_outputs['high_t_Layers'], td_df) * 1000  # GW to MW
-        dhn_heat_es_input = assign_td(es_outputs['low_t_dhn_Layers'], td_df) * 1000  # GW to MW
-        decen_heat_es_input = assign_td(es_outputs['low_t_decen_Layers'], td_df) * 1000  # GW to MW
-
-        ind_heat_es = -ind_heat_es_input.loc[:, 'END_USE']
-        dhn_heat_es = -dhn_heat_es_input.loc[:, 'END_USE']
-        decen_heat_es = -decen_heat_es_input.loc[:, 'END_USE']
-
-        # %% create a dataframe
-        heat_es_input = pd.DataFrame()
-        heat_es_input.loc[:, country + '_IND'] = ind_heat_es
-        heat_es_input.loc[:, country + '_DHN'] = dhn_heat_es
-        heat_es_input.loc[:, country + '_DEC'] = decen_heat_es
-        heat_es_input.set_index(drange, inplace=True)
+    outputs = zone_outputs(es_outputs, countries)
+    # %% assign typical days and convert to hourly timeseries, all the zones and sectors at once
+    heat_es_input = expand_zone_layers({zone + '_' + sector: -outputs[zone][layer].loc[:, 'END_USE'] * 1000  # GW to MW
+                                        for zone in outputs for sector, layer in heat_demand_layers.items()}, td_df)
+    heat_es_input = heat_es_input.set_index(drange)
 
     # %% export to csv file
     if dispaset_version == '2.5' and write_csv:
@@ -95,11 +128,11 @@ def get_x_demand(layer_x, td_df, drange, write_csv=True, file_name='H2_demand',
     """
     layer_x = clean_blanks(layer_x, idx=False)
     layer_x = layer_x.dropna(axis=1, how='all')
-    layer_x = layer_x.loc[:, columns]
+    # the whole layer is expanded (and cached) once, columns are selected at hourly resolution
+    layer_x = expand_layer(layer_x, td_df).loc[:, columns]
     # computing consumption of H2
     # TODO automatise name zone assignment
-    x_td = pd.DataFrame(layer_x.sum(axis=1), columns=[layer_name])
-    x_ts = assign_td(x_td, td_df) * 1000  # Convert to MW
+    x_ts = pd.DataFrame(layer_x.sum(axis=1), columns=[layer_name]) * 1000  # Convert to MW
     x_ts.set_index(drange, inplace=True)
     if dispaset_version == '2.5':
         x_max_demand = pd.DataFrame(x_ts.max(), columns=['Capacity'])
@@ -140,9 +173,7 @@ def get_outage_factors(config_es, es_outputs, local_res, td_df, drange, write_cs
         outage_factors = outage_factors.merge(compute_outage_factor(config_es, es_outputs['assets'], r),
                                               left_index=True, right_index=True)
 
-    outage_factors_yr = td_df.loc[:, ['TD', 'hour']]
-    outage_factors_yr = outage_factors_yr.merge(outage_factors, left_on=['TD', 'hour'], right_index=True).sort_index()
-    outage_factors_yr.drop(columns=['TD', 'hour'], inplace=True)
+    outage_factors_yr = expand_layer(outage_factors, td_df).copy()
     outage_factors_yr.rename(columns=lambda x: 'ES_' + x, inplace=True)
     outage_factors_yr.set_index(drange, inplace=True)
     if write_csv:
@@ -175,7 +206,7 @@ def get_soc(es_outputs, config_es, drange, sto_size_min=0.01, write_csv=True, fi
 
 
 def get_availability_factors(es_outputs, drange, countries=['ES'], write_csv=True, file_name_af='AvailabilityFactors',
-                             file_name_sif='ScaledInFlows'):
+                             file_name_sif='ScaledInFlows', es_mapping=None):
     """
     Get availability factors from Energy Scope and covert them to Dispa-SET readable format
     :param es_outputs:      EnergyScope outputs
@@ -184,8 +215,10 @@ def get_availability_factors(es_outputs, drange, countries=['ES'], write_csv=Tru
     :param write_csv:       Bool for writing csv files True/False
     :param file_name_af:    Name of the availability factor csv file
     :param file_name_sif:   Name of the scaled inflows csv file
+    :param es_mapping:      ES mapping table (get_es_mapping), compiled from the mapping dictionaries by default
     :return:                RES time-series
     """
+    es_mapping = get_es_mapping(es_mapping)
 
     # %% Create data structures
     res_timeseries = {}
@@ -197,10 +230,7 @@ def get_availability_factors(es_outputs, drange, countries=['ES'], write_csv=Tru
         af_es_df = es_outputs['timeseries'].loc[:, ['PV', 'Wind_onshore', 'Wind_offshore', 'Hydro_river']]
 
         # %% Compute availability factors
-        availability_factors_ds = []
-        for i in af_es_df:
-            if i in mapping['ES']['TECH']:
-                availability_factors_ds.append(mapping['ES']['TECH'][i])
+        availability_factors_ds = list(es_mapping['TECH'].reindex(af_es_df.columns).dropna())
         availability_factors_ds_df = af_es_df.set_axis(availability_factors_ds, axis=1, inplace=False)
         for i in availability_factors_ds:
             availability_factors_ds_df.loc[availability_factors_ds_df[i] < 0, i] = 0
@@ -209,11 +239,8 @@ def get_availability_factors(es_outputs, drange, countries=['ES'], write_csv=Tru
 
         # %% Compute scaled inflows, if present
         try:
-            inflows_ds = []
             inflows_es_df = es_outputs['timeseries'].loc[:, ['Hydro_dam']]
-            for i in inflows_es_df:
-                if i in mapping['ES']['TECH']:
-                    inflows_ds.append(mapping['ES']['TECH'][i])
+            inflows_ds = list(es_mapping['TECH'].reindex(inflows_es_df.columns).dropna())
             inflow_timeseries[country] = inflows_es_df.set_axis(inflows_ds, axis=1)
         except:
             logging.error('Hydro_dam time-series not present in ES')
@@ -239,7 +266,7 @@ def get_ev_demand(es_outputs, td_df, ds_inputs, drange, write_csv=True, file_nam
     :param file_name:   Name of the csv file
     :return:            ev_demand
     """
-    electricity_layers = assign_td(es_outputs['electricity_layers'], td_df) * 1000
+    electricity_layers = expand_layer(es_outputs['electricity_layers'], td_df) * 1000
     ev_cols = ['ES_PHEV_BATT', 'ES_BEV_BATT']
     ev_scaled_demand = pd.DataFrame()
     for ev in ev_cols:
@@ -261,6 +288,72 @@ def get_ev_demand(es_outputs, td_df, ds_inputs, drange, write_csv=True, file_nam
     return ev_demand
 
 
+# Boundary sector layers: name of the layer in es_outputs and name of the sector in Dispa-SET
+x_sectors = {'layer': {'h2': 'h2_layer',
+                       'ammonia': 'ammonia_layer',
+                       'gas': 'gas_layer',
+                       'ind': 'high_t_Layers',
+                       'dhn': 'low_t_dhn_Layers',
+                       'dec': 'low_t_decen_Layers',
+                       'wood': 'wood_layer',
+                       'lfo': 'lfo_layer',
+                       'coal': 'coal_layer',
+                       'waste': 'waste_layer'},
+             'layer_name': {'h2': 'ES_H2',
+                            'ammonia': 'ES_AMO',
+                            'gas': 'ES_GAS',
+                            'ind': 'ES_IND',
+                            'dhn': 'ES_DHN',
+                            'dec': 'ES_DEC',
+                            'wood': 'ES_BIO',
+                            'lfo': 'ES_OIL',
+                            'coal': 'ES_HRD',
+                            'waste': 'ES_WST'},
+             'lookup': {'XVarSupply': '_var_sup',
+                        'XVarDemand': '_var_dem',
+                        'XFixSupply': '_fix_sup',
+                        'XFixDemand': '_fix_dem'}
+             }
+
+# Layers represented in each of the boundary sector time-series
+x_timeseries_layers = {'XFixDemand': ['h2', 'ammonia', 'ind', 'dhn', 'dec', 'wood', 'lfo', 'coal', 'waste'],
+                       'XVarDemand': ['ind'],
+                       'XFixSupply': ['h2', 'ammonia', 'ind', 'dhn', 'dec', 'lfo'],
+                       'XVarSupply': ['h2', 'ammonia', 'ind', 'dhn', 'dec', 'wood', 'lfo', 'coal', 'waste']}
+
+
+def get_x_timeseries(df, td_df, drange, layers=None):
+    """
+    Build all the boundary sector time-series in a single pass: each layer is cleaned once, the column groups of
+    common['ES'] are summed at typical day resolution and all the resulting columns are expanded to hourly resolution
+    in one step
+    :param df:          Energy Scope output layers
+    :param td_df:       Typical day to hourly dataframe
+    :param drange:      Date range
+    :param layers:      Dictionary {var_name: list of layers}, x_timeseries_layers by default
+    :return:            Dictionary {var_name: time-series [MW]} with XFixDemand, XVarDemand, XFixSupply, XVarSupply
+                        (ES sign convention, i.e. demands are negative)
+    """
+    if layers is None:
+        layers = x_timeseries_layers
+    cleaned = {}
+    td_columns = {}
+    for var_name, var_layers in layers.items():
+        for layer in var_layers:
+            if layer not in cleaned:
+                layer_x = clean_blanks(df[x_sectors['layer'][layer]], idx=False)
+                cleaned[layer] = layer_x.dropna(axis=1, how='all')
+            columns = common['ES'][layer + x_sectors['lookup'][var_name]]
+            td_columns[(var_name, x_sectors['layer_name'][layer])] = cleaned[layer].loc[:, columns].sum(axis=1)
+    if not td_columns:
+        return {var_name: pd.DataFrame(index=drange) for var_name in layers}
+    x_td = pd.DataFrame(td_columns)
+    x_ts = expand_layer(x_td, td_df) * 1000  # Convert to MW
+    x_ts.set_index(drange, inplace=True)
+    return {var_name: x_ts[var_name].copy() if var_layers else pd.DataFrame(index=drange)
+            for var_name, var_layers in layers.items()}
+
+
 def merge_timeseries_x(ds_inputs, df, td_df, drange, dispaset_version, i):
     """
     Merge all the supply demand time-series into a single csv file
@@ -271,34 +364,28 @@ def merge_timeseries_x(ds_inputs, df, td_df, drange, dispaset_version, i):
     :param dispaset_version:    Dispaset version
     :return:                    populated ds_inputs dictionary
     """
-    # Assign fixed demands in Sector X
-    ds_inputs['XFixDemand'][i] = - cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i,
-                                              var_name='XFixDemand',
-                                              # layers=['h2', 'ammonia', 'gas', 'ind', 'dhn', 'dec', 'wood', 'lfo',
-                                              # 'coal', 'waste'])
-                                              layers=['h2', 'ammonia', 'ind', 'dhn', 'dec', 'wood', 'lfo', 'coal',
-                                                      'waste'])
-    # Assign Variable Demands in Sector X
-    ds_inputs['XVarDemand'][i] = - cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i,
-                                              # var_name='XVarDemand', layers=['gas', 'ind'])
-                                              var_name='XVarDemand', layers=['ind'])
-    # Assign fixed supply in Sector X
-    ds_inputs['XFixSupply'][i] = cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i,
-                                            # var_name='XFixSupply', layers=['h2', 'ammonia', 'gas', 'dhn', 'lfo'])
-                                            var_name='XFixSupply', layers=['h2', 'ammonia', 'ind', 'dhn', 'dec', 'lfo'])
-    # Assign variable supply in Sector X
-    ds_inputs['XVarSupply'][i] = cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i,
-                                            var_name='XVarSupply',
-                                            # layers=['h2', 'ammonia', 'gas', 'wood', 'lfo', 'coal', 'waste'])
-                                            layers=['h2', 'ammonia', 'ind', 'dhn', 'dec', 'wood', 'lfo', 'coal',
-                                                    'waste'])
+    x_ts = get_x_timeseries(df, td_df, drange)
+    # Assign fixed and variable demands in Sector X
+    ds_inputs['XFixDemand'][i] = - x_ts['XFixDemand']
+    ds_inputs['XVarDemand'][i] = - x_ts['XVarDemand']
+    # Assign fixed and variable supply in Sector X
+    ds_inputs['XFixSupply'][i] = x_ts['XFixSupply']
+    ds_inputs['XVarSupply'][i] = x_ts['XVarSupply']
+    if dispaset_version == '2.5':
+        # The per-layer loop (get_x_demand with its default file_name) wrote H2_demand.csv and PtLCapacities.csv after
+        # every layer, the files hold the last one (ES_WST of XVarSupply, ES sign convention): kept as is so that the
+        # DS inputs do not change
+        last_ts = x_ts['XVarSupply'].loc[:, ['ES_WST']]
+        write_csv_files('H2_demand', last_ts, 'H2_demand', index=True, write_csv=True)
+        write_csv_files('PtLCapacities', pd.DataFrame(last_ts.max(), columns=['Capacity']), 'H2_demand', index=True,
+                        write_csv=True)
     return ds_inputs
 
 
 def cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i, var_name='XVarSupply',
                layers=['h2', 'ammonia', 'gas', 'ind', 'dhn', 'dec', 'wood', 'lfo', 'coal', 'waste']):
     """
-
+    Build one of the boundary sector time-series (see get_x_timeseries to build all of them at once)
     :param ds_inputs:           ds_inputs dictionary
     :param df:                  Energy Scope output layers
     :param td_df:               Typical day to hourly dataframe
@@ -309,38 +396,5 @@ def cocncat_ts(ds_inputs, df, td_df, drange, dispaset_version, i, var_name='XVar
     :param layers:              Layers to be represented as a boundary sector
     :return:
     """
-    mpng = {'layer': {'h2': 'h2_layer',
-                      'ammonia': 'ammonia_layer',
-                      'gas': 'gas_layer',
-                      'ind': 'high_t_Layers',
-                      'dhn': 'low_t_dhn_Layers',
-                      'dec': 'low_t_decen_Layers',
-                      'wood': 'wood_layer',
-                      'lfo': 'lfo_layer',
-                      'coal': 'coal_layer',
-                      'waste': 'waste_layer'},
-            'layer_name': {'h2': 'ES_H2',
-                           'ammonia': 'ES_AMO',
-                           'gas': 'ES_GAS',
-                           'ind': 'ES_IND',
-                           'dhn': 'ES_DHN',
-                           'dec': 'ES_DEC',
-                           'wood': 'ES_BIO',
-                           'lfo': 'ES_OIL',
-                           'coal': 'ES_HRD',
-                           'waste': 'ES_WST'},
-            'lookup': {'XVarSupply': '_var_sup',
-                       'XVarDemand': '_var_dem',
-                       'XFixSupply': '_fix_sup',
-                       'XFixDemand': '_fix_dem'}
-            }
-
-    ds_inputs[var_name][i] = pd.DataFrame()
-    for layer in layers:
-        ds_inputs[var_name][i] = pd.concat([ds_inputs[var_name][i],
-                                            get_x_demand(df[mpng['layer'][layer]], td_df, drange,
-                                                         dispaset_version=dispaset_version,
-                                                         columns=common['ES'][layer + mpng['lookup'][var_name]],
-                                                         layer_name=mpng['layer_name'][layer])], axis=1)
-
+    ds_inputs[var_name][i] = get_x_timeseries(df, td_df, drange, layers={var_name: layers})[var_name]
     return ds_inputs[var_name][i]
@@ -0,0 +1,248 @@
+"""
+This script reads the EnergyScope outputs needed by Dispa-LINK
+Input : EnergyScope case study (output/hourly_data/layer_*.txt)
+Output : EnergyScope outputs as dataframes
+
+The hourly_data layers are converted once into a columnar cache file (Feather, uncompressed) next to the source file.
+The cache stores the stripped column names and a fingerprint (mtime, size and hash) of the source file so that later
+reads are binary loads without any parsing. The values are copied once into a single writable block: layers are modified
+in place by the preprocessing functions, which rules out read-only zero-copy views of the file.
+"""
+from __future__ import division
+
+import hashlib
+import json
+import functools
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+from ..search import clean_blanks
+
+layer_cache_suffix = '.feather'
+# Key of the schema metadata holding the fingerprint of the source file
+layer_cache_key = b'dispa_link_source'
+
+# es_outputs key: hourly_data layer file of the case study
+es_layer_files = {'electricity_layers': 'layer_ELECTRICITY.txt',
+                  'h2_layer': 'layer_H2.txt',
+                  'ammonia_layer': 'layer_AMMONIA.txt',
+                  'gas_layer': 'layer_GAS.txt',
+                  'wood_layer': 'layer_WOOD.txt',
+                  'lfo_layer': 'layer_LFO.txt',
+                  'coal_layer': 'layer_COAL.txt',
+                  'waste_layer': 'layer_WASTE.txt',
+                  'high_t_Layers': 'layer_HEAT_HIGH_T.txt',
+                  'low_t_decen_Layers': 'layer_HEAT_LOW_T_DECEN.txt',
+                  'low_t_dhn_Layers': 'layer_HEAT_LOW_T_DHN.txt'}
+
+# es_outputs key: ES data file (in the data folder), index column and whether blank spaces are cleaned
+es_data_files = {'timeseries': ('Time_series.csv', None, False),
+                 'demands': ('Demand.csv', None, False),
+                 'layers_in_out': ('Layers_in_out.csv', 'param layers_in_out:', True),
+                 'storage_characteristics': ('Storage_characteristics.csv', 'param :', True),
+                 'storage_eff_in': ('Storage_eff_in.csv', 'param storage_eff_in :', True),
+                 'storage_eff_out': ('Storage_eff_out.csv', 'param storage_eff_out:', True)}
+
+
+def file_fingerprint(path, digest=True):
+    """
+    Fingerprint of a file used to invalidate the layer cache
+    :param path:    path to the file
+    :param digest:  compute the sha1 hash of the content as well
+    :return:        dictionary with mtime_ns, size and sha1 (None if digest is False)
+    """
+    stat = os.stat(path)
+    sha1 = None
+    if digest:
+        h = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        sha1 = h.hexdigest()
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha1': sha1}
+
+
+def layer_cache_path(path):
+    """
+    Path of the cache file of a layer file, i.e. layer_ELECTRICITY.txt -> layer_ELECTRICITY.feather (same folder)
+    """
+    return os.path.splitext(str(path))[0] + layer_cache_suffix
+
+
+def parse_layer(path):
+    """
+    Parse an EnergyScope hourly_data layer file (tab separated, indexed by typical day and hour)
+    :param path:    path to the layer_*.txt file
+    :return:        layer with stripped column names
+    """
+    df = pd.read_csv(path, delimiter='\t', index_col=[0, 1])
+    df.rename(columns=lambda x: x.strip(), inplace=True)
+    return df
+
+
+def _read_layer_cache(path, cache_path):
+    """
+    Load of the cache file, None if it is missing or its fingerprint does not match the source file
+    """
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        table = feather.read_table(cache_path, memory_map=True)
+        source = json.loads(table.schema.metadata[layer_cache_key])
+    except (OSError, KeyError, TypeError, ValueError, pa.ArrowException):
+        logging.warning('Layer cache ' + cache_path + ' could not be read, it will be rebuilt')
+        return None
+    current = file_fingerprint(path, digest=False)
+    if current['size'] != source['size']:
+        return None
+    # Same size but touched/copied file: only the content matters
+    if current['mtime_ns'] != source['mtime_ns'] and file_fingerprint(path)['sha1'] != source['sha1']:
+        return None
+    return _table_to_layer(table)
+
+
+def _table_to_layer(table):
+    """
+    Convert the cached table to a layer, building the (typical day, hour) index and a single block of values directly
+    when all the columns share the same type (much faster than the generic conversion for the ES layers). Every column
+    is copied: to_pandas(split_blocks=True, self_destruct=True) would keep some columns as views of the file, but these
+    are read-only and one block per column makes the conversion about twice as slow.
+    """
+    index_columns = table.schema.pandas_metadata['index_columns']
+    columns = [name for name in table.schema.names if name not in index_columns]
+    if len(set(table.schema.field(name).type for name in columns)) != 1 or \
+            not all(isinstance(name, str) for name in index_columns):
+        return table.to_pandas()
+    index = pd.MultiIndex.from_arrays([table.column(name).to_numpy() for name in index_columns], names=index_columns)
+    values = np.column_stack([table.column(name).to_numpy() for name in columns])
+    return pd.DataFrame(values, index=index, columns=columns)
+
+
+def _write_layer_cache(df, path, cache_path):
+    """
+    Write the layer and the fingerprint of its source file into the cache file
+    """
+    table = pa.Table.from_pandas(df)
+    metadata = dict(table.schema.metadata or {})
+    metadata[layer_cache_key] = json.dumps(file_fingerprint(path)).encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp_path = cache_path + '.tmp' + str(os.getpid())
+    try:
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException):
+        logging.warning('Layer cache ' + cache_path + ' could not be written')
+        if os.path.isfile(tmp_path):
+            os.remove(tmp_path)
+
+
+@functools.lru_cache(maxsize=None)
+def _log_cache_disabled():
+    """
+    Log (once) that the layer cache is disabled
+    """
+    logging.warning('pyarrow is not installed, the layer cache is disabled (pip install dispa_link[cache])')
+
+
+def read_layer(path, cache=True):
+    """
+    Read an EnergyScope hourly_data layer file, through its columnar cache if possible
+    :param path:    path to the layer_*.txt file
+    :param cache:   use (and build if needed) the cache file next to the source file
+    :return:        layer indexed by typical day and hour, with stripped column names
+    """
+    if cache and pa is None:
+        _log_cache_disabled()
+    if not cache or pa is None:
+        return parse_layer(path)
+    cache_path = layer_cache_path(path)
+    df = _read_layer_cache(path, cache_path)
+    if df is None:
+        logging.info('Building layer cache ' + cache_path)
+        df = parse_layer(path)
+        _write_layer_cache(df, path, cache_path)
+    return df
+
+
+def read_data_file(path, index_col=None, clean=False, separator=';'):
+    """
+    Read an ES data file (Layers_in_out.csv, Storage_characteristics.csv...)
+    :param path:        path to the file
+    :param index_col:   index column
+    :param clean:       remove blank spaces from the index and columns
+    :param separator:   csv separator
+    :return:            dataframe
+    """
+    df = pd.read_csv(path, sep=separator, index_col=index_col)
+    if clean:
+        df = clean_blanks(df)
+    return df
+
+
+def _timed(name, function, *args, **kwargs):
+    """
+    Run function and log its duration
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    logging.info('Read ' + name + ' in ' + str(round((time.perf_counter() - start) * 1000, 1)) + ' ms')
+    return result
+
+
+def load_es_case(case_dir, data_folder, layers=None, data_files=None, read_outputs=None, separator=';',
+                 max_workers=None, cache=True):
+    """
+    Read all the ES outputs of a case study at the same time with a thread pool (the pandas parser releases the GIL)
+    :param case_dir:        case study folder, i.e. case_studies/<case_study>
+    :param data_folder:     ES data folder (Time_series.csv, Demand.csv, Layers_in_out.csv, Storage_*.csv)
+    :param layers:          es_outputs keys of the hourly_data layers to read (list) or dictionary key: layer file,
+                            all the es_layer_files by default
+    :param data_files:      es_outputs keys of the data files to read, all the es_data_files by default
+    :param read_outputs:    function returning the ES outputs dictionary (assets, year_balance...), i.e.
+                            functools.partial(es.read_outputs, case_study, True, []), run in the pool as well
+    :param separator:       csv separator of the data files
+    :param max_workers:     number of threads (ThreadPoolExecutor default if None)
+    :param cache:           read the layers through their columnar cache (read_layer)
+    :return:                es_outputs dictionary
+    """
+    if layers is None:
+        layers = es_layer_files
+    elif not isinstance(layers, dict):
+        layers = {key: es_layer_files[key] for key in layers}
+    if data_files is None:
+        data_files = list(es_data_files)
+    hourly_data = os.path.join(str(case_dir), 'output', 'hourly_data')
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        if read_outputs is not None:
+            futures[None] = pool.submit(_timed, 'ES outputs', read_outputs)
+        for key in data_files:
+            file_name, index_col, clean = es_data_files[key]
+            futures[key] = pool.submit(_timed, file_name, read_data_file, os.path.join(str(data_folder), file_name),
+                                       index_col=index_col, clean=clean, separator=separator)
+        for key, file_name in layers.items():
+            futures[key] = pool.submit(_timed, file_name, read_layer, os.path.join(hourly_data, file_name),
+                                       cache=cache)
+        es_outputs = dict(futures.pop(None).result()) if None in futures else {}
+        for key, future in futures.items():
+            es_outputs[key] = future.result()
+
+    # Clean ES outputs i.e. remove blank spaces
+    for key in ['assets', 'year_balance']:
+        if key in es_outputs:
+            es_outputs[key] = clean_blanks(es_outputs[key])
+    logging.info('ES case ' + str(case_dir) + ' read in ' + str(round(time.perf_counter() - start, 2)) + ' s')
+    return es_outputs
@@ -0,0 +1,248 @@
+"""
+Results store of the bi-directional soft-linking loop
+Input : DS inputs and results, MTS inputs and results and ES outputs of each iteration, ES configuration
+Output : one file per (group, iteration, variable) and a manifest (json) describing them
+
+Dataframes and series are written as Parquet files split in row groups, any other object (dictionaries of the DS
+inputs, configuration values...) is pickled on its own. A variable is read only when it is accessed: Parquet files are
+opened memory-mapped and only the requested columns are decoded, so reading OutputShedLoad of loop 2 does not load the
+rest of the run. Parquet needs pyarrow (pip install dispa_link[cache]), without it every object is pickled.
+"""
+import functools
+import json
+import logging
+import os
+import pickle
+import threading
+from collections.abc import Mapping
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+results_manifest_name = 'manifest.json'
+# Rows per Parquet row group (a quarter of an hourly year)
+results_row_group_size = 2190
+
+
+@functools.lru_cache(maxsize=None)
+def _log_parquet_disabled():
+    """
+    Log (once) that the dataframes are pickled
+    """
+    logging.warning('pyarrow is not installed, the results are pickled instead of written as Parquet files '
+                    '(pip install dispa_link[cache])')
+
+
+def _group_key(group, iteration=None):
+    return group if iteration is None else group + '/' + str(iteration)
+
+
+def _file_name(name):
+    """
+    File name of a variable (path separators and leading dots are replaced)
+    """
+    name = str(name).replace(os.sep, '_').replace('/', '_')
+    return '_' + name[1:] if name.startswith('.') else name
+
+
+class ResultsStore(object):
+    """
+    On-disk store of the soft-linking results: <root>/<group>/loop_<iteration>/<variable>.parquet (or .p) and a
+    manifest holding the format, type and file of each variable.
+    """
+
+    def __init__(self, root, row_group_size=results_row_group_size):
+        """
+        :param root:            folder of the store (one per case study)
+        :param row_group_size:  number of rows of the Parquet row groups
+        """
+        self.root = str(root)
+        self.row_group_size = row_group_size
+        self.manifest_path = os.path.join(self.root, results_manifest_name)
+        try:
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self._lock = threading.Lock()
+
+    def folder(self, group, iteration=None):
+        """
+        Folder of the variables of a group (and iteration)
+        """
+        if iteration is None:
+            return os.path.join(self.root, group)
+        return os.path.join(self.root, group, 'loop_' + str(iteration))
+
+    def iterations(self, group):
+        """
+        Iterations stored for a group, sorted
+        """
+        prefix = group + '/'
+        return sorted(int(key[len(prefix):]) for key in self.manifest if key.startswith(prefix))
+
+    def variables(self, group, iteration=None):
+        """
+        Names of the variables stored for a group (and iteration)
+        """
+        return list(self.manifest.get(_group_key(group, iteration), {}))
+
+    def _write_frame(self, df, path):
+        """
+        Write a dataframe as a Parquet file, return False if it cannot be converted (mixed object columns, duplicated
+        column names...)
+        """
+        if pa is None:
+            _log_parquet_disabled()
+            return False
+        try:
+            table = pa.Table.from_pandas(df)
+            pq.write_table(table, path + '.tmp', row_group_size=self.row_group_size)
+        except (pa.ArrowException, TypeError, ValueError):
+            if os.path.isfile(path + '.tmp'):
+                os.remove(path + '.tmp')
+            return False
+        os.replace(path + '.tmp', path)
+        return True
+
+    def write(self, group, iteration, name, value):
+        """
+        Write one variable (the manifest is written by save_manifest)
+        :param group:       name of the group, i.e. results
+        :param iteration:   soft-linking iteration, None for objects that do not depend on the iteration
+        :param name:        name of the variable
+        :param value:       dataframe, series or any picklable object
+        :return:            manifest entry of the variable
+        """
+        folder = self.folder(group, iteration)
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, _file_name(name))
+        entry = None
+        if isinstance(value, pd.Series) and (value.name is None or isinstance(value.name, str)):
+            if self._write_frame(value.to_frame('value'), path + '.parquet'):
+                entry = {'format': 'parquet', 'type': 'Series', 'name': value.name}
+        elif isinstance(value, pd.DataFrame):
+            if self._write_frame(value, path + '.parquet'):
+                entry = {'format': 'parquet', 'type': 'DataFrame'}
+        if entry is None:
+            with open(path + '.p.tmp', 'wb') as handle:
+                pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + '.p.tmp', path + '.p')
+            entry = {'format': 'pickle', 'file': os.path.relpath(path + '.p', self.root)}
+        else:
+            entry['file'] = os.path.relpath(path + '.parquet', self.root)
+            entry['rows'] = len(value)
+            # the frequency of a DatetimeIndex is not kept by Parquet
+            freq = getattr(value.index, 'freqstr', None) if isinstance(value.index, pd.DatetimeIndex) else None
+            if freq is not None:
+                entry['freq'] = freq
+        with self._lock:
+            self.manifest.setdefault(_group_key(group, iteration), {})[str(name)] = entry
+        return entry
+
+    def save_manifest(self):
+        """
+        Atomic write of the manifest
+        """
+        with self._lock:
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.manifest_path + '.tmp', 'w') as f:
+                json.dump(self.manifest, f, indent=1, sort_keys=True)
+            os.replace(self.manifest_path + '.tmp', self.manifest_path)
+
+    def read(self, group, iteration, name, columns=None):
+        """
+        Read one variable
+        :param group:       name of the group
+        :param iteration:   soft-linking iteration (or None)
+        :param name:        name of the variable
+        :param columns:     columns to be read (dataframes stored as Parquet only), all of them if None
+        :return:            stored object
+        """
+        try:
+            entry = self.manifest[_group_key(group, iteration)][str(name)]
+        except KeyError:
+            raise KeyError(str(name) + ' is not stored in ' + _group_key(group, iteration))
+        path = os.path.join(self.root, entry['file'])
+        if entry['format'] == 'pickle':
+            with open(path, 'rb') as handle:
+                return pickle.load(handle)
+        if pa is None:
+            raise ImportError(str(name) + ' is stored as a Parquet file, reading it requires pyarrow '
+                              '(pip install dispa_link[cache])')
+        if entry['type'] == 'Series':
+            columns = None
+        df = pq.read_pandas(path, columns=columns, memory_map=True).to_pandas()
+        if 'freq' in entry:
+            df.index.freq = entry['freq']
+        if entry['type'] == 'Series':
+            return df.iloc[:, 0].rename(entry['name'])
+        return df
+
+    def read_dict(self, group, iteration=None):
+        """
+        Read all the variables of a group (and iteration) into a dictionary
+        """
+        return {name: self.read(group, iteration, name) for name in self.variables(group, iteration)}
+
+    def lazy(self, group, iteration=None):
+        """
+        Read-only dictionary of the variables of a group (and iteration), each variable is read on first access
+        """
+        return LazyResults(self, group, iteration)
+
+
+class LazyResults(Mapping):
+    """
+    Mapping name: variable of a ResultsStore group, variables are read when they are first accessed and then kept
+    """
+
+    def __init__(self, store, group, iteration=None):
+        self.store = store
+        self.group = group
+        self.iteration = iteration
+        self._names = store.variables(group, iteration)
+        self._loaded = {}
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            if name not in self._names:
+                raise KeyError(name)
+            self._loaded[name] = self.store.read(self.group, self.iteration, name)
+        return self._loaded[name]
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __repr__(self):
+        return 'LazyResults(' + _group_key(self.group, self.iteration) + ', ' + str(self._names) + ')'
+
+
+def save_results(root, groups, single=()):
+    """
+    Write the results of a soft-linking run into a results store
+    :param root:    folder of the store
+    :param groups:  dictionary group: {iteration: dictionary of variables}, i.e. {'results': results}
+    :param single:  names of the groups that do not depend on the iteration ({name: variable})
+    :return:        ResultsStore
+    """
+    store = ResultsStore(root)
+    for group, values in groups.items():
+        if group in single:
+            for name, value in values.items():
+                store.write(group, None, name, value)
+        else:
+            for iteration, variables in values.items():
+                for name, value in variables.items():
+                    store.write(group, iteration, name, value)
+    store.save_manifest()
+    logging.info('Results written in ' + store.root)
+    return store
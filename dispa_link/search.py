@@ -1,5 +1,15 @@
+import atexit
+import contextlib
+import contextvars
 import glob
+import hashlib
+import json
 import logging
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 
 from .common import *
 from .constants import *
@@ -60,7 +70,8 @@ def search_year_balance(yearbal, tech, feat):
 #
 #
 def search_PowerPlant(country, tech, feat):
-    PowPlant = pd.read_csv(output_folder + 'Database/PowerPlants/' + country + '/' + 'PowerPlants.csv')
+    csv_exporter.flush()
+    PowPlant = pd.read_csv(get_output_folder() + 'Database/PowerPlants/' + country + '/' + 'PowerPlants.csv')
     PowPlant.index = PowPlant['Unit']
     tech = ''.join(c for c in tech if c not in '-(){}<>[], ')
     if 'H2' not in tech:
@@ -80,9 +91,9 @@ def search_PowerPlant(country, tech, feat):
 #
 def get_DistriStorage(country, type):
     if type == 'Heat':
-        distriSto = pd.read_csv(input_folder + country + '/' + 'Distri_TS.txt', delimiter='\t')
+        distriSto = pd.read_csv(get_input_folder() + country + '/' + 'Distri_TS.txt', delimiter='\t')
     else:
-        distriSto = pd.read_csv(input_folder + country + '/' + 'Distri_E_stored.txt', delimiter='\t')
+        distriSto = pd.read_csv(get_input_folder() + country + '/' + 'Distri_E_stored.txt', delimiter='\t')
 
     distriSto = distriSto.set_index(distriSto.columns[0])
     return distriSto
@@ -185,20 +196,15 @@ def search_Dict_list(old_list, type):
 # Output: - list of TD's distribution
 #
 def distri_TD(n_TD, TD_final, country=None):
-    # if country is None:
-    #     TD_final = pd.read_csv(input_folder + country + '/' + 'TD_file.csv')
-    # else:
-    #     TD_final = pd.read_csv(input_folder + '/' + 'TD_file.csv')
-    # # TD_final = pd.read_csv(input_folder_fromPrepare + country + '/' +'TD_file.csv')
-
-    distri = [0] * n_TD
-
-    for i in range(1, 366):
-        index = i * 24 - 1
-        TD = TD_final.loc[index, 'TD']
-        distri[TD - 1] = (distri[TD - 1] + 1)
-
-    return distri
+    """
+    Number of days of the year represented by each typical day
+    :param n_TD:        number of typical days
+    :param TD_final:    hourly typical day dataframe, as returned by process_TD
+    :return:            array of n_TD counts (typical day 1 first)
+    """
+    # TD of the last hour of each day
+    days_td = TD_final['TD'].values[23:8760:24].astype(np.int64)
+    return np.bincount(days_td, minlength=n_TD + 1)[1:n_TD + 1]
 
 
 ########################################################################################################################
@@ -227,7 +233,7 @@ def get_TD(TD_DF, hour, numbTD):
 # outputs :  - Values of LT for technology tech , for Typical day TD at h = hour
 
 def search_LTlayers(country, TD, hour, tech):
-    LT_layers = pd.read_csv(input_folder + country + '/' + 'LTlayers.txt', delimiter='\t')
+    LT_layers = pd.read_csv(get_input_folder() + country + '/' + 'LTlayers.txt', delimiter='\t')
 
     techno = list(LT_layers.head())
     techno = [x.strip(' ') for x in techno]
@@ -250,10 +256,12 @@ def search_LTlayers(country, TD, hour, tech):
 # Outputs :  - the yearly energy of dhn_sto_daily or dhn_sto_seasonal for each CHP or P2H
 #
 #
-def sto_dhn(tech_names, TYPE, numTD, assets, layer_t, td_hourly, country=None):  # Change the number of arguments - TO DO
-    n_TD = numTD
-    type = 'TS_DHN_' + TYPE
-    f_ts_dhn = search_assets(type, 'f', assets)  # Here, change the number of arguments - TO DO
+def split_dhn_tech(tech_names):
+    """
+    DHN technologies feeding the DHN thermal storages, in the order CHP, P2H, heat only
+    :param tech_names:  technology names
+    :return:            list of DHN technologies
+    """
     tech_chp = []
     tech_p2h = []
     tech_heat = []
@@ -265,60 +273,65 @@ def sto_dhn(tech_names, TYPE, numTD, assets, layer_t, td_hourly, country=None):
                 tech_heat.append(elem)
             else:
                 tech_p2h.append(elem)
-    tech_all = tech_chp + tech_p2h + tech_heat
+    return tech_chp + tech_p2h + tech_heat
 
-    sto_dhn_td = pd.DataFrame(index=range(0, n_TD), columns=tech_all)  # sto of each tech, daily (TD)
 
-    if f_ts_dhn == 0:  # This means there are no installed capacity, you can return an empty list
-        dhn_sto = pd.DataFrame(columns=tech_all)
+def sto_dhn_all(tech_names, numTD, assets, layer_t, td_hourly, types=('DAILY', 'SEASONAL'), country=None):
+    """
+    Allocation of the DHN thermal storages (TS_DHN_<TYPE>) to the DHN technologies, proportionally to the yearly energy
+    each technology sends to the storage. The share of each technology in the DHN production is computed once for all
+    the storage types (one pass over the LT DHN layer).
+    Differences with the previous per-type sto_dhn: a storage type without installed capacity gives a series of zeros
+    (was an empty dataframe), and the hours where the total DHN production is 0 are left out of the allocation (0/0
+    and x/0 shares are set to 0, the NaN shares were already skipped but the infinite ones propagated).
+    :param tech_names:  technology names
+    :param numTD:       number of typical days
+    :param assets:      ES assets
+    :param layer_t:     LT DHN layer (indexed by typical day and hour)
+    :param td_hourly:   hourly typical day dataframe, as returned by process_TD
+    :param types:       storage types
+    :return:            dictionary TYPE: storage size of each DHN technology (float64 series, NaN when no energy is
+                        sent to an installed storage)
+    """
+    tech_all = split_dhn_tech(tech_names)
+    f_ts_dhn = {TYPE: search_assets('TS_DHN_' + TYPE, 'f', assets) for TYPE in types}
+    dhn_sto = {TYPE: pd.Series(0.0, index=tech_all, dtype='float64') for TYPE in types}
+    installed = [TYPE for TYPE in types if f_ts_dhn[TYPE] != 0]
+    if not installed:  # This means there are no installed capacity
         return dhn_sto
 
-    # 1) Build a dataframe with LTLayers data
-    lt_layers_df_ori = layer_t
-    lt_layers_df = lt_layers_df_ori[tech_all].copy()  # Keeping only the releveant columns
-    lt_layers_df['SUM'] = lt_layers_df.sum(numeric_only=True, axis=1)  # Sum of all production at each hour
-
-    # 2) Compute Ratios
-    lt_layers_df[tech_all] = lt_layers_df[tech_all].div(lt_layers_df['SUM'], axis=0)
-
-    # 3) get Sto_Type_P_in, and Multiply Ratio with Storage Input at each hour
-    sto_df = -lt_layers_df_ori[type + '_Pin']  # Storage input at each hour ;
-    # NOTE : '-' sign is necessary as P_in is defined as negative
-    lt_layers_df[tech_all] = lt_layers_df[tech_all].mul(sto_df, axis=0)
-
-    # 4) groupby, TD, sum
-    #       - Add the TD column from the original
-    # lt_layers_df['Td'] = lt_layers_df_ori.iloc[:, 0].copy()  # Copy the first column which contains the Td
-    lt_layers_df['Td'] = lt_layers_df.index.get_level_values(0).values
-    #       - Drop the SUM column
-    lt_layers_df.drop('SUM', axis=1, inplace=True)
-    #       - GroupBy
-    sto_dhn_td = lt_layers_df.groupby('Td').sum()
-
-    # Multiply each elem of sto_dhn_td by distri_TD => gives total prod Sto of tech_x - HERE
-    # if country is None:
-    #     mydistri = distri_TD(country, n_TD, td_hourly)
-    # else:
-    #     mydistri = distri_TD(n_TD)
-    mydistri = distri_TD(n_TD, td_hourly, country)
-    dhn_interm = sto_dhn_td.mul(mydistri, axis=0)
-
-    # Multiply f_ts_dhn_seasonal by each ratio of storage. SizeOfSto_tech_x = f_ts_dhn_seasonal * (total_prod_Sto_tech_x) / (SUMi total_prod_Sto_techi)
-    dhn_interm2 = pd.DataFrame(columns=tech_all)
-    dhn_sto = pd.DataFrame(columns=tech_all)
-    for i in tech_all:
-        dhn_interm2.at[0, i] = dhn_interm[i].sum()
-    integ_dhn_sto = dhn_interm2.sum(axis=1)
-
-    for i in tech_all:
-        if integ_dhn_sto[0] == 0:
-            dhn_sto.at[0, i] = np.nan
+    # Share of each technology in the DHN production at each hour
+    production = layer_t[tech_all].to_numpy(dtype='float64')
+    total = production.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.nan_to_num(production / total[:, None], nan=0.0, posinf=0.0, neginf=0.0)
+
+    # Storage input at each hour (P_in is negative) weighted by the number of days of its typical day
+    mydistri = distri_TD(numTD, td_hourly, country)
+    td = np.asarray(layer_t.index.get_level_values(0), dtype=np.int64)
+    weight = mydistri[td - 1]
+    sto_in = -layer_t[['TS_DHN_' + TYPE + '_Pin' for TYPE in installed]].to_numpy(dtype='float64') * weight[:, None]
+
+    # Yearly energy sent to each storage by each technology (tech x types)
+    energy = ratio.T.dot(np.nan_to_num(sto_in))
+    for k, TYPE in enumerate(installed):
+        integ_dhn_sto = energy[:, k].sum()
+        # SizeOfSto_tech_x = f_ts_dhn * (total_prod_Sto_tech_x) / (SUMi total_prod_Sto_techi)
+        if integ_dhn_sto == 0:
+            dhn_sto[TYPE][:] = np.nan
         else:
-            dhn_sto.at[0, i] = f_ts_dhn * dhn_interm2.loc[0, i] / (integ_dhn_sto[0])
-
+            dhn_sto[TYPE][:] = f_ts_dhn[TYPE] * energy[:, k] / integ_dhn_sto
     return dhn_sto
 
 
+def sto_dhn(tech_names, TYPE, numTD, assets, layer_t, td_hourly, country=None):
+    """
+    Allocation of one DHN thermal storage (TS_DHN_<TYPE>) to the DHN technologies, see sto_dhn_all
+    :return:    storage size of each DHN technology (float64 series)
+    """
+    return sto_dhn_all(tech_names, numTD, assets, layer_t, td_hourly, types=(TYPE,), country=country)[TYPE]
+
+
 ########################################################################################################################
 
 # SEARCH TYPICAL UNITS : for the moment, these functions have to be called before running our scripts, but eventually, it could be useful to integrate it in the run of PowerPlants.py
@@ -334,97 +347,311 @@ def sto_dhn(tech_names, TYPE, numTD, assets, layer_t, td_hourly, country=None):
 ########################################################################################################################
 
 
+typical_units_catalogue_name = '.typical_units_catalogue.json'
+
+
+def _native(value):
+    """
+    JSON-compatible version of a catalogue key (numpy scalars to Python types, NaN to None)
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+class TypicalUnitsCatalogue(object):
+    """
+    Index of the power plant csv files of a folder tree (Typical Units): (Technology, Fuel, CHPType) -> (file, rows).
+    Each file is scanned once, the index is persisted in a sidecar file at the root of the tree and the entry of a file
+    is rebuilt only when its mtime or size changes. Files are kept in the glob order so that the first file holding a
+    technology is still the one used.
+    The tree is scanned once, on first use: lookups do not touch the file system (only the files holding the requested
+    technologies are read). Call refresh() to pick up files modified since then.
+    """
+
+    def __init__(self, root, sidecar=typical_units_catalogue_name):
+        """
+        :param root:    root folder of the tree
+        :param sidecar: name of the index file, written in root
+        """
+        self.root = root
+        self.sidecar = os.path.join(root, sidecar)
+        self._files = None
+        self._order = {}
+        self._pairs = {}
+        self._triples = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def scan(path):
+        """
+        Rows of each (Technology, Fuel, CHPType) of a csv file
+        :param path:    path to the csv file
+        :return:        list of [Technology, Fuel, CHPType, rows], CHPType is None when missing
+        """
+        df = pd.read_csv(path, usecols=lambda c: c in ('Technology', 'Fuel', 'CHPType'))
+        if 'Technology' not in df or 'Fuel' not in df:
+            return []
+        if 'CHPType' not in df:
+            df['CHPType'] = None
+        df = df.astype(object).where(df.notna(), None)
+        keys = []
+        for (tech, fuel, chp_type), rows in df.groupby(['Technology', 'Fuel', 'CHPType'], sort=False,
+                                                       dropna=False).indices.items():
+            keys.append([_native(tech), _native(fuel), _native(chp_type), rows.tolist()])
+        return keys
+
+    def _load(self):
+        try:
+            with open(self.sidecar) as f:
+                return json.load(f)['files']
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _save(self):
+        tmp_path = self.sidecar + '.tmp' + str(os.getpid())
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'root': os.path.abspath(self.root), 'files': self._files}, f)
+            os.replace(tmp_path, self.sidecar)
+        except (OSError, TypeError, ValueError):
+            logging.warning('Typical units catalogue ' + self.sidecar + ' could not be written')
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+
+    def refresh(self):
+        """
+        Update the index: new and modified files are scanned, deleted files are dropped (one glob, no parsing of the
+        unchanged files)
+        """
+        with self._lock:
+            known = self._load() if self._files is None else self._files
+            files = OrderedDict()
+            changed = False
+            for path in glob.glob(os.path.join(self.root, '**', '*.csv'), recursive=True):
+                rel = os.path.relpath(path, self.root)
+                stat = os.stat(path)
+                entry = known.get(rel)
+                if entry is None or entry['mtime_ns'] != stat.st_mtime_ns or entry['size'] != stat.st_size:
+                    try:
+                        keys = self.scan(path)
+                    except (ValueError, pd.errors.ParserError):
+                        logging.warning('Typical units: ' + path + ' could not be read, it is skipped')
+                        keys = []
+                    entry = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'keys': keys}
+                    changed = True
+                files[rel] = entry
+            changed = changed or list(files) != list(known)
+            self._files = files
+            self._order = {rel: k for k, rel in enumerate(files)}
+            self._pairs = {}
+            self._triples = {}
+            for rel, entry in files.items():
+                for tech, fuel, chp_type, rows in entry['keys']:
+                    self._pairs.setdefault((tech, fuel), {}).setdefault(rel, []).extend(rows)
+                    self._triples.setdefault((tech, fuel, chp_type), {})[rel] = rows
+            if changed:
+                self._save()
+
+    def locate(self, tech, fuel, CHPType=None, prefix=None):
+        """
+        File and rows of a technology
+        :param tech:        technology
+        :param fuel:        fuel
+        :param CHPType:     CHP type, None to look for the (tech, fuel) pair whatever the CHP type
+        :param prefix:      only consider the files of this subfolder (i.e. a country)
+        :return:            tuple (file, rows, fallback) or None if not found. fallback is True when only the Extraction
+                            type is found for a CHP unit, rows are then all the rows of the (tech, fuel) pair
+        """
+        if self._files is None:
+            self.refresh()
+
+        def first(files):
+            files = [rel for rel in files if prefix is None or rel.startswith(os.path.join(prefix, ''))]
+            return min(files, key=self._order.get) if files else None
+
+        pairs = self._pairs.get((tech, fuel), {})
+        if CHPType is None:
+            rel = first(pairs)
+            return None if rel is None else (rel, sorted(pairs[rel]), False)
+        exact = self._triples.get((tech, fuel, CHPType), {})
+        rel = first(set(exact) | set(self._triples.get((tech, fuel, 'Extraction'), {})))
+        if rel is None:
+            return None
+        if rel in exact:
+            return rel, exact[rel], False
+        return rel, sorted(pairs[rel]), True
+
+    def resolve(self, keys, prefix=None):
+        """
+        Typical units of several technologies, every file is read at most once
+        :param keys:    (Technology, Fuel) or (Technology, Fuel, CHPType) tuples
+        :param prefix:  only consider the files of this subfolder (i.e. a country)
+        :return:        dictionary key: dataframe of the matching rows (empty if not found)
+        """
+        if self._files is None:
+            self.refresh()
+        located = {}
+        for key in keys:
+            location = self.locate(*key, prefix=prefix)
+            if location is not None:
+                located.setdefault(location[0], []).append((key, location[1], location[2]))
+        result = {key: pd.DataFrame(columns=column_names) for key in keys}
+        for rel, matches in located.items():
+            path = os.path.join(self.root, rel)
+            PowerPlants = pd.read_csv(path)
+            for key, rows, fallback in matches:
+                units = PowerPlants.iloc[rows].copy()
+                if fallback:
+                    print('[WARNING] : no correspondance found for', key,
+                          'but well for CHPType = Extraction ; imposed filling typical units with the Extraction type as',
+                          key[2])
+                    units['CHPType'] = 'back-pressure'
+                else:
+                    print('[INFO] : correspondance found for', key, 'in file', path)
+                    # Sort columns as they should be
+                    try:
+                        units = units[column_names]
+                    except KeyError:
+                        print('not the right format of column_names in file', path)
+                result[key] = units
+        return result
+
+
+_typical_units_catalogues = {}
+
+
+def get_typical_units_catalogue(root=None):
+    """
+    Return the Typical Units catalogue of a folder tree, built once per folder
+    :param root:    root folder (input folder of the current context by default)
+    :return:        TypicalUnitsCatalogue
+    """
+    if root is None:
+        root = get_input_folder()
+    key = os.path.abspath(root)
+    if key not in _typical_units_catalogues:
+        _typical_units_catalogues[key] = TypicalUnitsCatalogue(root)
+    return _typical_units_catalogues[key]
+
+
+# Attributes of the ES technologies in constants.mapping['ES'], one column each in the ES mapping table (RESOURCE and
+# FUEL_COST are indexed by ES resources and stay dictionaries)
+es_mapping_attributes = ['SORT', 'TECH', 'FUEL', 'FUEL_ES', 'CHP_HEAT', 'HEAT_ONLY_HEAT', 'P2HT_HEAT',
+                         'THERMAL_STORAGE', 'P2GS_STORAGE']
+
+
+def compile_es_mapping(dictionaries=None):
+    """
+    Compile the ES -> DS mapping dictionaries into a single table
+    :param dictionaries:    dictionary attribute: {ES technology: value}, constants.mapping['ES'] by default
+    :return:                dataframe indexed by ES technology with one categorical column per attribute (NaN when the
+                            technology is not in the dictionary of an attribute)
+    """
+    dictionaries = mapping['ES'] if dictionaries is None else dictionaries
+    table = pd.DataFrame({attribute: pd.Series(dictionaries.get(attribute, {}), dtype=object)
+                          for attribute in es_mapping_attributes})
+    table.index.name = 'ES'
+    return table.astype('category')
+
+
+def read_es_mapping(path):
+    """
+    Read an ES mapping table (one row per ES technology, one column per attribute, empty cells for no value). A listed
+    technology with an empty SORT has no DS unit: its SORT is '', like in the SORT dictionary, so that get_capacities
+    drops it without reporting it as not referenced
+    :param path:    CSV or Parquet (.parquet) file
+    :return:        dataframe with the es_mapping_attributes columns, categorical
+    """
+    if str(path).endswith('.parquet'):
+        table = pd.read_parquet(path)
+    else:
+        table = pd.read_csv(path, index_col=0, dtype=str)
+    missing = [attribute for attribute in es_mapping_attributes if attribute not in table.columns]
+    if missing:
+        logging.warning('The ES mapping table ' + str(path) + ' has no column ' + ', '.join(missing) +
+                        '. No value will be assumed')
+    if 'SORT' in table.columns:
+        table['SORT'] = table['SORT'].astype(object).fillna('')
+    table = table.reindex(columns=es_mapping_attributes).astype(object).astype('category')
+    table.index.name = 'ES'
+    return table
+
+
+def get_es_mapping(es_mapping=None):
+    """
+    ES mapping table from its different sources
+    :param es_mapping:  None (compiled from constants.mapping), path of a table file (read_es_mapping) or table
+    :return:            ES mapping table
+    """
+    if es_mapping is None:
+        return compile_es_mapping()
+    if isinstance(es_mapping, pd.DataFrame):
+        return es_mapping
+    return read_es_mapping(es_mapping)
+
+
+def es_attribute(es_mapping, techs, attribute):
+    """
+    Vectorized look-up of an attribute of ES technologies (the dict.get of the mapping dictionaries)
+    :param es_mapping:  ES mapping table
+    :param techs:       list of ES technologies
+    :param attribute:   attribute, i.e. 'TECH', 'FUEL_ES'...
+    :return:            object array, None where the technology has no value
+    """
+    values = es_mapping[attribute].reindex(pd.Index(list(techs), dtype=object)).to_numpy(dtype=object)
+    values[pd.isna(values)] = None
+    return values
+
+
 # Input :    tech = technology studied
 #           feat = feature needed regarding to the technology studied
 # Output :   Dataframe with oeline containing the new Typical Unit
 def search_TypicalUnits(tech, fuel):
-    # Créer la liste des fichiers à parcourir
-    files = [f for f in glob.glob(input_folder + "**/*.csv", recursive=True)]
-    # Parcourir les fichiers dans tous les dossiers et sous-dossiers
-    for f in files:
-        PowerPlants = pd.read_csv(f)
-        # Si on tient le bon couple de tech_fuel...
-        if (not PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel)].empty):
-            print('[INFO] : correspondance found for', (tech, fuel), 'in file', f)
-            # Sort columns as they should be
-            try:
-                PowerPlants = PowerPlants[column_names]
-                return PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel)]
-            except:
-                print('not the right format of column_names in file', f)
-            return PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel)]
-
-    return pd.DataFrame(columns=column_names)  # 'NOTHING for' + tech + fuel
+    return get_typical_units_catalogue().resolve([(tech, fuel)])[(tech, fuel)]
 
 
 ########################################################################################################################
 
 
 def search_TypicalUnits_CHP(country, tech, fuel, CHPType):
-    # Créer la liste des fichiers à parcourir
-    files = [f for f in glob.glob(input_folder + country + '/' + "**/*.csv", recursive=True)]
-
-    # Parcourir les fichiers dans tous les dossiers et sous-dossiers
-    for f in files:
-        PowerPlants = pd.read_csv(f)
-
-        # Si on tient le bon couple de tech_fuel...
-        if (not PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel) & (
-                PowerPlants['CHPType'] == CHPType)].empty):
-            print('[INFO] : correspondance found for', (tech, fuel, CHPType), 'in file', f)
-            # Sort columns as they should be
-            try:
-                PowerPlants = PowerPlants[column_names]
-                return PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel) & (
-                        PowerPlants['CHPType'] == CHPType)]
-            except:
-                print('not the right format of column_names in file', f)
-            return PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel) & (
-                    PowerPlants['CHPType'] == CHPType)]
-
-        elif (not PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel) & (
-                PowerPlants['CHPType'] == 'Extraction')].empty):
-
-            print('[WARNING] : no correspondance found for', (tech, fuel, CHPType),
-                  'but well for CHPType = Extraction ; imposed filling typical units with the Extraction type as',
-                  CHPType)
-            PowerPlants.loc[
-                (PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel), 'CHPType'] = 'back-pressure'
-
-            return PowerPlants.loc[(PowerPlants['Technology'] == tech) & (PowerPlants['Fuel'] == fuel)]
-    return pd.DataFrame(columns=column_names)  # 'NOTHING for' + tech + fuel
+    return get_typical_units_catalogue().resolve([(tech, fuel, CHPType)], prefix=country)[(tech, fuel, CHPType)]
 
 
 ########################################################################################################################
 
 def write_TypicalUnits(missing_tech):
-    Typical_Units = pd.read_csv(input_folder + 'Typical_Units.csv')
+    Typical_Units = pd.read_csv(get_input_folder() + 'Typical_Units.csv')
     powerplants = pd.DataFrame(columns=column_names)
 
+    found = get_typical_units_catalogue().resolve(missing_tech)
     for (i, j) in missing_tech:
-        tmp = search_TypicalUnits(i, j)
+        tmp = found[(i, j)]
         if tmp.empty:
             print('[WARNING] : no correspondance found for the TECH_FUEL :', (i, j))
         else:
             powerplants = pd.concat([powerplants, tmp])
     Typical_Units = pd.concat([Typical_Units, powerplants])
-    Typical_Units.to_csv(input_folder + 'Typical_Units_modif.csv', index=False)
+    Typical_Units.to_csv(get_input_folder() + 'Typical_Units_modif.csv', index=False)
 
 
 ########################################################################################################################
 
-def write_TypicalUnits_CHP(missing_tech_CHP):
-    Typical_Units = pd.read_csv(input_folder + 'Typical_Units.csv')
+def write_TypicalUnits_CHP(missing_tech_CHP, country=None):
+    Typical_Units = pd.read_csv(get_input_folder() + 'Typical_Units.csv')
     powerplants = pd.DataFrame(columns=column_names)
 
+    found = get_typical_units_catalogue().resolve(missing_tech_CHP, prefix=country)
     for (i, j, k) in missing_tech_CHP:
-        tmp = search_TypicalUnits_CHP(i, j, k)
+        tmp = found[(i, j, k)]
         if tmp.empty:
             print('[WARNING] : no correspondance found for the TECH_FUEL :', (i, j, k))
         else:
             powerplants = pd.concat([powerplants, tmp])
     Typical_Units = pd.concat([Typical_Units, powerplants])
-    Typical_Units.to_csv(input_folder + 'Typical_Units_modif.csv', index=False)
+    Typical_Units.to_csv(get_input_folder() + 'Typical_Units_modif.csv', index=False)
 
 
 ########################################################################################################################
@@ -482,6 +709,189 @@ def clean_blanks(df, cols=True, idx=True):
     return df
 
 
+class TDExpander(object):
+    """
+    Typical day expansion engine. The (TD, hour) keys of every hour of the year are extracted once from the output of
+    process_TD, the row positions of these keys inside a typical day layer are computed once per layer index and any
+    layer sharing that index is then expanded to hourly resolution with a single numpy take (no join, no sort).
+    """
+
+    def __init__(self, td_df, max_indexes=16, fingerprint=None):
+        """
+        :param td_df:       hourly typical day dataframe, as returned by process_TD
+        :param max_indexes: number of distinct layer indexes for which the row positions are kept
+        :param fingerprint: td_fingerprint of td_df, computed if None
+        """
+        self.index = td_df.index.copy()
+        self.keys = pd.MultiIndex.from_arrays([td_df['TD'].values.copy(), td_df['hour'].values.copy()],
+                                              names=['TD', 'hour'])
+        self.max_indexes = max_indexes
+        self.fingerprint = td_fingerprint(td_df) if fingerprint is None else fingerprint
+        self._positions = []
+
+    def positions(self, index):
+        """
+        Row positions of every hour of the year inside a typical day index
+        :param index:   (TD, hour) index of the typical day layer
+        :return:        tuple (positions, mask), mask flags the hours whose (TD, hour) is present in the layer
+        """
+        for cached_index, positions, mask in self._positions:
+            if cached_index is index:
+                return positions, mask
+        for cached_index, positions, mask in self._positions:
+            if cached_index.equals(index):
+                return positions, mask
+        positions = index.get_indexer(self.keys)
+        mask = positions >= 0
+        if not mask.all():
+            positions = positions[mask]
+        self._positions.insert(0, (index, positions, mask))
+        del self._positions[self.max_indexes:]
+        return positions, mask
+
+    def expand(self, df):
+        """
+        Expand a typical day dataframe to hourly resolution
+        :param df:  dataframe indexed by (TD, hour)
+        :return:    hourly dataframe with the index of td_df
+        """
+        if not isinstance(df.index, pd.MultiIndex) or not df.index.is_unique:
+            return _merge_td(df, self.keys, self.index)
+        positions, mask = self.positions(df.index)
+        index = self.index if mask.all() else self.index[mask]
+        if df.shape[1] > 0 and len(set(df.dtypes)) == 1:
+            values = df.values.take(positions, axis=0)
+            return pd.DataFrame(values, index=index, columns=df.columns)
+        return pd.DataFrame({i: df.iloc[:, i].values.take(positions) for i in range(df.shape[1])},
+                            index=index).set_axis(df.columns, axis=1)
+
+
+def _merge_td(df, keys, index):
+    """
+    Join based typical day expansion, used for layers without a unique (TD, hour) index
+    """
+    assigned_df = pd.DataFrame({'TD': keys.get_level_values(0), 'hour': keys.get_level_values(1)}, index=index)
+    assigned_df = assigned_df.merge(df, left_on=['TD', 'hour'], right_index=True).sort_index()
+    assigned_df.drop(columns=['TD', 'hour'], inplace=True)
+    return assigned_df
+
+
+def td_fingerprint(td_df):
+    """
+    Content key of a typical day assignment
+    :param td_df:   hourly typical day dataframe, as returned by process_TD
+    :return:        bytes with the row hashes of the TD and hour columns (index included)
+    """
+    return pd.util.hash_pandas_object(td_df.loc[:, ['TD', 'hour']], index=True).values.tobytes()
+
+
+_td_expanders = OrderedDict()
+_td_expanders_lock = threading.Lock()
+max_td_expanders = 8
+
+
+def get_td_expander(td_df):
+    """
+    Return the expansion engine of a typical day dataframe. Engines are keyed on the content of the TD assignment
+    (not on the td_df object), so that a td_df modified in place gets a new engine. The least recently used engines
+    are dropped beyond max_td_expanders.
+    :param td_df:   hourly typical day dataframe, as returned by process_TD
+    :return:        TDExpander
+    """
+    key = td_fingerprint(td_df)
+    with _td_expanders_lock:
+        if key in _td_expanders:
+            _td_expanders.move_to_end(key)
+            return _td_expanders[key]
+    expander = TDExpander(td_df, fingerprint=key)
+    with _td_expanders_lock:
+        _td_expanders[key] = expander
+        while len(_td_expanders) > max_td_expanders:
+            _td_expanders.popitem(last=False)
+    return expander
+
+
+class TDLayerCache(object):
+    """
+    Memoization of typical day layers expanded to hourly resolution. Entries are keyed on the content of the layer
+    (values, index and column names) and on the typical day assignment, so that the same layer is expanded at most once
+    per soft-linking iteration, whichever preprocessing function asks for it first. The number of entries is bounded,
+    least recently used entries are evicted first.
+    Expanded frames are shared between callers and must not be modified in place.
+    """
+
+    def __init__(self, maxsize=32):
+        """
+        :param maxsize: maximum number of expanded layers kept in memory
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def layer_key(df):
+        """
+        Content key of a typical day layer
+        :param df:  dataframe to be hashed
+        :return:    tuple with the row hashes (values and index), the column names and the dtypes
+        """
+        return (pd.util.hash_pandas_object(df, index=True).values.tobytes(), tuple(df.columns),
+                tuple(map(str, df.dtypes)))
+
+    def get(self, df, td_df):
+        """
+        Return the hourly expansion of a typical day layer, expanding it only if it is not cached yet
+        :param df:      dataframe indexed by (TD, hour)
+        :param td_df:   typical day dataframe
+        :return:        hourly dataframe
+        """
+        expander = get_td_expander(td_df)
+        key = (self.layer_key(df), expander.fingerprint)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        expanded = expander.expand(df)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = expanded
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return expanded
+
+    def clear(self):
+        """
+        Drop all the cached layers and reset the statistics, to be called at the beginning of each iteration
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache shared by all the preprocessing functions
+td_layer_cache = TDLayerCache()
+
+
+def expand_layer(df, td_df, cache=None):
+    """
+    Expand a typical day layer to hourly resolution through the layer cache
+    :param df:      dataframe indexed by (TD, hour)
+    :param td_df:   typical day dataframe
+    :param cache:   TDLayerCache to use, td_layer_cache by default
+    :return:        hourly dataframe (shared, not to be modified in place)
+    """
+    if cache is None:
+        cache = td_layer_cache
+    return cache.get(df, td_df)
+
+
 def assign_td(df, td_df):
     """
     Assign typical days to a dataframe and process to hourly timeseries
@@ -489,15 +899,287 @@ def assign_td(df, td_df):
     :param td_df:   typical day dataframe
     :return:        new dataframe
     """
-    assigned_df = td_df.loc[:, ['TD', 'hour']]
-    assigned_df = assigned_df.merge(df, left_on=['TD', 'hour'], right_index=True).sort_index()
-    assigned_df.drop(columns=['TD', 'hour'], inplace=True)
-    return assigned_df
+    return get_td_expander(td_df).expand(df)
+
 
+# Output and input folders of the current context (thread, task or process), see io_folders
+_io_folders = contextvars.ContextVar('dispa_link_io_folders', default={})
 
-def write_csv_files(file_name, demand, var_name, index=True, write_csv=None, country=None, inflows=None, heating=False):
+
+def get_output_folder():
+    """
+    Output folder of the current context (constants.output_folder unless io_folders/output_root is active)
     """
-    Write csv files in appropriate dispaset format
+    return _io_folders.get().get('output', output_folder)
+
+
+def get_input_folder():
+    """
+    Input folder of the current context (constants.input_folder unless io_folders/output_root is active)
+    """
+    return _io_folders.get().get('input', input_folder)
+
+
+@contextlib.contextmanager
+def io_folders(output=None, input=None):
+    """
+    Context manager redirecting the csv writers and readers of Dispa-LINK (write_csv_files, search_PowerPlant,
+    Typical Units...) to other folders. The folders are held in a context variable: each thread (and asyncio task)
+    has its own, processes are isolated anyway. Thread pools started inside the context do not inherit it, run their
+    tasks with contextvars.copy_context().run if needed.
+    :param output:  output folder, replaces constants.output_folder ('../Outputs/EnergyScope/')
+    :param input:   input folder, replaces constants.input_folder
+    :return:        dictionary of the active folders
+    """
+    folders = dict(_io_folders.get())
+    if output is not None:
+        folders['output'] = os.path.join(str(output), '')
+    if input is not None:
+        folders['input'] = os.path.join(str(input), '')
+    token = _io_folders.set(folders)
+    try:
+        yield folders
+    finally:
+        _io_folders.reset(token)
+
+
+def output_root(root, inputs=None):
+    """
+    Context manager writing the Dispa-LINK outputs under root/Outputs/EnergyScope/ (see io_folders)
+    :param root:    output root, i.e. one folder per worker or case study
+    :param inputs:  input folder (Typical Units...), unchanged if None
+    """
+    return io_folders(output=os.path.join(str(root), 'Outputs', 'EnergyScope'), input=inputs)
+
+
+csv_manifest_name = 'csv_manifest.json'
+
+
+def frame_digest(df, **kwargs):
+    """
+    Hash of the content of a dataframe (values, index, columns and dtypes) and of the to_csv options
+    :param df:      dataframe or series
+    :return:        hexadecimal sha1 digest
+    """
+    h = hashlib.sha1(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    if isinstance(df, pd.DataFrame):
+        h.update(repr((list(df.columns), list(map(str, df.dtypes)))).encode())
+    else:
+        h.update(repr((df.name, str(df.dtype))).encode())
+    h.update(repr(sorted(kwargs.items())).encode())
+    return h.hexdigest()
+
+
+def _reset_in_child(ref):
+    exporter = ref()
+    if exporter is not None:
+        exporter._reset()
+
+
+class CSVExporter(object):
+    """
+    Write-behind exporter for the Dispa-SET csv files. DataFrame.to_csv runs on background threads, at most
+    max_pending files are waiting to be written (submit blocks otherwise) and flush() is the barrier to call before the
+    files are read, i.e. before ds.build_simulation. Folders are created once per exporter (per run).
+    When a manifest folder is given, files whose content did not change since they were written are not rewritten
+    (their mtime is kept), the content hashes are stored in csv_manifest.json inside that folder.
+    Writes to the same path are applied in submission order. The exporter is reset in forked child processes (the
+    writer threads of the parent do not exist there).
+    """
+
+    def __init__(self, max_workers=2, max_pending=16):
+        """
+        :param max_workers:     number of writer threads, 0 for synchronous writes
+        :param max_pending:     maximum number of files waiting to be written
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=lambda ref=weakref.ref(self): _reset_in_child(ref))
+
+    def _reset(self):
+        """
+        Fresh writer state: no pool, no pending write, no folder or manifest loaded, new locks (also called in forked
+        child processes, whose manifests are read again from the disk when they are used)
+        """
+        self._folders = set()
+        self._manifests = {}
+        self._modified = set()
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._futures = []
+        self._pending = {}
+        self._changes = {'changed': [], 'unchanged': []}
+        self._lock = threading.Lock()
+
+    def make_dirs(self, folder):
+        """
+        Create the folder (and its parents) the first time it is used
+        """
+        if folder not in self._folders:
+            os.makedirs(folder, exist_ok=True)
+            with self._lock:
+                self._folders.add(folder)
+
+    def _manifest(self, folder):
+        """
+        Manifest {file: {digest, size, mtime_ns}} of a folder, loaded the first time it is used
+        """
+        with self._lock:
+            if folder not in self._manifests:
+                path = os.path.join(folder, csv_manifest_name)
+                try:
+                    with open(path) as f:
+                        self._manifests[folder] = json.load(f)
+                except (OSError, ValueError):
+                    self._manifests[folder] = {}
+            return self._manifests[folder]
+
+    def submit(self, df, path, manifest=None, **kwargs):
+        """
+        Schedule df.to_csv(path, **kwargs), the dataframe is copied so that it can be modified afterwards
+        :param df:          dataframe to write
+        :param path:        path of the csv file
+        :param manifest:    folder of the manifest used to skip unchanged files (None to always write)
+        :return:            future of the write
+        """
+        entry = None
+        with self._lock:
+            previous = self._pending.get(path)
+        if previous is not None and previous.done():
+            previous = None
+        if manifest is not None:
+            key = os.path.relpath(path, manifest)
+            entry = (manifest, key, frame_digest(df, **kwargs))
+            known = self._manifest(manifest).get(key)
+            # a file with a pending write is always written again
+            if previous is None and known is not None and known['digest'] == entry[2] and os.path.isfile(path):
+                stat = os.stat(path)
+                if stat.st_size == known['size'] and stat.st_mtime_ns == known['mtime_ns']:
+                    with self._lock:
+                        self._changes['unchanged'].append(path)
+                    future = Future()
+                    future.set_result(path)
+                    return future
+        with self._lock:
+            self._changes['changed'].append(path)
+        self.make_dirs(os.path.dirname(path))
+        if self.max_workers == 0:
+            future = Future()
+            try:
+                future.set_result(self._write(df, path, kwargs, entry))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        self._slots.acquire()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='csv_exporter')
+            # the queue of the pool is FIFO: the previous write of the same path is running or will run first
+            previous = self._pending.get(path)
+            future = self._pool.submit(self._write, df.copy(), path, kwargs, entry, previous)
+            self._pending[path] = future
+            self._futures.append(future)
+        future.add_done_callback(lambda f: self._done(path, f))
+        return future
+
+    def _done(self, path, future):
+        with self._lock:
+            if self._pending.get(path) is future:
+                del self._pending[path]
+        self._slots.release()
+
+    def _write(self, df, path, kwargs, entry=None, previous=None):
+        if previous is not None:
+            # the write is ordered after the previous one, errors of the previous write are raised by flush
+            wait([previous])
+        df.to_csv(path, **kwargs)
+        if entry is not None:
+            folder, key, digest = entry
+            manifest = self._manifest(folder)
+            stat = os.stat(path)
+            with self._lock:
+                manifest[key] = {'digest': digest, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+                self._modified.add(folder)
+        return path
+
+    def _save_manifests(self):
+        """
+        Write the manifests modified since the last call (temporary file named after the process and thread)
+        """
+        with self._lock:
+            manifests = [(folder, dict(self._manifests[folder])) for folder in self._modified]
+            self._modified.clear()
+        for folder, manifest in manifests:
+            if not os.path.isdir(folder):
+                continue
+            path = os.path.join(folder, csv_manifest_name)
+            tmp_path = path + '.tmp' + str(os.getpid()) + '_' + str(threading.get_ident())
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, path)
+
+    def flush(self):
+        """
+        Wait until all the scheduled files are written, errors are raised here
+        :return:    list of the written paths
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        try:
+            return [future.result() for future in futures]
+        finally:
+            self._save_manifests()
+
+    def changes(self):
+        """
+        Files written (changed) and skipped (unchanged) since the last call
+        :return:    dictionary with the lists of paths 'changed' and 'unchanged'
+        """
+        with self._lock:
+            changes, self._changes = self._changes, {'changed': [], 'unchanged': []}
+        return changes
+
+    def close(self):
+        """
+        Flush and stop the writer threads, folders will be created again if needed
+        """
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                if self._pool is not None:
+                    self._pool.shutdown()
+                    self._pool = None
+                self._folders.clear()
+
+
+csv_exporter = CSVExporter()
+atexit.register(csv_exporter.close)
+
+
+def flush_csv_files():
+    """
+    Barrier: wait until all the csv files written by write_csv_files are on disk and report which inputs changed
+    since the previous flush
+    :return:    dictionary with the lists of paths 'changed' and 'unchanged'
+    """
+    csv_exporter.flush()
+    changes = csv_exporter.changes()
+    logging.info(str(len(changes['changed'])) + ' input files changed: ' +
+                 ', '.join(os.path.basename(path) for path in changes['changed']))
+    if changes['unchanged']:
+        logging.info(str(len(changes['unchanged'])) + ' input files unchanged (not rewritten): ' +
+                     ', '.join(os.path.basename(path) for path in changes['unchanged']))
+    return changes
+
+
+def write_csv_files(file_name, demand, var_name, index=True, write_csv=None, country=None, inflows=None, heating=False,
+                    folder=None):
+    """
+    Write csv files in appropriate dispaset format (in the background, see flush_csv_files), files whose content did
+    not change are not rewritten
     :param file_name:   name of the csv file
     :param demand:      timeseries to be saved as csv file
     :param var_name:    name of the variable, can be same as file_name
@@ -506,30 +1188,22 @@ def write_csv_files(file_name, demand, var_name, index=True, write_csv=None, cou
     :param country:     country demand is located in, one csv file per country/zone
     :param inflows:     special case for inflows
     :param heating:     special case for heating
-    :return:
+    :param folder:      output folder (output folder of the current context by default, see output_root)
+    :return:            future of the write (None if write_csv is False)
     """
     filename = file_name + '.csv'
     if write_csv:
-        make_dir('../Outputs/')
-        make_dir(output_folder)
-        make_dir(output_folder + 'Database')
+        database = os.path.join(str(folder), '') + 'Database/' if folder is not None else \
+            get_output_folder() + 'Database/'
         if inflows is None:
-            folder = output_folder + 'Database/' + var_name + '/'
-            make_dir(folder)
+            folder = database + var_name + '/'
         else:
-            folder = output_folder + 'Database/' + 'HydroData/'
-            make_dir(folder)
-            folder = folder + var_name + '/'
-            make_dir(folder)
+            folder = database + 'HydroData/' + var_name + '/'
         if country is None:
-            if heating is True:
-                make_dir(folder)
-                demand.to_csv(folder + filename, header=True, index=index)
-            else:
-                make_dir(folder + 'ES/')
-                demand.to_csv(folder + 'ES/' + filename, header=True, index=index)
+            if heating is not True:
+                folder = folder + 'ES/'
         else:
-            make_dir(folder + country)
-            demand.to_csv(folder + country + '/' + filename, header=True, index=index)
+            folder = folder + country + '/'
+        return csv_exporter.submit(demand, folder + filename, manifest=database, header=True, index=index)
     else:
         logging.warning('WRITE_CSV_FILES = False, unable to write .csv files inside the ' + var_name + ' folder')
@@ -0,0 +1,586 @@
+"""
+Bi-directional soft-linking between EnergyScope (ES) and Dispa-SET (DS)
+Input : soft-linking configuration (folders, case study, scenario parameters)
+Output : ES outputs, DS inputs and results of each iteration
+
+Each stage of an iteration (read ES, build DS inputs, build/solve DS, compute reserves, rerun ES) is a method of
+SoftLinkRun that can be called on its own and whose duration is recorded in SoftLinkRun.timings. The loop stops when
+DS does not shed or lose any load, i.e. when max(OutputShedLoad + LostLoad_MaxPower) <= convergence_tolerance.
+Independent case studies (grids of scenario parameters) are run in a process pool by run_sweep, each case in its own
+output folder.
+"""
+import itertools
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import dispaset as ds
+except ImportError:
+    ds = None
+try:
+    import energyscope as es
+except ImportError:
+    es = None
+
+from .checkpoint import CheckpointStore
+from .results_store import ResultsStore, save_results
+from .common import get_date_range
+from .constants import mapping
+from .search import flush_csv_files, get_es_mapping, output_root, process_TD, td_layer_cache, write_csv_files
+from .preprocessing.get_capacities_energyscope import get_capacities_from_es
+from .preprocessing.get_timeseries_energyscope import get_availability_factors, get_electricity_demand, \
+    get_ev_demand, get_heat_demand, get_outage_factors, get_soc, merge_timeseries_x
+from .preprocessing.read_energyscope import load_es_case
+
+# GWP limit of the ES scenarios
+es_scenarios = {'UTOPIA': 12500, 'DYSTOPIA': 1e7}
+
+# Resource availability (ES Resources 'avail') of the ES scenarios
+es_scenario_resources = {'UTOPIA': {'WOOD': 25000, 'WET_BIOMASS': 40000, 'COAL': 30000, 'WASTE': 30000},
+                         'DYSTOPIA': {'WOOD': 100000, 'WET_BIOMASS': 100000, 'COAL': 100000, 'WASTE': 100000}}
+
+# DS boundary sector input file: ds_inputs key
+boundary_sector_files = {'BoundarySectorDemand': 'XFixDemand', 'BoundarySectorVarDemand': 'XVarDemand',
+                         'BoundarySectorVarSupply': 'XVarSupply'}
+
+# ES configuration keys read by es.run_ES (the comment and the working directory do not change the ES run)
+es_run_config_keys = ('case_study', 'run_ES', 'importing', 'printing', 'printing_td', 'GWP_limit', 'data_folder',
+                      'ES_folder', 'ES_path', 'step1_output', 'user_defined', 'import_reserves')
+
+# ES data tables (all_data) printed in the .dat files of an ES run
+es_run_data_keys = ('Demand', 'Resources', 'Technologies', 'End_uses_categories', 'Layers_in_out',
+                    'Storage_characteristics', 'Storage_eff_in', 'Storage_eff_out', 'Time_series')
+
+# Default soft-linking configuration, folders default to the Dispa-LINK and EnergyScope folders next to each other
+softlink_config = {'case_name': 'UTOPIA',  # UTOPIA or DYSTOPIA
+                   'case_study': None,  # built with case_study_name if None
+                   'dispaset_version': '2.5_BS',  # 2.5 or 2.5_BS
+                   'target_year': 2050,
+                   'separator': ';',
+                   'reserve_dumping': 0.5,
+                   'seasonal_storage_days': 7,
+                   'ccgt_share': 0.05,
+                   'max_loops': 5,
+                   'convergence_tolerance': 0,  # MW of shed + lost load
+                   'initialize_ES': False,
+                   'technology_threshold': 0.1,
+                   'es_mapping': None,  # ES -> DS mapping table file (CSV/Parquet), constants.mapping if None
+                   'DL_folder': None,  # Dispa-LINK folder (ConfigFiles, Inputs)
+                   'ES_folder': None,  # EnergyScope folder
+                   'output_root': None,  # folder holding Outputs and Simulations, DL_folder by default
+                   'checkpoints': True}  # store the stages in output_root/Outputs/Checkpoints/<case_study>
+
+
+def es_run_inputs(config_es):
+    """
+    Part of the ES configuration an ES run depends on, used as input fingerprint of the es_run checkpoints
+    :param config_es:   ES configuration
+    :return:            dictionary with the es_run_config_keys, the es_run_data_keys of all_data and the reserves when
+                        they are imported from the dataframe
+    """
+    inputs = {key: config_es.get(key) for key in es_run_config_keys}
+    all_data = config_es.get('all_data') or dict()
+    inputs['all_data'] = {key: all_data[key] for key in es_run_data_keys if key in all_data}
+    if config_es.get('import_reserves') == 'from_df':
+        inputs['reserves'] = config_es.get('reserves')
+    return inputs
+
+
+def case_study_name(case_name, dispaset_version, reserve_dumping, seasonal_storage_days, ccgt_share, scenario=None):
+    """
+    Name of the soft-linking case study (without the _loop_<i> suffix)
+    :param case_name:               UTOPIA or DYSTOPIA
+    :param dispaset_version:        2.5 or 2.5_BS
+    :param reserve_dumping:         share of the shed load not added to the ES reserves
+    :param seasonal_storage_days:   charge time of the seasonal storages (days)
+    :param ccgt_share:              maximum share of CCGT
+    :param scenario:                GWP limit (es_scenarios[case_name] by default)
+    :return:                        case study name
+    """
+    if scenario is None:
+        scenario = es_scenarios[case_name]
+    return case_name + '_' + dispaset_version + '_' + str(scenario) + '_RESERVE_dumping=' + \
+        str(1 - reserve_dumping) + '_SSTOR=' + str(seasonal_storage_days) + '_CCGTshare=' + str(ccgt_share) + '_final'
+
+
+def lost_load(results):
+    """
+    Hourly load not served by DS: shed load plus lost load (LostLoad_MaxPower)
+    :param results:     DS results
+    :return:            series (MW)
+    """
+    shed = results['OutputShedLoad']
+    lost = results['LostLoad_MaxPower']
+    total = pd.Series(0.0, index=shed.index if not shed.empty else lost.index)
+    for df in [shed, lost]:
+        if not df.empty:
+            total = total.add(df.sum(axis=1) if isinstance(df, pd.DataFrame) else df, fill_value=0)
+    return total.fillna(0)
+
+
+def is_converged(results, tolerance=0):
+    """
+    Convergence criterion of the soft-linking: no load shed or lost by DS (above the tolerance)
+    :param results:     DS results
+    :param tolerance:   maximum shed + lost load (MW)
+    :return:            bool
+    """
+    total = lost_load(results)
+    return total.empty or total.max() <= tolerance
+
+
+class SoftLinkRun(object):
+    """
+    Soft-linking run of one case study. The state of the loop (ES outputs, DS inputs and results, reserves) is kept per
+    iteration in dictionaries, the duration of each stage in timings.
+    """
+
+    def __init__(self, config):
+        """
+        :param config:  soft-linking configuration, missing keys are taken from softlink_config
+        """
+        self.config = dict(softlink_config)
+        self.config.update(config)
+        cfg = self.config
+        if cfg['case_name'] not in es_scenarios:
+            raise ValueError('Wrong scenario selected. Please select either ' + ' or '.join(es_scenarios))
+        if cfg['dispaset_version'] not in ['2.5', '2.5_BS']:
+            raise ValueError('Dispa-SET version ' + str(cfg['dispaset_version']) + ' is not supported')
+        self.DL_folder = Path(cfg['DL_folder']) if cfg['DL_folder'] is not None else Path(__file__).parents[1]
+        self.ES_folder = Path(cfg['ES_folder']) if cfg['ES_folder'] is not None else \
+            self.DL_folder.parent / 'EnergyScope'
+        self.output_root = Path(cfg['output_root']) if cfg['output_root'] is not None else self.DL_folder
+        self.scenario = es_scenarios[cfg['case_name']]
+        self.case_study = cfg['case_study'] or case_study_name(cfg['case_name'], cfg['dispaset_version'],
+                                                               cfg['reserve_dumping'], cfg['seasonal_storage_days'],
+                                                               cfg['ccgt_share'], self.scenario)
+        self.database = self.output_root / 'Outputs' / 'EnergyScope' / 'Database'
+        data_folder = self.ES_folder / 'Data' / str(cfg['target_year'])
+        self.config_link = {'DateRange': get_date_range(cfg['target_year']),
+                            'TypicalUnits': self.DL_folder / 'Inputs' / 'EnergyScope',
+                            'ESMapping': get_es_mapping(cfg['es_mapping'])}
+        self.config_es = {'case_study': self.case_study + '_loop_0', 'comment': 'Test with low emissions',
+                          'run_ES': False, 'import_reserves': '', 'importing': True, 'printing': False,
+                          'printing_td': False, 'GWP_limit': self.scenario, 'data_folder': data_folder,
+                          'ES_folder': self.ES_folder, 'ES_path': self.ES_folder / 'energyscope' / 'STEP_2_Energy_Model',
+                          'step1_output': self.ES_folder / 'energyscope' / 'STEP_1_TD_selection' / 'TD_of_days.out',
+                          'all_data': dict(), 'Working_directory': os.getcwd(), 'reserves': pd.DataFrame(),
+                          'user_defined': dict()}
+        self.checkpoints = CheckpointStore(self.output_root / 'Outputs' / 'Checkpoints' / self.case_study) \
+            if cfg['checkpoints'] else None
+
+        self.ds_inputs = {'Capacities': dict(), 'Costs': dict(), 'ElectricityDemand': dict(), 'HeatDemand': dict(),
+                          'XFixDemand': dict(), 'XVarDemand': dict(), 'XFixSupply': dict(), 'XVarSupply': dict(),
+                          'OutageFactors': dict(), 'ReservoirLevels': dict(), 'AvailabilityFactors': dict(),
+                          'EVDemand': dict()}
+        self.es_outputs, self.GWP_op, self.ds_config = dict(), dict(), dict()
+        self.inputs, self.results, self.inputs_mts, self.results_mts = dict(), dict(), dict(), dict()
+        self.reserves, self.shed_load = dict(), dict()
+        self.td_df = None
+        self.converged_loop = None
+        self.timings = []
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def _timed(self, iteration, stage, function, *args, **kwargs):
+        """
+        Run a stage and record its duration
+        """
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        duration = time.perf_counter() - start
+        self.timings.append({'iteration': iteration, 'stage': stage, 'seconds': duration})
+        logging.info('Loop ' + str(iteration) + ': ' + stage + ' in ' + str(round(duration, 2)) + ' s')
+        return result
+
+    def _checkpointed(self, iteration, stage, function, *args, inputs=None, outputs=()):
+        """
+        Run a stage through the checkpoint store (if any)
+        """
+        if self.checkpoints is None:
+            return function(*args)
+        return self.checkpoints.run(iteration, stage, function, *args, inputs=inputs, outputs=outputs)
+
+    def case_dir(self, iteration):
+        """
+        ES case study folder of an iteration
+        """
+        return self.ES_folder / 'case_studies' / (self.case_study + '_loop_' + str(iteration))
+
+    def timings_table(self):
+        """
+        Duration of each stage (s), iterations as rows and stages as columns
+        """
+        if not self.timings:
+            return pd.DataFrame()
+        return pd.DataFrame(self.timings).pivot_table(index='iteration', columns='stage', values='seconds',
+                                                      aggfunc='sum', sort=False)
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def configure_es(self):
+        """
+        Read the ES data and apply the scenario (resource and technology limits, storage parameters, prices)
+        :return:    ES data (all_data)
+        """
+        cfg = self.config
+        all_data = self._timed(0, 'configure_es', es.run_ES, self.config_es)
+        resources, technologies = all_data['Resources'], all_data['Technologies']
+        storage = all_data['Storage_characteristics']
+        days = cfg['seasonal_storage_days']
+        # Resource limits
+        resources.loc[['ELECTRICITY', 'ELEC_EXPORT', 'AMMONIA', 'AMMONIA_RE'], 'avail'] = 0
+        for resource, avail in es_scenario_resources[cfg['case_name']].items():
+            resources.loc[resource, 'avail'] = avail
+        # Technology limits
+        technologies.loc['CCGT_AMMONIA', ['f_max', 'fmax_perc']] = 1e15, 0.1
+        technologies.loc['NUCLEAR', ['f_max', 'fmax_perc']] = 1e15, 0.1
+        technologies.loc['CCGT', ['f_max', 'fmax_perc']] = 1e15, cfg['ccgt_share']
+        technologies.loc['COAL_US', ['f_max', 'fmax_perc']] = 1e15, 0.1
+        technologies.loc['COAL_IGCC', ['f_max', 'fmax_perc']] = 1e15, 0.1
+        technologies.loc['HYDRO_RIVER', ['f_max', 'fmin_perc', 'fmax_perc']] = 1e15, 0.15, 1
+        technologies.loc['PV', 'f_max'] = 1e15
+        self.config_es['user_defined']['solar_area'] = 1e15
+        self.config_es['user_defined']['curt_perc_cap'] = 0
+        # Allow infinite WIND_ONSHORE and PHS
+        technologies.loc['WIND_ONSHORE', 'f_max'] = 1e15
+        technologies.loc['WIND_OFFSHORE', ['f_min', 'f_max']] = 10, 1e15
+        technologies.loc['PHS', ['f_max', 'fmax_perc']] = 120, 0.15
+        # Change storage parameters
+        storage.loc['H2_STORAGE', ['storage_charge_time', 'storage_discharge_time']] = 24 * days, 24 * days / 3
+        technologies.loc['H2_STORAGE', ['c_inv', 'c_maint']] = 3.66 * 6 / 24 / days, 0.39 * 6 / 24 / days
+        storage.loc['TS_DHN_SEASONAL', ['storage_charge_time', 'storage_discharge_time']] = 24 * days, 24 * days
+        technologies.loc['TS_DHN_SEASONAL', ['c_inv', 'c_maint']] = 0.51718 * 150 / 24 / days, \
+            0.00283 * 150 / 24 / days
+        # Change prices
+        resources.loc['GAS', 'c_op'] = 0.2
+
+        self.config_es['all_data'] = all_data
+        self.config_es['importing'] = False
+        self.config_es['printing'] = True
+        self.config_es['printing_td'] = True
+        self.config_es['run_ES'] = True
+        if cfg['initialize_ES']:
+            self.config_es['all_data'] = self._timed(0, 'run_es', self._checkpointed, 0, 'es_run', es.run_ES,
+                                                     self.config_es, inputs=es_run_inputs(self.config_es),
+                                                     outputs=[self.case_dir(0)])
+        return self.config_es['all_data']
+
+    def read_es(self, i):
+        """
+        Read the ES outputs of iteration i (and compute the emission factors of the resources)
+        :return:    ES outputs
+        """
+        def read():
+            case_dir = self.case_dir(i)
+            self.config_es['case_study'] = case_dir.name
+            # Expanded layers of the previous iteration are not needed anymore
+            td_layer_cache.clear()
+            self.GWP_op[i] = es.compute_gwp_op(self.config_es['data_folder'], case_dir)
+            self.GWP_op[i].to_csv(case_dir / 'output' / 'GWP_op.txt', sep='\t')
+            es_outputs = load_es_case(case_dir, self.config_es['data_folder'],
+                                      read_outputs=partial(es.read_outputs, case_dir.name, True, []),
+                                      separator=self.config['separator'])
+            es_outputs['GWP_op'] = self.GWP_op[i]
+            # transforming TD time series into yearly time series
+            self.td_df = process_TD(td_final=pd.read_csv(self.config_es['step1_output'], header=None))
+            return es_outputs
+
+        self.es_outputs[i] = self._timed(i, 'read_es', read)
+        return self.es_outputs[i]
+
+    def build_ds_inputs(self, i):
+        """
+        Compute the DS inputs of iteration i from the ES outputs and write them in the DS database
+        :return:    DS inputs of iteration i
+        """
+        def build():
+            es_outputs, td_df, drange = self.es_outputs[i], self.td_df, self.config_link['DateRange']
+            version = self.config['dispaset_version']
+            ds_inputs = self.ds_inputs
+            # compute fuel prices according to the use of RE vs NON-RE fuels
+            resources = self.config_es['all_data']['Resources']
+            df = es_outputs['year_balance'].loc[resources.index,
+                                                es_outputs['year_balance'].columns.isin(list(resources.index))]
+            ds_inputs['Costs'][i] = (df.mul(resources.loc[:, 'c_op'], axis=0).sum(axis=0) /
+                                     df.sum(axis=0)).fillna(resources.loc[:, 'c_op'])
+            # Compute availability factors and scaled inflows
+            ds_inputs['AvailabilityFactors'][i] = get_availability_factors(es_outputs, drange,
+                                                                           file_name_af='AF_2015_ES',
+                                                                           file_name_sif='IF_2015_ES',
+                                                                           es_mapping=self.config_link['ESMapping'])
+            ds_inputs['ElectricityDemand'][i] = get_electricity_demand(es_outputs, td_df, drange, file_name='2015_ES')
+            # compute H2 yearly consumption and power capacity of electrolyser
+            ds_inputs = merge_timeseries_x(ds_inputs, es_outputs, td_df, drange, version, i)
+            ds_inputs['XFixDemand'][i] = ds_inputs['XFixDemand'][i].add(-ds_inputs['XFixSupply'][i], fill_value=0)
+            # Get capacities from ES, map them to DS with external typical unit database
+            typical_units = pd.read_csv(self.config_link['TypicalUnits'] / 'Typical_Units.csv')
+            ds_inputs['Capacities'][i] = get_capacities_from_es(es_outputs, typical_units=typical_units, td_df=td_df,
+                                                                technology_threshold=self.config['technology_threshold'],
+                                                                dispaset_version=version,
+                                                                config_link=self.config_link, ds_inputs=ds_inputs, i=i)
+            ds_inputs['EVDemand'][i] = get_ev_demand(es_outputs, td_df, ds_inputs['Capacities'][i], drange,
+                                                     file_name='EV_Demand')
+            # Assign outage factors for technologies that generate more than available
+            ds_inputs['OutageFactors'][i] = get_outage_factors(self.config_es, es_outputs, drange=drange,
+                                                               local_res=['WASTE', 'WOOD', 'WET_BIOMASS'], td_df=td_df)
+            ds_inputs['HeatDemand'][i] = get_heat_demand(es_outputs, td_df, drange, countries=['ES'],
+                                                         file_name='2015_ES_th', dispaset_version=version)
+            if version == '2.5_BS':
+                for var_name, key in boundary_sector_files.items():
+                    write_csv_files(var_name, ds_inputs[key][i], var_name, index=True, write_csv=True)
+            ds_inputs['ReservoirLevels'][i] = get_soc(es_outputs, self.config_es, drange)
+            # all the csv files have to be written before DS is built
+            changes = flush_csv_files()
+            logging.info('Loop ' + str(i) + ': ' + str(len(changes['changed'])) + ' Dispa-SET inputs changed')
+            return {key: ds_inputs[key][i] for key in ds_inputs if i in ds_inputs[key]}
+
+        # The DS database is written in the output root of the run
+        with output_root(self.output_root):
+            inputs = self._timed(i, 'build_ds_inputs', build)
+        if self.checkpoints is not None:
+            self.checkpoints.save(i, 'ds_inputs', inputs)
+        return inputs
+
+    def build_ds_config(self, i):
+        """
+        DS configuration of iteration i (input files of the DS database, costs)
+        :return:    DS config
+        """
+        version = self.config['dispaset_version']
+        database = self.database
+        config = ds.load_config(str(self.DL_folder / 'ConfigFiles' / ('Config_EnergyScope.xlsx' if version == '2.5'
+                                                                      else 'Config_EnergyScope_BS.xlsx')))
+        config['default']['CostCurtailment'] = 0
+        config['ReservoirLevels'] = str(database / 'ReservoirLevels' / '##' / 'ReservoirLevels.csv')
+        config['SimulationDirectory'] = str(self.output_root / 'Simulations' / (self.case_study + '_loop_' + str(i)))
+        config['default']['PriceOfCO2'] = abs(self.es_outputs[i]['CO2_cost'].loc['CO2_cost', 'CO2_cost'] * 1000)
+        for j in mapping['ES']['FUEL_COST']:
+            config['default'][mapping['ES']['FUEL_COST'][j]] = self.ds_inputs['Costs'][i].loc[j] * 1000
+        if version == '2.5':
+            config['H2FlexibleDemand'] = str(database / 'H2_demand' / 'ES' / 'H2_demand.csv')
+            config['H2FlexibleCapacity'] = str(database / 'H2_demand' / 'ES' / 'PtLCapacities.csv')
+            config['Outages'] = str(database / 'OutageFactor' / '##' / 'OutageFactor.csv')
+        else:
+            config['SectorXDemand'] = str(database / 'BoundarySectorDemand' / 'ES' / 'BoundarySectorDemand.csv')
+            config['HeatDemand'] = ''
+            config['BoundarySectorData'] = str(database / 'BoundarySectorInputs' / 'ES' / 'BoundarySectorInputs.csv')
+            config['SectorXFlexibleDemand'] = str(database / 'BoundarySectorVarDemand' / 'ES' /
+                                                  'BoundarySectorVarDemand.csv')
+            config['SectorXFlexibleSupply'] = str(database / 'BoundarySectorVarSupply' / 'ES' /
+                                                  'BoundarySectorVarSupply.csv')
+            config['BoundarySectorMaxSpillage'] = str(database / 'H2_demand' / 'H2_demand.csv')
+            config['ReservoirScaledOutflows'] = str(database / 'TotalLoadValue' / 'ES' / 'EV_Demand.csv')
+        self.ds_config[i] = config
+        return config
+
+    @staticmethod
+    def _solve_ds(config):
+        # Build the simulation environment, solve using GAMS and load the simulation results (MTS and UC)
+        ds.build_simulation(config)
+        ds.solve_GAMS(config['SimulationDirectory'], config['GAMS_folder'])
+        sim_mts = ds.get_sim_results(config['SimulationDirectory'], cache=False, inputs_file='Inputs_MTS.p',
+                                     results_file='Results_MTS.gdx')
+        return sim_mts, ds.get_sim_results(config['SimulationDirectory'], cache=False)
+
+    def solve_ds(self, i):
+        """
+        Build and solve DS for iteration i, the results are also saved in the ES case study (DS_Results.p)
+        :return:    DS results
+        """
+        config = self.build_ds_config(i) if i not in self.ds_config else self.ds_config[i]
+        ds_inputs = {key: self.ds_inputs[key][i] for key in self.ds_inputs if i in self.ds_inputs[key]}
+        (self.inputs_mts[i], self.results_mts[i]), (self.inputs[i], self.results[i]) = self._timed(
+            i, 'solve_ds', self._checkpointed, i, 'ds_results', self._solve_ds, config, inputs=(ds_inputs, config),
+            outputs=[config['SimulationDirectory']])
+        with open(self.case_dir(i) / 'output' / 'DS_Results.p', 'wb') as handle:
+            pickle.dump(self.inputs[i], handle, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self.results[i], handle, protocol=pickle.HIGHEST_PROTOCOL)
+        return self.results[i]
+
+    def compute_reserves(self, i):
+        """
+        ES reserve requirements for the next iteration: DS reserve demand (first iteration), then increased by the load
+        shed by DS (minus the dumped share)
+        :return:    ES reserves
+        """
+        def compute():
+            results = self.results[i]
+            hours = np.arange(1, 8761, 1)
+            # TODO: check if leap year can be introduced
+            self.reserves[i] = pd.DataFrame(results['OutputDemand_3U'].values / 1000, columns=['end_uses_reserve'],
+                                            index=hours)
+            if i >= 1:
+                if results['OutputShedLoad'].empty:
+                    self.shed_load[i] = pd.DataFrame(0, columns=['end_uses_reserve'], index=hours)
+                else:
+                    shed = results['OutputShedLoad'].add(self.results[0]['LostLoad_MaxPower'], fill_value=0)
+                    self.shed_load[i] = pd.DataFrame(shed.values / 1000, columns=['end_uses_reserve'], index=hours)
+                self.config_es['reserves'] = self.config_es['reserves'] + \
+                    self.shed_load[i].max() * (1 - self.config['reserve_dumping'])
+            else:
+                self.config_es['reserves'] = self.reserves[i]
+            return self.config_es['reserves']
+
+        reserves = self._timed(i, 'compute_reserves', compute)
+        if self.checkpoints is not None:
+            self.checkpoints.save(i, 'reserves', {'reserves': self.reserves[i], 'shed_load': self.shed_load.get(i),
+                                                  'es_reserves': reserves})
+        return reserves
+
+    def rerun_es(self, i):
+        """
+        Run ES with the reserves computed in iteration i (case study of iteration i + 1)
+        :return:    ES data (all_data)
+        """
+        self.config_es['case_study'] = self.case_dir(i + 1).name
+        self.config_es['import_reserves'] = 'from_df'
+        self.config_es['all_data'] = self._timed(i, 'rerun_es', self._checkpointed, i + 1, 'es_run', es.run_ES,
+                                                 self.config_es, inputs=es_run_inputs(self.config_es),
+                                                 outputs=[self.case_dir(i + 1)])
+        return self.config_es['all_data']
+
+    def converged(self, i):
+        """
+        Convergence criterion of iteration i (see is_converged)
+        """
+        return is_converged(self.results[i], self.config['convergence_tolerance'])
+
+    # ------------------------------------------------------------------------------------------------------------------
+    def run(self, max_loops=None):
+        """
+        Soft-linking loop: configure ES and iterate until convergence or max_loops iterations
+        :param max_loops:   maximum number of iterations (config max_loops by default)
+        :return:            iteration in which convergence occurred, None otherwise
+        """
+        if ds is None or es is None:
+            raise ImportError('dispaset and energyscope are required to run the soft-linking')
+        max_loops = self.config['max_loops'] if max_loops is None else max_loops
+        self.configure_es()
+        for i in range(max_loops):
+            logging.info('Soft-linking loop ' + str(i) + ' of ' + self.case_study)
+            self.read_es(i)
+            self.build_ds_inputs(i)
+            self.solve_ds(i)
+            self.compute_reserves(i)
+            if self.converged(i):
+                logging.info('Final convergence occurred in loop: ' + str(i) + '. Soft-linking is now complete')
+                self.converged_loop = i
+                break
+            logging.info('Another iteration required')
+            if i < max_loops - 1:
+                self.rerun_es(i)
+        return self.converged_loop
+
+    def save(self, path):
+        """
+        Save the results of the run in a results store (one file per iteration and variable, see ResultsStore)
+        :param path:    folder of the results store
+        :return:        ResultsStore
+        """
+        return save_results(path, {'inputs': self.inputs, 'results': self.results, 'inputs_mts': self.inputs_mts,
+                                   'results_mts': self.results_mts, 'es_outputs': self.es_outputs,
+                                   'config_es': self.config_es}, single=['config_es'])
+
+    def load(self, path):
+        """
+        Load the results of a run saved with save: the variables of each iteration are read when they are accessed.
+        Pickle files written by the previous versions of the soft-linking script (six objects in a row) are read too.
+        :param path:    folder of the results store (or pickle file)
+        """
+        if os.path.isfile(path):
+            with open(path, 'rb') as handle:
+                self.inputs = pickle.load(handle)
+                self.results = pickle.load(handle)
+                self.inputs_mts = pickle.load(handle)
+                self.results_mts = pickle.load(handle)
+                self.config_es = pickle.load(handle)
+                self.es_outputs = pickle.load(handle)
+            return self
+        store = ResultsStore(path)
+        for group in ['inputs', 'results', 'inputs_mts', 'results_mts', 'es_outputs']:
+            setattr(self, group, {i: store.lazy(group, i) for i in store.iterations(group)})
+        self.config_es = store.read_dict('config_es')
+        return self
+
+
+# ----------------------------------------------------------------------------------------------------------------------
+def expand_grid(grid, config=None):
+    """
+    Soft-linking configurations of all the combinations of a parameter grid, i.e. {'reserve_dumping': [0.25, 0.5],
+    'seasonal_storage_days': [7, 14], 'ccgt_share': [0.05]}, with their case study names (case_study_name)
+    :param grid:    dictionary parameter: list of values
+    :param config:  configuration shared by all the cases
+    :return:        list of configurations
+    """
+    config = dict(config or {})
+    configs = []
+    for values in itertools.product(*grid.values()):
+        case = dict(config)
+        case.update(zip(grid, values))
+        full = dict(softlink_config, **case)
+        case['case_study'] = case_study_name(full['case_name'], full['dispaset_version'], full['reserve_dumping'],
+                                             full['seasonal_storage_days'], full['ccgt_share'])
+        configs.append(case)
+    return configs
+
+
+def run_softlink_case(config):
+    """
+    Run the soft-linking of one case study of a sweep. The case runs in its own output root (config['output_root']):
+    the DS database and simulations, the checkpoints and the results store (<case_study>_results) are written there.
+    :param config:  soft-linking configuration with output_root
+    :return:        dictionary with the summary of the case (index table row)
+    """
+    root = Path(config['output_root'])
+    row = {'case_study': config['case_study'], 'output_root': str(root), 'pid': os.getpid()}
+    start = time.perf_counter()
+    try:
+        run = SoftLinkRun(config)
+        run.run()
+        results_file = root / (run.case_study + '_results')
+        run.save(results_file)
+        last = max(run.results) if run.results else None
+        row.update({'converged_loop': run.converged_loop, 'loops': len(run.results), 'results': str(results_file),
+                    'max_lost_load': lost_load(run.results[last]).max() if last is not None else np.nan})
+    except Exception as e:
+        logging.exception('Soft-linking of ' + config['case_study'] + ' failed')
+        row['error'] = repr(e)
+    row['seconds'] = time.perf_counter() - start
+    return row
+
+
+def run_sweep(grid, config=None, sweep_root='Sweeps', max_workers=None, worker=run_softlink_case):
+    """
+    Run the soft-linking of all the cases of a parameter grid in a process pool (cases are independent chains). Each case
+    writes in its own output root, no working directory change is involved so max_workers=0 and threads are safe too.
+    Forked workers start with a fresh csv exporter (see CSVExporter).
+    :param grid:        dictionary parameter: list of values (see expand_grid)
+    :param config:      configuration shared by all the cases
+    :param sweep_root:  folder holding one output root per case and the index table (sweep_index.csv)
+    :param max_workers: number of processes (ProcessPoolExecutor default if None, 0 to run in this process)
+    :param worker:      function running one case (run_softlink_case)
+    :return:            index table, one row per case study
+    """
+    sweep_root = Path(sweep_root).resolve()
+    configs = expand_grid(grid, config)
+    for case in configs:
+        case['output_root'] = sweep_root / case['case_study']
+    if max_workers == 0:
+        rows = [worker(case) for case in configs]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            rows = list(pool.map(worker, configs))
+    index = pd.DataFrame(rows)
+    for parameter in grid:
+        index[parameter] = [case[parameter] for case in configs]
+    index = index.set_index('case_study')
+    os.makedirs(sweep_root, exist_ok=True)
+    index.to_csv(sweep_root / 'sweep_index.csv')
+    return index
@@ -0,0 +1,31 @@
+# Soft-linking of a grid of UTOPIA/DYSTOPIA case studies, one process per case study
+import logging
+from pathlib import Path
+
+import dispa_link as dl
+
+# %% #############################################
+############## Folder and Path setup #############
+##################################################
+dst_path = Path(__file__).parents[1]
+ES_folder = dst_path.parent / 'EnergyScope'
+DL_folder = dst_path.parent / 'Dispa-LINK'
+
+# %% ###################################
+########### Editable inputs ############
+########################################
+config = {'case_name': 'UTOPIA',  # UTOPIA or DYSTOPIA
+          'dispaset_version': '2.5_BS',  # 2.5 or 2.5_BS
+          'max_loops': 5,
+          'DL_folder': DL_folder,
+          'ES_folder': ES_folder}
+grid = {'reserve_dumping': [0.25, 0.5, 0.75],
+        'seasonal_storage_days': [7, 14],
+        'ccgt_share': [0.05, 0.1]}
+max_workers = 4
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    index = dl.run_sweep(grid, config, sweep_root=DL_folder / 'Sweeps' / config['case_name'],
+                         max_workers=max_workers)
+    print(index)
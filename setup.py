@@ -44,7 +44,8 @@ setup(
     entry_points={
         "console_scripts": ["dispa_link = dispa_link.__main__:main"]
     },
-    extras_require={"test": read_requirements("requirements-test.txt")},
+    extras_require={"test": read_requirements("requirements-test.txt"),
+                    "cache": ["pyarrow"]},
     classifiers=['Intended Audience :: Science/Research', 'Programming Language :: Python'],
     keywords=['database', 'energy systems analysis']
 )
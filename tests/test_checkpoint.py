@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from dispa_link.checkpoint import CheckpointStore, object_fingerprint
+
+
+def test_object_fingerprint():
+    df = pd.DataFrame({'A': [1.0, 2.0]})
+    assert object_fingerprint({'a': df, 'b': [1, 'x']}) == object_fingerprint({'b': [1, 'x'], 'a': df.copy()})
+    assert object_fingerprint({'a': df}) != object_fingerprint({'a': df * 2})
+    assert object_fingerprint(np.arange(3)) != object_fingerprint(np.arange(3.0))
+    # sets do not depend on their iteration order (PYTHONHASHSEED)
+    assert object_fingerprint({'b', 'a', ('c', 1)}) == object_fingerprint(frozenset([('c', 1), 'a', 'b']))
+    assert object_fingerprint({'a'}) != object_fingerprint({'b'})
+
+
+def test_checkpoint_store(tmp_path):
+    calls = []
+
+    def stage(reserves):
+        calls.append(reserves)
+        return reserves * 2
+
+    reserves = pd.DataFrame({'end_uses_reserve': np.arange(4.0)})
+    store = CheckpointStore(tmp_path / 'case')
+    first = store.run(0, 'es_run', stage, reserves)
+    assert store.has(0, 'es_run')
+
+    # restart: the stage is loaded from the store
+    store = CheckpointStore(tmp_path / 'case')
+    pd.testing.assert_frame_equal(store.run(0, 'es_run', stage, reserves), first)
+    assert len(calls) == 1
+
+    # new inputs or missing output files: the stage is computed again
+    store.run(0, 'es_run', stage, reserves + 1)
+    store.run(0, 'es_run', stage, reserves + 1, outputs=[tmp_path / 'missing'])
+    assert len(calls) == 3
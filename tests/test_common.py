@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dispa_link.common import event_cumsum, fix_na, invert_dic_df, run_lengths
+
+
+def test_fix_na():
+    index = pd.date_range('2015-01-01', periods=4 * 96, freq='15min')
+    series = pd.Series(np.tile(np.arange(1., 97.), 4), index=index)
+    series.iloc[[5, 96 + 5, 2 * 96 + 7, 3]] = [np.nan, 0, 1000., np.nan]
+    series.iloc[96 + 3] = 2.
+    fixed = fix_na(series.copy(), verbose=False)
+    # same time step of the previous and next days, or the only one available
+    assert fixed.iloc[5] == 6. and fixed.iloc[96 + 5] == 6.
+    assert fixed.iloc[2 * 96 + 7] == 8.
+    assert fixed.iloc[3] == 2.
+    # DataFrames are filled column-wise
+    frame = fix_na(pd.DataFrame({'A': series, 'B': 2 * series}), verbose=False)
+    pd.testing.assert_series_equal(frame['B'], 2 * fixed, check_names=False)
+
+
+def test_fix_na_missing_time_stamp():
+    index = pd.date_range('2015-01-01', periods=3 * 24, freq='H')
+    series = pd.Series(np.tile(np.arange(24.), 3), index=index)
+    series[pd.Timestamp('2015-01-02 17:00')] = np.nan
+    # one missing time stamp on the first day: the following hours must not shift
+    fixed = fix_na(series.drop(pd.Timestamp('2015-01-01 05:00')), verbose=False)
+    assert fixed[pd.Timestamp('2015-01-02 17:00')] == 17.
+    # the search stops at a missing time stamp, as with labels
+    fixed = fix_na(series.drop(pd.Timestamp('2015-01-01 17:00')), verbose=False)
+    assert fixed[pd.Timestamp('2015-01-02 17:00')] == 17.
+    # time stamps off the hourly grid
+    irregular = series.drop(pd.Timestamp('2015-01-01 05:00'))
+    irregular.index = irregular.index.where(irregular.index.hour != 3, irregular.index + pd.Timedelta('1min'))
+    with pytest.raises(ValueError):
+        fix_na(irregular, verbose=False)
+
+
+def test_run_lengths():
+    values = pd.DataFrame({'A': [1., 2., 0., 0., 3., np.nan, 4., 5., 6.],
+                           'B': [0.] * 9,
+                           'C': [7.] * 9})
+    runs = run_lengths(values)
+    np.testing.assert_array_equal(runs['column'], [0, 0, 0, 2])
+    np.testing.assert_array_equal(runs['start'], [0, 4, 6, 0])
+    np.testing.assert_array_equal(runs['length'], [2, 1, 3, 9])
+    np.testing.assert_allclose(runs['energy'], [3., 3., 15., 63.])
+    np.testing.assert_array_equal(runs['max_length'], [3, 0, 9])
+    np.testing.assert_allclose(runs['max_energy'], [15., 0., 63.])
+
+    # same values as the cumsum/where/ffill expression
+    values = values.fillna(0)
+    active = values != 0
+    expected = values.cumsum().where(active).ffill().fillna(0) - values.cumsum().where(~active).ffill().fillna(0)
+    np.testing.assert_array_equal(event_cumsum(values), expected.values)
+
+
+def test_invert_dic_df():
+    index = pd.date_range('2015-01-01', periods=24, freq='H')
+    dic = {'BE': pd.DataFrame({'PV': np.arange(24.), 'WTON': np.nan}, index=index),
+           'FR': pd.DataFrame({'HROR': 3., 'PV': 2.}, index=index)}
+    out = invert_dic_df(dic, 'AvailabilityFactors')
+    assert list(out) == ['PV', 'WTON', 'HROR']
+    expected = pd.DataFrame({'BE': np.arange(24.), 'FR': 2.}, index=index)
+    pd.testing.assert_frame_equal(out['PV'], expected)
+    # missing columns and NaN are zero, all the tables are views of the same array
+    assert (out['WTON'] == 0).all().all() and (out['HROR']['BE'] == 0).all()
+    assert out['PV'].values.base is out['HROR'].values.base
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from dispa_link.postprocessing.convergence import ConvergenceTracker
+
+
+def make_events(n_iterations=3, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.uniform(0, 100, (8760, n_iterations)) * (rng.uniform(size=(8760, n_iterations)) < 0.3)
+    values[:5, 0] = 1  # event open at the beginning of the year
+    values[-3:, 1] = 2  # and at the end
+    return pd.DataFrame(values, columns=['It' + str(i) for i in range(n_iterations)])
+
+
+def test_convergence_tracker():
+    lost_load = make_events()
+    tracker = ConvergenceTracker()
+    for iteration in lost_load:
+        tracker.update(iteration, {'LostLoad_MaxPower': lost_load[[iteration]], 'OutputShedLoad': pd.DataFrame()})
+    summary = tracker.summary()
+    assert list(summary.index) == list(lost_load.columns)
+
+    # statistics of the cumsum().where().ffill() expressions of the original plot_convergence
+    a = lost_load != 0
+    cons = lost_load.cumsum().where(a).ffill().fillna(0) - lost_load.cumsum().where(~a).ffill().fillna(0)
+    a_cum = a.cumsum().where(a).ffill().fillna(0) - a.cumsum().where(~a).ffill().fillna(0)
+    stats = summary['LostLoad']
+    np.testing.assert_allclose(stats['total'], lost_load.sum())
+    np.testing.assert_allclose(stats['max'], lost_load.max())
+    np.testing.assert_array_equal(stats['hours'], a.sum())
+    np.testing.assert_allclose(stats['max_consecutive'], cons.max())
+    np.testing.assert_array_equal(stats['max_consecutive_hours'], a_cum.max())
+    assert (summary['ShedLoad'] == 0).all().all()
+
+    # chunks of the same iteration give the same statistics (events are carried over)
+    chunked = ConvergenceTracker()
+    for iteration in lost_load:
+        for chunk in np.array_split(lost_load[iteration].values, 7):
+            chunked.add(iteration, 'LostLoad', chunk)
+    pd.testing.assert_frame_equal(chunked.summary()['LostLoad'], stats)
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+from dispa_link.dispa_link_functions import assign_gas_units, assign_parameters_columnar, assign_typical_values, \
+    define_units, index_typical_units, lookup_ratio, typical_mapping
+
+
+def test_lookup_ratio():
+    layers_in_out = pd.DataFrame({'ELECTRICITY': [0.4, 0.5], 'GAS': [-1.0, -2.0]}, index=['CCGT', 'OCGT'])
+    ratio, found = lookup_ratio(layers_in_out, ['OCGT', 'CCGT', 'MISSING', 'CCGT'], 'ELECTRICITY',
+                                ['GAS', 'GAS', 'GAS', 'COAL'])
+    np.testing.assert_array_equal(found, [True, True, False, False])
+    np.testing.assert_allclose(ratio[found], [-0.25, -0.4])
+
+
+def test_assign_parameters_columnar():
+    power_plants = define_units(['A', 'B', 'C'])
+    power_plants = assign_parameters_columnar(power_plants, ['C', 'A'], ['Efficiency', 'Sector1'],
+                                              [np.array([0.3, 0.5]), 'ES_H2'])
+    assert power_plants.loc[['A', 'C'], 'Efficiency'].tolist() == [0.5, 0.3]
+    assert power_plants.loc[['A', 'C'], 'Sector1'].tolist() == ['ES_H2', 'ES_H2']
+    assert power_plants['Efficiency'].isna()['B']
+
+
+def test_define_units_dtypes():
+    power_plants = define_units(['CCGT', 'PV'], columns=['PowerCapacity', 'Nunits', 'Technology', 'Fuel', 'Sort'])
+    assert power_plants['PowerCapacity'].dtype == 'float64' and power_plants['Nunits'].dtype == 'Int64'
+    power_plants = assign_parameters_columnar(power_plants, ['CCGT', 'PV'], ['PowerCapacity', 'Technology', 'Fuel',
+                                                                             'Sort', 'Nunits'],
+                                              [[1.0, 0.5], ['COMC', 'PHOT'], ['GAS', 'SUN'], 'ELEC', [2, 1]])
+    # new rows and new categories keep the column dtypes
+    power_plants = assign_gas_units(power_plants, comc=3, gt=1, stur=0, x=False)
+    assert list(power_plants.index) == ['PV', 'OCGT_GAS', 'CCGT_GAS', 'STUR_GAS']
+    assert power_plants['PowerCapacity'].tolist() == [0.5, 0.25, 0.75, 0.]
+    assert power_plants['Technology'].tolist() == ['PHOT', 'GTUR', 'COMC', 'STUR']
+    assert isinstance(power_plants['Technology'].dtype, pd.CategoricalDtype)
+    assert power_plants['PowerCapacity'].dtype == 'float64' and power_plants['Nunits'].dtype == 'Int64'
+
+
+def test_assign_typical_values():
+    parameters = typical_mapping['Parameters']
+    typical_units = pd.DataFrame({'Technology': ['COMC', 'COMC', 'STUR'], 'Fuel': ['GAS', 'GAS', 'BIO'],
+                                  'CHPType': [np.nan, np.nan, 'Extraction'], 'PowerCapacity': [400., 200., 50.]})
+    for k, carac in enumerate(parameters):
+        typical_units[carac] = [k, k + 2., 0.5]
+    index = index_typical_units(typical_units)
+    assert index.loc[('COMC', 'GAS', ''), 'Count'] == 2
+    assert index.loc[('STUR', 'BIO', 'back-pressure'), 'Fallback']
+
+    power_plants = define_units(['CCGT', 'DHN_COGEN_WOOD', 'MISSING'])
+    power_plants[['PowerCapacity', 'Technology', 'Fuel', 'Sort', 'CHPType']] = \
+        [[1.0, 'COMC', 'GAS', 'ELEC', np.nan], [0.2, 'STUR', 'BIO', 'CHP', 'back-pressure'],
+         [1.0, 'GTUR', 'OIL', 'ELEC', np.nan]]
+    power_plants = assign_typical_values(power_plants, index, ['CHP', 'P2GS'])
+    power_plants = assign_typical_values(power_plants, index, ['ELEC', 'P2GS'])
+    # units missing in Typical_Units are dropped, others are split in units of the typical size
+    assert list(power_plants.index) == ['CCGT', 'DHN_COGEN_WOOD']
+    assert power_plants.loc['CCGT', ['Nunits', 'PowerCapacity', 'MinUpTime']].tolist() == [4, 250., 1.]
+    assert power_plants.loc['DHN_COGEN_WOOD', ['Nunits', 'PowerCapacity']].tolist() == [4, 50.]
+    # back-pressure units can not have a power loss factor
+    assert power_plants.loc['DHN_COGEN_WOOD', 'CHPPowerLossFactor'] == 0
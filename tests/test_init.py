@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+import dispa_link as dl
+from dispa_link import search
+
+# Import time of the package alone [ms], far above the lazy import (a few ms) and below the eager one (pandas and
+# matplotlib, close to 1 s)
+import_time_threshold = 150
+
+
+def test_lazy_import():
+    statement = 'import sys, dispa_link; print(sorted(m for m in ("pandas", "matplotlib") if m in sys.modules))'
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True,
+                             check=True)
+    assert process.stdout.strip() == '[]'
+    cumulative = [int(line.split('|')[1]) for line in process.stderr.splitlines()
+                  if line.startswith('import time:') and line.split('|')[2].strip() == 'dispa_link']
+    assert cumulative and cumulative[0] / 1000 < import_time_threshold
+
+    assert dl.assign_td is search.assign_td
+    assert dl.search is search
+    assert 'plot_convergence' in dir(dl)
@@ -0,0 +1,121 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dispa_link.constants import common
+from dispa_link.dispa_link_functions import define_units
+from dispa_link.preprocessing.get_capacities_energyscope import boundary_sectors, get_boundary_sector_inputs, \
+    map_x_units
+from dispa_link.preprocessing.get_timeseries_energyscope import electricity_demand_cols, get_electricity_demand, \
+    get_heat_demand, get_x_demand, get_x_timeseries, heat_demand_layers, merge_timeseries_x, x_sectors
+from dispa_link.search import flush_csv_files, output_root, td_layer_cache
+from tests.test_search import make_layer, make_td_df
+
+DRANGE = pd.date_range('2015-01-01', periods=8760, freq='H')
+
+
+def make_es_layers(n_td=4):
+    index = pd.MultiIndex.from_product([range(1, n_td + 1), range(1, 25)])
+    rng = np.random.default_rng(3)
+    layers = {}
+    for layer, name in x_sectors['layer'].items():
+        columns = list(dict.fromkeys(sum([common['ES'][layer + s] for s in x_sectors['lookup'].values()], [])))
+        layers[name] = pd.DataFrame(rng.normal(size=(len(index), len(columns))), index=index,
+                                    columns=[c + ' ' for c in columns])
+    return layers
+
+
+def test_get_x_timeseries():
+    td_df = make_td_df()
+    layers = make_es_layers()
+    x_ts = get_x_timeseries(layers, td_df, DRANGE)
+    assert list(x_ts) == ['XFixDemand', 'XVarDemand', 'XFixSupply', 'XVarSupply']
+    for layer in ['h2', 'ind', 'waste']:
+        expected = get_x_demand(layers[x_sectors['layer'][layer]], td_df, DRANGE, write_csv=False,
+                                dispaset_version='2.5_BS', columns=common['ES'][layer + '_fix_dem'],
+                                layer_name=x_sectors['layer_name'][layer])
+        pd.testing.assert_frame_equal(x_ts['XFixDemand'].loc[:, [x_sectors['layer_name'][layer]]], expected)
+
+
+def test_merge_timeseries_x(tmp_path):
+    td_df = make_td_df()
+    layers = make_es_layers()
+    ds_inputs = {var_name: dict() for var_name in ['XFixDemand', 'XVarDemand', 'XFixSupply', 'XVarSupply']}
+    td_layer_cache.clear()
+    with output_root(tmp_path / 'merged'):
+        ds_inputs = merge_timeseries_x(ds_inputs, layers, td_df, DRANGE, '2.5', 0)
+    # the boundary sector layers are expanded through the layer cache
+    assert td_layer_cache.misses == 1
+    # H2_demand.csv and PtLCapacities.csv are the files left by the last layer of the original per-layer loop
+    with output_root(tmp_path / 'loop'):
+        get_x_demand(layers[x_sectors['layer']['waste']], td_df, DRANGE, dispaset_version='2.5',
+                     columns=common['ES']['waste_var_sup'], layer_name=x_sectors['layer_name']['waste'])
+    flush_csv_files()
+    for file_name in ['H2_demand.csv', 'PtLCapacities.csv']:
+        merged, loop = [(tmp_path / root / 'Outputs' / 'EnergyScope' / 'Database' / 'H2_demand' / 'ES' /
+                         file_name).read_bytes() for root in ['merged', 'loop']]
+        assert merged == loop
+
+
+def test_zone_demands():
+    td_df = make_td_df()
+    outputs = {zone: {name: make_layer(columns=electricity_demand_cols + ['CCGT']) * (k + 1) for name in
+                      ['electricity_layers'] + list(heat_demand_layers.values())} for k, zone in enumerate(['BE', 'FR'])}
+    td_layer_cache.clear()
+    electricity = get_electricity_demand(outputs, td_df, DRANGE, countries=None, write_csv=False,
+                                         grid_losses={'BE': 0.05, 'FR': 0.1})
+    heat = get_heat_demand(outputs, td_df, DRANGE, write_csv=False)
+    # all the zones (and heat sectors) are expanded in a single call
+    assert td_layer_cache.misses == 2
+    assert list(heat) == ['BE_IND', 'BE_DHN', 'BE_DEC', 'FR_IND', 'FR_DHN', 'FR_DEC']
+    for zone, losses in [('BE', 0.05), ('FR', 0.1)]:
+        single = get_electricity_demand(outputs[zone], td_df, DRANGE, countries=[zone], write_csv=False,
+                                        grid_losses=losses)
+        pd.testing.assert_frame_equal(electricity.loc[:, [zone]], single)
+        single = get_heat_demand(outputs[zone], td_df, DRANGE, countries=[zone], write_csv=False)
+        pd.testing.assert_frame_equal(heat.loc[:, list(single)], single)
+
+
+def test_concurrent_output_roots(tmp_path):
+    td_df = make_td_df()
+    columns = ['END_USE', 'ELEC_EXPORT', 'TRAMWAY_TROLLEY', 'TRAIN_PUB', 'TRAIN_FREIGHT', 'TRUCK_ELEC', 'BIO_HYDROLYSIS',
+               'PYROLYSIS_TO_LFO', 'PYROLYSIS_TO_FUELS', 'ATM_CCS', 'INDUSTRY_CCS', 'SYN_METHANOLATION',
+               'BIOMASS_TO_METHANOL', 'HABER_BOSCH', 'OIL_TO_HVC', 'GAS_TO_HVC', 'BIOMASS_TO_HVC']
+
+    def pipeline(k):
+        layers = make_es_layers()
+        es_outputs = {'electricity_layers': make_layer(columns=columns) * (k + 1)}
+        with output_root(tmp_path / str(k)):
+            demand = get_electricity_demand(es_outputs, td_df, DRANGE, file_name='Load')
+            h2 = get_x_demand(layers[x_sectors['layer']['h2']] * (k + 1), td_df, DRANGE, dispaset_version='2.5',
+                              columns=common['ES']['h2_fix_dem'], layer_name=x_sectors['layer_name']['h2'])
+        return demand, h2
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        outputs = list(pool.map(pipeline, range(4)))
+    flush_csv_files()
+    for k, (demand, h2) in enumerate(outputs):
+        database = tmp_path / str(k) / 'Outputs' / 'EnergyScope' / 'Database'
+        written = pd.read_csv(database / 'TotalLoadValue' / 'ES' / 'Load.csv', index_col=0)
+        np.testing.assert_allclose(written.values, demand.values)
+        assert (database / 'H2_demand' / 'ES' / 'H2_demand.csv').is_file()
+
+
+def test_zone_boundary_sectors():
+    power_plants = define_units(['COMC_X', 'CCGT'], columns=['PowerCapacity', 'Technology', 'Fuel', 'Efficiency',
+                                                             'Sector1', 'EfficiencySector1'])
+    power_plants[['PowerCapacity', 'Technology', 'Fuel', 'Efficiency']] = [[1., 'COMCX', 'AMO', 0.5],
+                                                                           [1., 'COMC', 'GAS', 0.6]]
+    assert map_x_units(power_plants.copy()).at['COMC_X', 'Sector1'] == 'ES_AMO'
+    assert map_x_units(power_plants.copy(), zone='BE').at['COMC_X', 'Sector1'] == 'BE_AMO'
+
+    stored = [storage for storage in boundary_sectors.values() if storage is not None]
+    original_units = pd.DataFrame({'PowerCapacity': np.arange(len(stored), dtype=float)}, index=stored)
+    es_outputs = {'storage_characteristics': pd.DataFrame({'storage_losses': 0.01}, index=stored)}
+    x_inputs = {'XVarDemand': {0: pd.DataFrame({'BE_H2': [1., 3.], 'ES_H2': [5., 5.]})},
+                'XVarSupply': {0: pd.DataFrame({'BE_IND': [2., 1.]})}}
+    inputs = get_boundary_sector_inputs(original_units, es_outputs, ds_inputs=x_inputs, zone='BE')
+    assert list(inputs.index) == ['BE_' + sector[3:] for sector in boundary_sectors]
+    assert inputs.at['BE_H2', 'MaxFlexDemand'] == 3 and inputs.at['BE_IND', 'MaxFlexSupply'] == 2
+    assert inputs.at['BE_H2', 'STOCapacity'] == 0 and inputs.at['BE_AMO', 'STOCapacity'] == 1000
@@ -0,0 +1,56 @@
+import os
+
+import pandas as pd
+import pytest
+
+from dispa_link.preprocessing import read_energyscope
+from dispa_link.preprocessing.read_energyscope import layer_cache_path, load_es_case, read_layer
+from tests.test_search import make_layer
+
+
+def test_read_layer():
+    pytest.importorskip('pyarrow')
+    layer = make_layer(columns=('ELEC_EXPORT ', 'END_USE ', 'Unnamed: 3'))
+    layer.index.names = ['Td ', 'Time']
+    layer.to_csv('layer_ELECTRICITY.txt', sep='\t')
+    expected = layer.rename(columns=str.strip)
+
+    # the cache is built at the first read and used afterwards
+    pd.testing.assert_frame_equal(read_layer('layer_ELECTRICITY.txt'), expected)
+    assert os.path.isfile(layer_cache_path('layer_ELECTRICITY.txt'))
+    pd.testing.assert_frame_equal(read_layer('layer_ELECTRICITY.txt'), expected)
+
+    # a new source file invalidates the cache
+    (2 * layer).to_csv('layer_ELECTRICITY.txt', sep='\t')
+    os.utime('layer_ELECTRICITY.txt', ns=(0, 0))
+    pd.testing.assert_frame_equal(read_layer('layer_ELECTRICITY.txt'), 2 * expected)
+
+
+def test_read_layer_without_pyarrow(monkeypatch, caplog):
+    layer = make_layer(columns=('END_USE ',))
+    layer.index.names = ['Td ', 'Time']
+    layer.to_csv('layer_H2.txt', sep='\t')
+    monkeypatch.setattr(read_energyscope, 'pa', None)
+    read_energyscope._log_cache_disabled.cache_clear()
+    for _ in range(2):
+        pd.testing.assert_frame_equal(read_layer('layer_H2.txt'), layer.rename(columns=str.strip))
+    assert not os.path.isfile(layer_cache_path('layer_H2.txt'))
+    assert [record.message for record in caplog.records].count(
+        'pyarrow is not installed, the layer cache is disabled (pip install dispa_link[cache])') == 1
+
+
+def test_load_es_case():
+    os.makedirs('case/output/hourly_data')
+    os.makedirs('data')
+    layer = make_layer(columns=('H2_ELECTROLYSIS ', 'END_USE '))
+    layer.to_csv('case/output/hourly_data/layer_H2.txt', sep='\t')
+    pd.DataFrame({'param layers_in_out:': ['H2_ELECTROLYSIS '], 'H2 ': [0.7]}).to_csv('data/Layers_in_out.csv',
+                                                                                       sep=';', index=False)
+    assets = pd.DataFrame({' f': [1.]}, index=['H2_ELECTROLYSIS '])
+
+    es_outputs = load_es_case('case', 'data', layers=['h2_layer'], data_files=['layers_in_out'],
+                              read_outputs=lambda: {'assets': assets.copy()}, max_workers=2)
+    assert sorted(es_outputs) == ['assets', 'h2_layer', 'layers_in_out']
+    assert es_outputs['assets'].loc['H2_ELECTROLYSIS', 'f'] == 1.
+    assert es_outputs['layers_in_out'].loc['H2_ELECTROLYSIS', 'H2'] == 0.7
+    pd.testing.assert_frame_equal(es_outputs['h2_layer'], layer.rename(columns=str.strip))
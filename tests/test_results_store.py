@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dispa_link import results_store
+from dispa_link.results_store import ResultsStore, save_results
+from dispa_link.softlink import SoftLinkRun
+
+
+def make_results(k):
+    index = pd.date_range('2015-01-01', periods=8760, freq='H')
+    return {'OutputShedLoad': pd.DataFrame({'Z1': np.arange(8760.0) * k}, index=index),
+            'OutputOptimizationCheck': pd.Series(np.zeros(8760), index=index, name='check'),
+            'OutputPower': pd.DataFrame(np.ones((8760, 2)), index=index,
+                                        columns=pd.MultiIndex.from_tuples([('Z1', 'CCGT'), ('Z1', 'PV')])),
+            'status': {'model': 'UCM', 'k': k}}
+
+
+def test_results_store(tmp_path):
+    results = {i: make_results(i) for i in range(3)}
+    store = save_results(tmp_path / 'case', {'results': results, 'config_es': {'case_study': 'case'}},
+                         single=['config_es'])
+    assert store.iterations('results') == [0, 1, 2]
+    assert store.manifest['results/1']['OutputShedLoad']['format'] == 'parquet'
+    assert store.manifest['results/1']['status']['format'] == 'pickle'
+
+    # a new store reads the manifest, variables are read one at a time
+    store = ResultsStore(tmp_path / 'case')
+    for name, value in results[2].items():
+        if isinstance(value, pd.DataFrame):
+            pd.testing.assert_frame_equal(store.read('results', 2, name), value)
+        elif isinstance(value, pd.Series):
+            pd.testing.assert_series_equal(store.read('results', 2, name), value)
+        else:
+            assert store.read('results', 2, name) == value
+    pd.testing.assert_frame_equal(store.read('results', 1, 'OutputShedLoad', columns=['Z1']),
+                                  results[1]['OutputShedLoad'].loc[:, ['Z1']])
+    assert store.read_dict('config_es') == {'case_study': 'case'}
+
+    lazy = store.lazy('results', 1)
+    assert sorted(lazy) == sorted(results[1]) and not lazy._loaded
+    pd.testing.assert_frame_equal(lazy['OutputShedLoad'], results[1]['OutputShedLoad'])
+    assert list(lazy._loaded) == ['OutputShedLoad']
+
+
+def test_results_store_without_pyarrow(tmp_path, monkeypatch):
+    results = make_results(0)
+    save_results(tmp_path / 'parquet', {'results': {0: results}})
+    monkeypatch.setattr(results_store, 'pa', None)
+    with pytest.raises(ImportError, match='pyarrow'):
+        ResultsStore(tmp_path / 'parquet').read('results', 0, 'OutputShedLoad')
+    # without pyarrow the frames are pickled
+    store = save_results(tmp_path / 'pickle', {'results': {0: results}})
+    assert store.manifest['results/0']['OutputShedLoad']['format'] == 'pickle'
+    pd.testing.assert_frame_equal(store.read('results', 0, 'OutputShedLoad'), results['OutputShedLoad'])
+
+
+def test_softlink_save_load(tmp_path):
+    run = SoftLinkRun({'DL_folder': tmp_path, 'ES_folder': tmp_path / 'ES', 'checkpoints': False})
+    run.results = {i: make_results(i) for i in range(2)}
+    run.config_es['all_data'] = {'Resources': pd.DataFrame({'avail': [1.0]}, index=['GAS'])}
+    run.save(tmp_path / 'run_results')
+    loaded = SoftLinkRun({'DL_folder': tmp_path, 'ES_folder': tmp_path / 'ES', 'checkpoints': False})
+    loaded.load(tmp_path / 'run_results')
+    assert sorted(loaded.results) == [0, 1] and loaded.inputs == {}
+    pd.testing.assert_frame_equal(loaded.results[1]['OutputShedLoad'], run.results[1]['OutputShedLoad'])
+    pd.testing.assert_frame_equal(loaded.config_es['all_data']['Resources'], run.config_es['all_data']['Resources'])
+    assert loaded.config_es['case_study'] == run.config_es['case_study']
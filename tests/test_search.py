@@ -0,0 +1,182 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dispa_link.constants import mapping
+from dispa_link.search import (CSVExporter, TDLayerCache, TypicalUnitsCatalogue, assign_td, compile_es_mapping,
+                               distri_TD, es_attribute, expand_layer, process_TD, read_es_mapping, sto_dhn_all)
+
+
+def make_td_df(n_td=4):
+    days = np.sort(np.random.default_rng(0).choice(np.arange(1, 366), n_td, replace=False))
+    return process_TD(pd.DataFrame({0: np.resize(days, 365)}))
+
+
+def make_layer(n_td=4, columns=('A', 'B', 'C')):
+    index = pd.MultiIndex.from_product([range(1, n_td + 1), range(1, 25)])
+    return pd.DataFrame(np.random.default_rng(1).normal(size=(len(index), len(columns))), index=index,
+                        columns=list(columns))
+
+
+def test_assign_td():
+    td_df = make_td_df()
+    layer = make_layer()
+    expected = td_df.loc[:, ['TD', 'hour']].merge(layer, left_on=['TD', 'hour'], right_index=True).sort_index()
+    expected = expected.drop(columns=['TD', 'hour'])
+    pd.testing.assert_frame_equal(assign_td(layer, td_df), expected)
+    # shuffled layers and layers with missing typical days are expanded like an inner join
+    pd.testing.assert_frame_equal(assign_td(layer.sample(frac=1, random_state=2), td_df), expected)
+    partial = layer.drop(index=2, level=0)
+    pd.testing.assert_frame_equal(assign_td(partial, td_df), expected.loc[td_df['TD'] != 2])
+    # a td_df modified in place is not served with the engine of its previous content
+    td_df.loc[td_df['TD'] == 1, 'TD'] = 2
+    expected = layer.loc[list(zip(td_df['TD'], td_df['hour']))].set_axis(td_df.index)
+    pd.testing.assert_frame_equal(assign_td(layer, td_df), expected)
+
+
+def test_td_layer_cache():
+    td_df = make_td_df()
+    layer = make_layer()
+    cache = TDLayerCache(maxsize=2)
+    expanded = expand_layer(layer, td_df, cache=cache)
+    pd.testing.assert_frame_equal(expanded, assign_td(layer, td_df))
+    # same content, different object: served from the cache
+    assert expand_layer(layer.copy(), td_df, cache=cache) is expanded
+    assert (cache.hits, cache.misses) == (1, 1)
+    # modified content is expanded again, the least recently used entry is evicted beyond maxsize
+    expand_layer(layer * 2, td_df, cache=cache)
+    expand_layer(layer.rename(columns={'A': 'D'}), td_df, cache=cache)
+    assert len(cache) == 2 and cache.misses == 3
+    assert expand_layer(layer, td_df, cache=cache) is not expanded
+
+
+def test_csv_exporter():
+    exporter = CSVExporter(max_workers=2, max_pending=2)
+    layer = make_layer()
+    futures = [exporter.submit(layer, 'Database/Var%d/ES/file.csv' % k, header=True, index=True) for k in range(5)]
+    # the exporter writes a copy of the dataframe
+    layer.iloc[:, :] = 0
+    assert sorted(exporter.flush()) == sorted(future.result() for future in futures)
+    written = pd.read_csv('Database/Var4/ES/file.csv', index_col=[0, 1])
+    pd.testing.assert_frame_equal(written, make_layer(), check_names=False)
+    exporter.close()
+
+
+def test_csv_exporter_skips_unchanged(tmp_path):
+    exporter = CSVExporter(max_workers=0)
+    layer = make_layer()
+    path = str(tmp_path / 'Var' / 'ES' / 'file.csv')
+    exporter.submit(layer, path, manifest=str(tmp_path), header=True, index=True)
+    exporter.flush()
+    mtime = os.stat(path).st_mtime_ns
+    assert (tmp_path / 'csv_manifest.json').is_file()
+    assert exporter.changes() == {'changed': [path], 'unchanged': []}
+
+    # same content, new exporter (next run): the file is not rewritten
+    exporter = CSVExporter(max_workers=0)
+    exporter.submit(make_layer(), path, manifest=str(tmp_path), header=True, index=True)
+    manifest_mtime = os.stat(tmp_path / 'csv_manifest.json').st_mtime_ns
+    exporter.flush()
+    assert os.stat(path).st_mtime_ns == mtime
+    assert exporter.changes() == {'changed': [], 'unchanged': [path]}
+    # nothing changed: the manifest is not written again
+    assert os.stat(tmp_path / 'csv_manifest.json').st_mtime_ns == manifest_mtime
+
+    layer.iloc[0, 0] += 1
+    exporter.submit(layer, path, manifest=str(tmp_path), header=True, index=True)
+    exporter.flush()
+    assert exporter.changes() == {'changed': [path], 'unchanged': []}
+    pd.testing.assert_frame_equal(pd.read_csv(path, index_col=[0, 1]), layer, check_names=False)
+
+
+def test_sto_dhn_all():
+    td_df = make_td_df()
+    distri = distri_TD(4, td_df)
+    assert distri.sum() == 365
+    assert list(distri) == [(td_df['TD'].values[::24] == k).sum() for k in range(1, 5)]
+
+    layer = make_layer(columns=('DHN_COGEN_GAS', 'DHN_HP_ELEC', 'DHN_BOILER_GAS')).abs()
+    layer['TS_DHN_DAILY_Pin'] = -layer.sum(axis=1) / 2
+    layer['TS_DHN_SEASONAL_Pin'] = 0.0
+    assets = pd.DataFrame({'f': [10.0, 0.0]}, index=['TS_DHN_DAILY', 'TS_DHN_SEASONAL'])
+    dhn_sto = sto_dhn_all(['CCGT', 'DHN_BOILER_GAS', 'DHN_HP_ELEC', 'DHN_COGEN_GAS'], 4, assets, layer, td_df)
+    assert list(dhn_sto['DAILY'].index) == ['DHN_COGEN_GAS', 'DHN_HP_ELEC', 'DHN_BOILER_GAS']
+    assert dhn_sto['DAILY'].dtype == 'float64'
+    # storage input proportional to the production: allocation proportional to the yearly production
+    production = layer.iloc[:, :3].mul(distri[layer.index.get_level_values(0) - 1], axis=0).sum() / 2
+    np.testing.assert_allclose(dhn_sto['DAILY'].values, 10 * production.values / production.sum())
+    assert (dhn_sto['SEASONAL'] == 0).all()
+
+
+def test_typical_units_catalogue(tmp_path):
+    (tmp_path / 'BE').mkdir()
+    units = pd.DataFrame({'Unit': ['A', 'B', 'C', 'D'], 'Technology': ['COMC', 'STUR', 'COMC', 'GTUR'],
+                          'Fuel': ['GAS', 'GAS', 'GAS', 'GAS'],
+                          'CHPType': [np.nan, 'Extraction', 'Extraction', np.nan]})
+    units.to_csv(tmp_path / 'BE' / 'units.csv', index=False)
+    pd.DataFrame({'Zone': ['BE']}).to_csv(tmp_path / 'zones.csv', index=False)
+
+    catalogue = TypicalUnitsCatalogue(str(tmp_path))
+    found = catalogue.resolve([('COMC', 'GAS'), ('STUR', 'GAS', 'back-pressure'), ('HDAM', 'WAT')], prefix='BE')
+    assert list(found[('COMC', 'GAS')]['Unit']) == ['A', 'C']
+    # only the Extraction type is available: used as back-pressure
+    assert list(found[('STUR', 'GAS', 'back-pressure')]['CHPType']) == ['back-pressure']
+    assert found[('HDAM', 'WAT')].empty
+    assert catalogue.locate('COMC', 'GAS', 'Extraction') == (os.path.join('BE', 'units.csv'), [2], False)
+
+    # the index is persisted and only modified files are scanned again
+    path = tmp_path / 'BE' / 'units.csv'
+    mtime = os.stat(path).st_mtime_ns
+    units.loc[3, 'Technology'] = 'HDAM'
+    units.to_csv(path, index=False)
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+    catalogue = TypicalUnitsCatalogue(str(tmp_path))
+    catalogue.refresh()
+    assert catalogue.locate('HDAM', 'GAS') == (os.path.join('BE', 'units.csv'), [3], False)
+    assert catalogue.locate('GTUR', 'GAS') is None
+
+
+def test_es_mapping(tmp_path):
+    table = compile_es_mapping()
+    techs = ['CCGT', 'DHN_COGEN_WOOD', 'MISSING']
+    for attribute in ['TECH', 'FUEL_ES', 'CHP_HEAT']:
+        assert list(es_attribute(table, techs, attribute)) == [mapping['ES'][attribute].get(tech) for tech in techs]
+    assert isinstance(table['SORT'].dtype, pd.CategoricalDtype)
+
+    # new ES technologies from a file
+    table.to_csv(tmp_path / 'es_mapping.csv')
+    with open(tmp_path / 'es_mapping.csv', 'a') as f:
+        f.write('NEW_CCGT,ELEC,COMC,GAS,GAS,,,,,\n')
+    with open(tmp_path / 'es_mapping.csv', 'a') as f:
+        f.write('NEW_BOILER,,,,,,,,,\n')
+    read = read_es_mapping(tmp_path / 'es_mapping.csv')
+    # empty cells are read as missing values, except SORT: a listed technology without SORT is dropped ('')
+    expected = table.astype(object).replace('', np.nan)
+    expected['SORT'] = expected['SORT'].fillna('')
+    pd.testing.assert_frame_equal(read.loc[table.index].astype(object), expected)
+    assert read.at['NEW_BOILER', 'SORT'] == '' and read['SORT'].loc[['CCGT', 'IND_BOILER_GAS']].tolist() == ['ELEC', '']
+    assert list(es_attribute(read, ['NEW_CCGT'], 'TECH')) == ['COMC']
+    assert list(es_attribute(read, ['NEW_CCGT'], 'CHP_HEAT')) == [None]
+
+
+def test_csv_exporter_order_and_fork(tmp_path):
+    exporter = CSVExporter(max_workers=4)
+    path = str(tmp_path / 'file.csv')
+    for k in range(20):
+        exporter.submit(pd.DataFrame({'k': [k] * 1000}), path, manifest=str(tmp_path), index=False)
+    exporter.flush()
+    # the last submitted frame is on disk
+    assert pd.read_csv(path)['k'].iloc[0] == 19
+
+    # the writer threads of the parent do not exist in a forked child
+    pid = os.fork()
+    if pid == 0:
+        try:
+            exporter.submit(pd.DataFrame({'k': [-1]}), path, index=False)
+            exporter.flush()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert pd.read_csv(path)['k'].iloc[0] == -1
+    exporter.close()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+from dispa_link.search import flush_csv_files, output_root, write_csv_files
+from dispa_link.checkpoint import object_fingerprint
+from dispa_link.softlink import SoftLinkRun, case_study_name, es_run_inputs, expand_grid, is_converged, lost_load, \
+    run_sweep
+
+
+def test_case_study_name():
+    assert case_study_name('UTOPIA', '2.5_BS', 0.5, 7, 0.05) == \
+        'UTOPIA_2.5_BS_12500_RESERVE_dumping=0.5_SSTOR=7_CCGTshare=0.05_final'
+
+
+def test_convergence():
+    index = pd.RangeIndex(8760)
+    results = {'OutputShedLoad': pd.DataFrame(), 'LostLoad_MaxPower': pd.DataFrame()}
+    assert is_converged(results)
+    results['LostLoad_MaxPower'] = pd.DataFrame({'Z1': np.where(index == 10, 5.0, 0.0)}, index=index)
+    results['OutputShedLoad'] = pd.DataFrame({'Z1': np.where(index == 10, 1.0, 0.0)}, index=index)
+    assert lost_load(results).max() == 6
+    assert not is_converged(results)
+    assert is_converged(results, tolerance=6)
+
+
+def test_softlink_run(tmp_path):
+    run = SoftLinkRun({'case_name': 'DYSTOPIA', 'DL_folder': tmp_path, 'ES_folder': tmp_path / 'ES'})
+    assert run.case_study.startswith('DYSTOPIA_2.5_BS_10000000.0_')
+    assert run.case_dir(2).name == run.case_study + '_loop_2'
+    assert (tmp_path / 'Outputs' / 'Checkpoints' / run.case_study).is_dir()
+    assert run._timed(0, 'read_es', sum, [1, 2]) == 3
+    assert list(run.timings_table().columns) == ['read_es']
+    # es_run fingerprint: only the configuration keys read by the ES run
+    run.config_es['all_data'] = {'Resources': pd.DataFrame({'avail': [1.0]}), 'Unused': pd.DataFrame()}
+    fingerprint = object_fingerprint(es_run_inputs(run.config_es))
+    run.config_es['Working_directory'] = str(tmp_path / 'elsewhere')
+    run.config_es['all_data']['Unused'] = pd.DataFrame({'x': [1]})
+    assert object_fingerprint(es_run_inputs(run.config_es)) == fingerprint
+    run.config_es['all_data']['Resources'].loc[0, 'avail'] = 2.0
+    assert object_fingerprint(es_run_inputs(run.config_es)) != fingerprint
+
+
+def write_case(config):
+    # stands for run_softlink_case: writes in the output root of the case
+    with output_root(config['output_root']):
+        write_csv_files('case', pd.DataFrame({'case': [config['case_study']]}), 'Case', index=False, write_csv=True)
+    flush_csv_files()
+    return {'case_study': config['case_study'], 'output_root': str(config['output_root'])}
+
+
+def test_run_sweep(tmp_path):
+    grid = {'reserve_dumping': [0.25, 0.5], 'ccgt_share': [0.05, 0.1]}
+    configs = expand_grid(grid, {'seasonal_storage_days': 14})
+    assert len(configs) == 4
+    assert configs[1]['case_study'] == case_study_name('UTOPIA', '2.5_BS', 0.25, 14, 0.1)
+
+    index = run_sweep(grid, {'seasonal_storage_days': 14}, sweep_root=tmp_path, max_workers=2, worker=write_case)
+    assert list(index.index) == [config['case_study'] for config in configs]
+    assert list(index['ccgt_share']) == [0.05, 0.1, 0.05, 0.1]
+    for case_study in index.index:
+        case = pd.read_csv(tmp_path / case_study / 'Outputs' / 'EnergyScope' / 'Database' / 'Case' / 'ES' / 'case.csv')
+        assert case.loc[0, 'case'] == case_study
+    assert (tmp_path / 'sweep_index.csv').is_file()